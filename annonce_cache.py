@@ -0,0 +1,162 @@
+"""
+Cache des annonces (évite d'ouvrir le modal annonce pour une annonce connue)
+
+Deux tables dans state/<db_name>.sqlite (même fichier que l'index de sync) :
+
+- annonce_conversations : conversation → annonce (ou annonce disparue), interlocuteur
+- annonce_info          : annonce → titre, description
+
+Au démarrage, le cache est amorcé depuis la base via api.php?action=annonce_index
+(les entrées déjà présentes gardent leur date de vérification). Une entrée
+est fraîche pendant `annonceCacheTtlHours` (7 jours par défaut) ; au-delà, ou
+pour une conversation inconnue que (titre, interlocuteur) ne rattache pas à une
+seule annonce, le scraper rouvre le modal et le résultat remplace l'entrée.
+Le titre seul ne suffit pas : une annonce republiée garde son titre.
+"""
+
+import time
+import sqlite3
+from pathlib import Path
+
+import requests
+
+from sync_state import STATE_DIR
+from worker_auth import worker_headers
+
+DEFAULT_TTL_HOURS = 24 * 7
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS annonce_conversations (
+    conversation_id TEXT PRIMARY KEY,
+    annonce_id TEXT,
+    gone INTEGER DEFAULT 0,
+    checked_at REAL,
+    user_id TEXT
+);
+CREATE TABLE IF NOT EXISTS annonce_info (
+    annonce_id TEXT PRIMARY KEY,
+    title TEXT,
+    description TEXT,
+    checked_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_annonce_info_title ON annonce_info(title);
+"""
+
+
+def fetch_annonce_index(config, timeout=10):
+    """Annonces connues de la base (conversation → annonce), [] si l'API ne répond pas"""
+    url = config['apiUrl'].replace('action=save', 'action=annonce_index')
+    response = requests.get(url, headers=worker_headers(config['db_name']), timeout=timeout)
+    response.raise_for_status()
+    return response.json().get('annonces', [])
+
+
+class AnnonceCache:
+    def __init__(self, db_name, ttl_hours=DEFAULT_TTL_HOURS, directory=None):
+        directory = Path(directory or STATE_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(directory / f'{db_name}.sqlite'))
+        self.conn.executescript(SCHEMA)
+        columns = [row[1] for row in self.conn.execute('PRAGMA table_info(annonce_conversations)')]
+        if 'user_id' not in columns:
+            self.conn.execute('ALTER TABLE annonce_conversations ADD COLUMN user_id TEXT')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS idx_annonce_conversations_user ON annonce_conversations(user_id)')
+        self.ttl = ttl_hours * 3600
+        self.stats = {'hits': 0, 'misses': 0, 'recorded': 0}
+
+    def seed(self, rows):
+        """rows: [{conversation_id, user_id, annonce_id, title, description, is_deleted}] ; retourne le nombre d'ajouts"""
+        now = time.time()
+        before = self.conn.total_changes
+        self.conn.executemany(
+            'INSERT OR IGNORE INTO annonce_info (annonce_id, title, description, checked_at) VALUES (?, ?, ?, ?)',
+            [(str(r['annonce_id']), r.get('title'), r.get('description'), now) for r in rows if r.get('annonce_id')]
+        )
+        self.conn.executemany(
+            'INSERT OR IGNORE INTO annonce_conversations (conversation_id, annonce_id, gone, checked_at, user_id) VALUES (?, ?, ?, ?, ?)',
+            [(str(r['conversation_id']), str(r['annonce_id']), int(bool(int(r.get('is_deleted') or 0))), now,
+              str(r['user_id']) if r.get('user_id') else None)
+             for r in rows if r.get('conversation_id') and r.get('annonce_id')]
+        )
+        added = self.conn.total_changes - before
+        # Entrées d'avant la colonne user_id : complétées sans toucher à leur date
+        self.conn.executemany(
+            'UPDATE annonce_conversations SET user_id = ? WHERE conversation_id = ? AND user_id IS NULL',
+            [(str(r['user_id']), str(r['conversation_id'])) for r in rows if r.get('conversation_id') and r.get('user_id')]
+        )
+        self.conn.commit()
+        return added
+
+    # ========== BINDINGS (appelées depuis la page) ==========
+    def lookup(self, entries):
+        """entries: [{conversation_id, title, user_id}] → [{id, description} | {gone: True} | None si inconnue/périmée]"""
+        cutoff = time.time() - self.ttl
+        results = []
+        for entry in entries:
+            hit = (self._by_conversation(entry.get('conversation_id'), cutoff)
+                   or self._by_title(entry.get('title'), entry.get('user_id'), cutoff))
+            self.stats['hits' if hit else 'misses'] += 1
+            results.append(hit)
+        return results
+
+    def record(self, entry):
+        """entry: {conversation_id, title, user_id, id, description} ou {conversation_id, gone: true} (résultat du modal)"""
+        now = time.time()
+        conversation_id = entry.get('conversation_id')
+        annonce_id = entry.get('id')
+        if annonce_id:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO annonce_info (annonce_id, title, description, checked_at) VALUES (?, ?, ?, ?)',
+                (str(annonce_id), entry.get('title'), entry.get('description'), now)
+            )
+        if conversation_id:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO annonce_conversations (conversation_id, annonce_id, gone, checked_at, user_id) VALUES (?, ?, ?, ?, ?)',
+                (str(conversation_id), str(annonce_id) if annonce_id else None, int(bool(entry.get('gone'))), now,
+                 str(entry['user_id']) if entry.get('user_id') else None)
+            )
+        self.conn.commit()
+        self.stats['recorded'] += 1
+        return True
+
+    # ========== LECTURE ==========
+    def _by_conversation(self, conversation_id, cutoff):
+        if not conversation_id:
+            return None
+        row = self.conn.execute("""
+            SELECT c.gone, c.checked_at, i.annonce_id, i.description, i.checked_at
+            FROM annonce_conversations c
+            LEFT JOIN annonce_info i ON i.annonce_id = c.annonce_id
+            WHERE c.conversation_id = ?
+        """, (str(conversation_id),)).fetchone()
+        if not row or row[1] < cutoff:
+            return None
+        gone, _, annonce_id, description, info_checked = row
+        if gone:
+            return {'gone': True}
+        if not annonce_id or info_checked < cutoff:
+            return None
+        return {'id': annonce_id, 'description': description}
+
+    def _by_title(self, title, user_id, cutoff):
+        """Nouvelle conversation sur une annonce connue : même titre ET même interlocuteur déjà vu
+        sur cette annonce (seul, le titre est partagé par les annonces republiées)"""
+        if not title or not user_id:
+            return None
+        rows = self.conn.execute("""
+            SELECT DISTINCT i.annonce_id, i.description
+            FROM annonce_info i
+            JOIN annonce_conversations c ON c.annonce_id = i.annonce_id
+            WHERE i.title = ? AND c.user_id = ? AND c.gone = 0 AND i.checked_at >= ?
+            LIMIT 2
+        """, (title, str(user_id), cutoff)).fetchall()
+        if len(rows) != 1:
+            return None
+        return {'id': rows[0][0], 'description': rows[0][1]}
+
+    def summary(self):
+        s = self.stats
+        return f'{s["hits"]} trouvées en cache, {s["misses"]} à ouvrir, {s["recorded"]} mises à jour'
+
+    def close(self):
+        self.conn.close()
@@ -4,8 +4,6 @@
  * API REST - Protection contre écrasement des annonces disparues
  * Ne met à jour l'annonce QUE si annonce_id est fourni dans le payload
  */
-require_once __DIR__ . '/telegram-notify.php';
-
 ini_set('display_errors', 0);
 error_reporting(E_ALL);
 
@@ -32,19 +30,52 @@ function jsonSuccess($data)
     exit;
 }
 
+/**
+ * Secret de config/worker_secret, créé au premier appel s'il n'existe pas ('' si impossible)
+ */
+function workerSecret()
+{
+    $file = BASE_PATH . '/config/worker_secret';
+    if (!is_file($file)) {
+        $handle = @fopen($file, 'x');
+        if ($handle) {
+            @chmod($file, 0600);
+            fwrite($handle, bin2hex(random_bytes(32)));
+            fclose($handle);
+        }
+    }
+    return is_readable($file) ? trim((string)file_get_contents($file)) : '';
+}
+
 require_once __DIR__ . '/config.php';
 
 $action = $_GET['action'] ?? '';
 
+// Tables dont les lignes sont comptées par stats_counters (voir COMPTEURS DE STATS)
+const STATS_TABLES = ['annonces', 'users', 'conversations', 'messages'];
+
 // Auth
 $needsAuth = true;
 
-if ($action === 'save') {
+// Actions appelées par le scraper / les workers Python (base choisie par X-User-Database)
+$workerActions = ['save', 'save_batch', 'pending_images', 'set_image_paths', 'annonce_index', 'has_messages'];
+
+if (in_array($action, $workerActions, true)) {
     $needsAuth = false;
 } elseif ($action === 'stats' && isset($_SERVER['HTTP_X_USER_DATABASE'])) {
     $needsAuth = false;
 }
 
+// Données privées sans session web : secret partagé avec les workers Python (worker_auth.py)
+$secretActions = ['pending_images', 'set_image_paths', 'annonce_index'];
+
+if (in_array($action, $secretActions, true)) {
+    $secret = workerSecret();
+    if ($secret === '' || !hash_equals($secret, $_SERVER['HTTP_X_WORKER_SECRET'] ?? '')) {
+        jsonError('Secret worker invalide', 403);
+    }
+}
+
 if ($needsAuth) {
     require_once __DIR__ . '/auth/auth.php';
     if (!Auth::isAuthenticated()) {
@@ -54,7 +85,7 @@ if ($needsAuth) {
 
 $dbName = null;
 
-if ($action === 'save' || isset($_SERVER['HTTP_X_USER_DATABASE'])) {
+if (in_array($action, $workerActions, true) || isset($_SERVER['HTTP_X_USER_DATABASE'])) {
     $dbName = $_SERVER['HTTP_X_USER_DATABASE'] ?? null;
     if (!$dbName) {
         jsonError('Header X-User-Database manquant', 400);
@@ -122,6 +153,16 @@ $method = $_SERVER['REQUEST_METHOD'];
 try {
     if ($method === 'POST' && $action === 'save') {
         saveConversation($pdo, $dbName);
+    } elseif ($method === 'POST' && $action === 'save_batch') {
+        saveConversationBatch($pdo, $dbName);
+    } elseif ($method === 'GET' && $action === 'annonce_index') {
+        getAnnonceIndex($pdo);
+    } elseif ($method === 'GET' && $action === 'has_messages') {
+        hasMessages($pdo);
+    } elseif ($method === 'GET' && $action === 'pending_images') {
+        getPendingImages($pdo);
+    } elseif ($method === 'POST' && $action === 'set_image_paths') {
+        setImagePaths($pdo);
     } elseif ($method === 'POST' && $action === 'update_user_comment') {
         updateUserComment($pdo);
     } elseif ($method === 'POST' && $action === 'update_user_photo') {
@@ -173,6 +214,7 @@ function saveConversation($pdo, $dbName)
     logDebug("   - messages: " . count($data['messages'] ?? []));
 
     $newMessagesCount = 0;
+    $newRows = ['annonces' => 0, 'users' => 0, 'conversations' => 0];
 
     try {
         $pdo->beginTransaction();
@@ -205,6 +247,8 @@ function saveConversation($pdo, $dbName)
                     $data['annonce_description'] ?? null,
                     $isDeleted ? 1 : 0
                 ]);
+                // ON DUPLICATE KEY : 1 ligne affectée = insertion, 2 = mise à jour
+                $newRows['annonces'] = $stmt->rowCount() === 1 ? 1 : 0;
                 logDebug("✅ Annonce $annonceId OK (COALESCE protection active)");
             } catch (Exception $e) {
                 logDebug("⚠️ Erreur annonce: " . $e->getMessage());
@@ -227,6 +271,7 @@ function saveConversation($pdo, $dbName)
                 VALUES (?, ?)
             ");
         $stmt->execute([$userId, $data['info']['user'] ?? "Utilisateur $userId"]);
+        $newRows['users'] = $stmt->rowCount();
         logDebug("✅ User $userId OK");
 
         // ========== 3. CONVERSATION ==========
@@ -257,6 +302,7 @@ function saveConversation($pdo, $dbName)
                 user_id = VALUES(user_id)
         ");
         $stmt->execute([$conversationId, $annonceId, $userId]);
+        $newRows['conversations'] = $stmt->rowCount() === 1 ? 1 : 0;
         logDebug("✅ Conversation $conversationId OK");
 
         // ========== 4. MESSAGES ==========
@@ -277,6 +323,8 @@ function saveConversation($pdo, $dbName)
             ON DUPLICATE KEY UPDATE full_url = VALUES(full_url)
         ");
 
+        $existsStmt = $pdo->prepare("SELECT COUNT(*) FROM messages WHERE id = ?");
+
         $msgCount = 0;
         $imgCount = 0;
         $skipped = 0;
@@ -295,7 +343,6 @@ function saveConversation($pdo, $dbName)
             }
 
             // Vérifier si nouveau
-            $existsStmt = $pdo->prepare("SELECT COUNT(*) FROM messages WHERE id = ?");
             $existsStmt->execute([$messageId]);
             $isNew = $existsStmt->fetchColumn() == 0;
 
@@ -351,14 +398,15 @@ function saveConversation($pdo, $dbName)
             }
         }
 
+        bumpStats($pdo, $newRows + ['messages' => $newMessagesCount]);
         $pdo->commit();
 
         logDebug("✅ SUCCESS: $msgCount messages ($newMessagesCount nouveaux), $imgCount images");
         logDebug("━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━");
 
-        // Notification Telegram si nouveaux messages
+        // Notification si nouveaux messages (outbox, envoyée par notifier.py)
         if ($newMessagesCount > 0) {
-            sendTelegramNotification($dbName, $newMessagesCount);
+            queueNotification($dbName, $newMessagesCount, [$data['info']['title'] ?? 'Sans titre']);
         }
 
         echo json_encode([
@@ -378,46 +426,458 @@ function saveConversation($pdo, $dbName)
     }
 }
 
-function sendTelegramNotification($dbName, $newCount)
+// ========== SAVE BATCH - PLUSIEURS CONVERSATIONS, UNE TRANSACTION ==========
+
+/**
+ * INSERT multi-lignes par paquets de $chunkSize
+ */
+function multiRowInsert($pdo, $sql, $columns, $rows, $suffix = '', $chunkSize = 500)
 {
-    try {
-        $configFile = __DIR__ . '/config/users.json';
-        if (!file_exists($configFile)) return;
+    $placeholders = '(' . implode(', ', array_fill(0, count($columns), '?')) . ')';
+    foreach (array_chunk($rows, $chunkSize) as $chunk) {
+        $values = [];
+        foreach ($chunk as $row) {
+            foreach ($row as $value) {
+                $values[] = $value;
+            }
+        }
+        $stmt = $pdo->prepare(
+            "$sql (" . implode(', ', $columns) . ") VALUES "
+                . implode(', ', array_fill(0, count($chunk), $placeholders))
+                . " $suffix"
+        );
+        $stmt->execute($values);
+    }
+}
+
+/**
+ * Clés déjà présentes dans $table, en une requête par paquet de 1000
+ */
+function fetchExistingIds($pdo, $table, $column, $ids)
+{
+    $existing = [];
+    foreach (array_chunk(array_values(array_unique($ids)), 1000) as $chunk) {
+        $stmt = $pdo->prepare(
+            "SELECT $column FROM $table WHERE $column IN (" . implode(', ', array_fill(0, count($chunk), '?')) . ")"
+        );
+        $stmt->execute($chunk);
+        foreach ($stmt->fetchAll(PDO::FETCH_COLUMN) as $id) {
+            $existing[$id] = true;
+        }
+    }
+    return $existing;
+}
+
+/**
+ * IDs de messages déjà en base
+ */
+function fetchExistingMessageIds($pdo, $ids)
+{
+    return fetchExistingIds($pdo, 'messages', 'id', array_map('intval', $ids));
+}
+
+/**
+ * Nombre de clés de $rows absentes de $table (lignes que l'upsert va créer)
+ */
+function countNewIds($pdo, $table, $column, $rows)
+{
+    return $rows ? count($rows) - count(fetchExistingIds($pdo, $table, $column, array_keys($rows))) : 0;
+}
+
+function saveConversationBatch($pdo, $dbName)
+{
+    logDebug("━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━");
+    logDebug("🔵 API SAVE BATCH START");
+
+    $data = json_decode(file_get_contents('php://input'), true);
+    $conversations = $data['conversations'] ?? null;
+
+    if (!is_array($conversations)) {
+        logDebug("❌ JSON decode failed");
+        echo json_encode(['error' => 'JSON invalide', 'new_messages' => 0]);
+        return;
+    }
 
-        $config = json_decode(file_get_contents($configFile), true);
+    logDebug("📦 " . count($conversations) . " conversations reçues");
 
-        $chatId = null;
-        foreach ($config['users'] as $user) {
-            if ($user['db_name'] === $dbName) {
-                $chatId = $user['telegram_chat_id'] ?? null;
-                break;
+    // ========== 1. VALIDATION + LOOKUP ENSEMBLISTE DES MESSAGES EXISTANTS ==========
+    $results = [];
+    $allMessageIds = [];
+
+    foreach ($conversations as $i => $conv) {
+        if (empty($conv['user_id'])) {
+            $results[$i] = ['error' => 'user_id requis', 'new_messages' => 0];
+        } elseif (empty($conv['conversation_id'])) {
+            $results[$i] = ['error' => 'conversation_id requis', 'new_messages' => 0];
+        } else {
+            foreach ($conv['messages'] ?? [] as $msg) {
+                if (!empty($msg['id'])) {
+                    $allMessageIds[] = (int)$msg['id'];
+                }
+            }
+        }
+    }
+
+    $existing = fetchExistingMessageIds($pdo, $allMessageIds);
+    logDebug("🔍 " . count($allMessageIds) . " messages, " . count($existing) . " déjà en base");
+
+    // ========== 2. CONSTRUCTION DES LIGNES ==========
+    $annonceRows = [];
+    $userRows = [];
+    $conversationRows = [];
+    $messageRows = [];
+    $imageRows = [];
+    $seen = [];
+    $totalNew = 0;
+    $newTitles = [];
+
+    foreach ($conversations as $i => $conv) {
+        if (isset($results[$i])) {
+            logDebug("❌ Conversation #$i: " . $results[$i]['error']);
+            continue;
+        }
+
+        $conversationId = $conv['conversation_id'];
+        $userId = $conv['user_id'];
+
+        // Annonce : seulement si fournie (sinon COALESCE conserve l'existante)
+        $annonceId = !empty($conv['annonce_id']) ? $conv['annonce_id'] : null;
+        if ($annonceId) {
+            $annonceRows[$annonceId] = [
+                $annonceId,
+                $conv['annonce_url'] ?? null,
+                $conv['info']['title'] ?? 'Sans titre',
+                $conv['info']['site'] ?? 'annonces.nc',
+                $conv['annonce_description'] ?? null,
+                strpos($annonceId, 'deleted_') === 0 ? 1 : 0
+            ];
+        }
+
+        $userRows[$userId] = [$userId, $conv['info']['user'] ?? "Utilisateur $userId"];
+        $conversationRows[$conversationId] = [$conversationId, $annonceId, $userId];
+
+        $msgCount = 0;
+        $newCount = 0;
+        $imgCount = 0;
+        $skipped = 0;
+
+        foreach ($conv['messages'] ?? [] as $msg) {
+            $messageId = $msg['id'] ?? null;
+            if (!$messageId) {
+                $skipped++;
+                continue;
+            }
+
+            $msgCount++;
+            if (!isset($existing[(int)$messageId]) && !isset($seen[(int)$messageId])) {
+                $newCount++;
+            }
+            $seen[(int)$messageId] = true;
+
+            $messageRows[(int)$messageId] = [
+                $messageId,
+                $conversationId,
+                ($msg['my_message'] ?? false) ? 1 : 0,
+                $msg['content'] ?? '',
+                $msg['created_at'] ?? null,
+                parseApiDateToDateTime($msg['created_at'] ?? null),
+                $msg['from'] ?? null,
+                $msg['status'] ?? null
+            ];
+
+            foreach ($msg['medias'] ?? [] as $media) {
+                $fullUrl = $media['versions']['original']['url'] ?? null;
+                if ($fullUrl) {
+                    $imageRows[$messageId . '|' . $fullUrl] = [$messageId, $fullUrl];
+                    $imgCount++;
+                }
             }
         }
 
-        if (!$chatId) return;
+        $totalNew += $newCount;
+        if ($newCount > 0) {
+            $newTitles[] = $conv['info']['title'] ?? 'Sans titre';
+        }
+        $results[$i] = [
+            'status' => 'saved',
+            'success' => true,
+            'conversation_id' => $conversationId,
+            'messages_count' => $msgCount,
+            'new_messages' => $newCount,
+            'images_count' => $imgCount,
+            'skipped' => $skipped,
+            'annonce_updated' => $annonceId !== null
+        ];
+    }
+
+    // ========== 3. ÉCRITURE MULTI-LIGNES, UNE TRANSACTION ==========
+    try {
+        $pdo->beginTransaction();
+
+        // Lignes créées par ce batch, pour les compteurs de stats
+        $newRows = [
+            'annonces' => countNewIds($pdo, 'annonces', 'id', $annonceRows),
+            'users' => countNewIds($pdo, 'users', 'user_id', $userRows),
+            'conversations' => countNewIds($pdo, 'conversations', 'id', $conversationRows),
+            'messages' => $totalNew
+        ];
+
+        if ($annonceRows) {
+            multiRowInsert($pdo, "INSERT INTO annonces", ['id', 'url', 'title', 'site', 'description', 'is_deleted'], array_values($annonceRows), "
+                ON DUPLICATE KEY UPDATE 
+                    url = COALESCE(VALUES(url), url),
+                    title = COALESCE(VALUES(title), title),
+                    site = COALESCE(VALUES(site), site),
+                    description = COALESCE(VALUES(description), description),
+                    is_deleted = VALUES(is_deleted)");
+        }
+
+        if ($userRows) {
+            multiRowInsert($pdo, "INSERT IGNORE INTO users", ['user_id', 'user_name'], array_values($userRows));
+        }
+
+        if ($conversationRows) {
+            multiRowInsert($pdo, "INSERT INTO conversations", ['id', 'annonce_id', 'user_id'], array_values($conversationRows), "
+                ON DUPLICATE KEY UPDATE 
+                    annonce_id = COALESCE(VALUES(annonce_id), annonce_id),
+                    user_id = VALUES(user_id)");
+        }
 
-        $hostname = gethostname();
-        $message = "🔔 <b>$newCount nouveau(x) message(s)</b>\n\n";
-        $message .= "📍 Source: <code>$hostname</code>\n";
-        $notifier = new TelegramNotifier();
-        $notifier->send($chatId, "🔔 <b>$newCount nouveau(x) message(s)</b>\n\nConsultez votre interface.");
+        if ($messageRows) {
+            multiRowInsert($pdo, "INSERT INTO messages", [
+                'id', 'conversation_id', 'from_me', 'message_text',
+                'message_date', 'message_datetime', 'api_from_user_id', 'api_status'
+            ], array_values($messageRows), "ON DUPLICATE KEY UPDATE id = id");
+        }
+
+        if ($imageRows) {
+            multiRowInsert($pdo, "INSERT INTO message_images", ['message_id', 'full_url'], array_values($imageRows), "
+                ON DUPLICATE KEY UPDATE full_url = VALUES(full_url)");
+        }
+
+        bumpStats($pdo, $newRows);
+        $pdo->commit();
     } catch (Exception $e) {
-        logDebug("⚠️ Erreur notification Telegram: " . $e->getMessage());
+        $pdo->rollBack();
+        logDebug("❌ ERREUR BATCH: " . $e->getMessage());
+        // Le client repasse alors en envoi unitaire (action=save)
+        echo json_encode(['error' => $e->getMessage(), 'new_messages' => 0]);
+        return;
+    }
+
+    logDebug("✅ BATCH: " . count($conversationRows) . " conversations, " . count($messageRows) . " messages ($totalNew nouveaux), " . count($imageRows) . " images");
+    logDebug("━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━");
+
+    if ($totalNew > 0) {
+        queueNotification($dbName, $totalNew, $newTitles);
     }
+
+    ksort($results);
+    echo json_encode([
+        'status' => 'saved',
+        'success' => true,
+        'new_messages' => $totalNew,
+        'results' => array_values($results)
+    ]);
 }
 
-// ========== AUTRES FONCTIONS ==========
+/**
+ * Dépose la notification dans outbox/ (un fichier JSON, écrit en .tmp puis renommé).
+ * Aucun appel réseau ni lecture de users.json ici : notifier.py résout le chat Telegram,
+ * regroupe les événements par utilisateur et limite le débit d'envoi.
+ */
+function queueNotification($dbName, $newCount, $titles = [])
+{
+    $dir = BASE_PATH . '/outbox';
+    if (!is_dir($dir) && !@mkdir($dir, 0775, true)) {
+        logDebug("⚠️ Outbox indisponible: $dir");
+        return;
+    }
+
+    $event = [
+        'kind' => 'new_messages',
+        'db_name' => $dbName,
+        'new_messages' => $newCount,
+        'conversations' => count($titles),
+        'titles' => array_slice($titles, 0, 20),
+        'created_at' => microtime(true)
+    ];
+    $name = sprintf('%s-%.6f-%04x.json', $dbName, microtime(true), mt_rand(0, 0xffff));
+    $tmp = "$dir/.$name.tmp";
+    if (@file_put_contents($tmp, json_encode($event, JSON_UNESCAPED_UNICODE)) === false || !@rename($tmp, "$dir/$name")) {
+        logDebug("⚠️ Notification non déposée dans l'outbox");
+    }
+}
+
+// ========== CACHE ANNONCES (annonce_cache.py) ==========
+
+function getAnnonceIndex($pdo)
+{
+    // Conversation → annonce déjà connues : le scraper n'ouvre pas le modal pour celles-ci
+    $rows = $pdo->query("
+        SELECT c.id AS conversation_id, c.user_id, a.id AS annonce_id, a.title, a.description, a.is_deleted
+        FROM conversations c
+        JOIN annonces a ON a.id = c.annonce_id
+    ")->fetchAll(PDO::FETCH_ASSOC);
+
+    echo json_encode(['success' => true, 'annonces' => $rows]);
+}
+
+// ========== IMAGES LOCALES (image_store.py) ==========
+
+function getPendingImages($pdo)
+{
+    // Pagination par clé (after = dernière URL reçue) : les URLs en échec ne bloquent pas la suite
+    $limit = max(1, min(5000, (int)($_GET['limit'] ?? 500)));
+    $after = $_GET['after'] ?? '';
+
+    $stmt = $pdo->prepare("
+        SELECT DISTINCT full_url FROM message_images
+        WHERE local_path IS NULL AND full_url > ?
+        ORDER BY full_url
+        LIMIT $limit
+    ");
+    $stmt->execute([$after]);
+
+    echo json_encode(['success' => true, 'urls' => $stmt->fetchAll(PDO::FETCH_COLUMN)]);
+}
+
+function setImagePaths($pdo)
+{
+    $data = json_decode(file_get_contents('php://input'), true);
+    if (!isset($data['images']) || !is_array($data['images'])) {
+        jsonError('images requis', 400);
+    }
+
+    // Une URL peut apparaître dans plusieurs messages : toutes ses lignes pointent vers le même fichier
+    $stmt = $pdo->prepare("UPDATE message_images SET local_path = ? WHERE full_url = ? AND local_path IS NULL");
+    $updated = 0;
+
+    $pdo->beginTransaction();
+    try {
+        foreach ($data['images'] as $image) {
+            if (empty($image['url']) || empty($image['local_path'])) {
+                continue;
+            }
+            // Même forme qu'image_store.LOCAL_PATH_RE : rien d'autre ne devient un <img src>
+            if (!preg_match('#^media/[0-9a-f]{2}/[0-9a-f]{64}\.(jpg|png|webp|gif)$#', $image['local_path'])) {
+                logDebug("⚠️ local_path refusé: " . substr($image['local_path'], 0, 120));
+                continue;
+            }
+            $stmt->execute([$image['local_path'], $image['url']]);
+            $updated += $stmt->rowCount();
+        }
+        $pdo->commit();
+    } catch (Exception $e) {
+        $pdo->rollBack();
+        jsonError('Erreur mise à jour images: ' . $e->getMessage(), 500);
+    }
+
+    logDebug("🖼️  local_path: $updated images mises à jour");
+    echo json_encode(['success' => true, 'updated' => $updated]);
+}
+
+// ========== COMPTEURS DE STATS ==========
+
+/**
+ * Compteurs matérialisés (table stats_counters) : incrémentés dans la transaction
+ * de chaque save, recomptés par COUNT(*) quand ils ont plus de STATS_RECONCILE_HOURS
+ * (ou sur ?action=stats&reconcile=1). Le recomptage rattrape ce qui ne passe pas
+ * par l'API : suppressions manuelles, bulk-load.py, bases antérieures à la table.
+ */
+function bumpStats($pdo, $deltas)
+{
+    try {
+        $stmt = $pdo->prepare("UPDATE stats_counters SET value = value + ? WHERE name = ?");
+        foreach ($deltas as $name => $delta) {
+            if ($delta > 0) {
+                $stmt->execute([$delta, $name]);
+            }
+        }
+    } catch (PDOException $e) {
+        // Table absente (base antérieure) : le prochain stats la crée et recompte
+        logDebug("⚠️ Compteurs de stats non mis à jour: " . $e->getMessage());
+    }
+}
+
+function readStats($pdo)
+{
+    $hours = defined('STATS_RECONCILE_HOURS') ? (int)STATS_RECONCILE_HOURS : 24;
+    try {
+        $stmt = $pdo->prepare("
+            SELECT name, value, reconciled_at, reconciled_at < NOW() - INTERVAL ? HOUR AS stale
+            FROM stats_counters
+        ");
+        $stmt->execute([$hours]);
+        $rows = $stmt->fetchAll(PDO::FETCH_ASSOC);
+    } catch (PDOException $e) {
+        return null;
+    }
+    $counters = [];
+    foreach ($rows as $row) {
+        $counters[$row['name']] = $row;
+    }
+    return $counters;
+}
+
+function reconcileStats($pdo)
+{
+    $pdo->exec("
+        CREATE TABLE IF NOT EXISTS stats_counters (
+            name VARCHAR(50) PRIMARY KEY,
+            value BIGINT NOT NULL DEFAULT 0,
+            reconciled_at TIMESTAMP NULL
+        ) ENGINE = InnoDB DEFAULT CHARSET = utf8mb4 COLLATE = utf8mb4_unicode_ci
+    ");
+    $before = readStats($pdo) ?: [];
+    $stmt = $pdo->prepare("
+        INSERT INTO stats_counters (name, value, reconciled_at) VALUES (?, ?, NOW())
+        ON DUPLICATE KEY UPDATE value = VALUES(value), reconciled_at = VALUES(reconciled_at)
+    ");
+    $drift = [];
+    foreach (STATS_TABLES as $table) {
+        $count = (int)$pdo->query("SELECT COUNT(*) FROM $table")->fetchColumn();
+        $stmt->execute([$table, $count]);
+        if (isset($before[$table]) && (int)$before[$table]['value'] !== $count) {
+            $drift[] = "$table " . ((int)$before[$table]['value']) . " → $count";
+        }
+    }
+    logDebug("📊 Compteurs de stats recomptés" . ($drift ? " (écarts: " . implode(', ', $drift) . ")" : ""));
+}
 
 function getStats($pdo)
 {
-    echo json_encode([
-        'annonces' => (int)$pdo->query("SELECT COUNT(*) FROM annonces")->fetchColumn(),
-        'users' => (int)$pdo->query("SELECT COUNT(*) FROM users")->fetchColumn(),
-        'conversations' => (int)$pdo->query("SELECT COUNT(*) FROM conversations")->fetchColumn(),
-        'messages' => (int)$pdo->query("SELECT COUNT(*) FROM messages")->fetchColumn()
-    ]);
+    $counters = readStats($pdo);
+    $stale = !empty($_GET['reconcile']) || $counters === null;
+    foreach (STATS_TABLES as $table) {
+        if (!isset($counters[$table]) || $counters[$table]['stale'] || $counters[$table]['reconciled_at'] === null) {
+            $stale = true;
+        }
+    }
+    if ($stale) {
+        reconcileStats($pdo);
+        $counters = readStats($pdo);
+    }
+
+    $stats = [];
+    foreach (STATS_TABLES as $table) {
+        $stats[$table] = (int)$counters[$table]['value'];
+    }
+    $stats['reconciled_at'] = min(array_column($counters, 'reconciled_at'));
+    echo json_encode($stats);
+}
+
+/**
+ * Sonde d'existence pour sync.py (choix smart / full) : s'arrête au premier message
+ */
+function hasMessages($pdo)
+{
+    $has = (bool)$pdo->query("SELECT EXISTS(SELECT 1 FROM messages)")->fetchColumn();
+    echo json_encode(['success' => true, 'has_messages' => $has]);
 }
 
+// ========== AUTRES FONCTIONS ==========
+
 function getAnnonces($pdo)
 {
     $annonces = $pdo->query("
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Lecture de l'archive JSONL (archive.py) sans passer par l'API
+
+Usage:
+    python3 archive-tool.py ls                                  # Fichiers d'archive par base
+    python3 archive-tool.py get 123456 [--db annonces_messages_bob]  # Versions archivées d'une conversation
+    python3 archive-tool.py cat archive/annonces_messages_bob/20250101-120000-001.jsonl.gz
+    python3 archive-tool.py replay --config=config/temp_bob.json [--since 20250101]  # Renvoie vers api.php
+"""
+
+import sys
+import json
+import time
+import asyncio
+import argparse
+from pathlib import Path
+
+from archive import ARCHIVE_DIR, archive_files, index_path, iter_records, find
+from ingest import SaveWorker
+
+
+def log(msg):
+    print(f'[{time.strftime("%Y-%m-%d %H:%M:%S")}][ARCHIVE] {msg}', flush=True)
+
+
+def cmd_ls(args):
+    for data_path in archive_files(args.dir, args.db):
+        idx = index_path(data_path)
+        count = sum(1 for _ in open(idx, encoding='utf-8')) if idx.exists() else 0
+        size = data_path.stat().st_size
+        print(f'{data_path.parent.name:<35} {data_path.name:<30} {count:>7} convs {size / 1_000_000:>8.1f} Mo')
+
+
+def cmd_get(args):
+    records = find(args.conversation_id, args.dir, args.db)
+    if not records:
+        log(f'❌ Conversation {args.conversation_id} absente de l\'archive')
+        return False
+    for record in records:
+        print(json.dumps(record, ensure_ascii=False, indent=None if args.compact else 2))
+    return True
+
+
+def cmd_cat(args):
+    for record in iter_records(args.file):
+        print(json.dumps(record, ensure_ascii=False))
+
+
+async def replay(args):
+    with open(args.config) as f:
+        config = json.load(f)
+    if not config.get('db_name'):
+        config['db_name'] = f'annonces_messages_{Path(args.config).stem.replace("temp_", "")}'
+
+    files = [p for p in archive_files(args.dir, config['db_name']) if p.name >= (args.since or '')]
+    log(f'🔁 {len(files)} fichier(s) vers {config["db_name"]}')
+    worker = SaveWorker(config, max_in_flight=args.concurrency, log=log)
+    try:
+        batch = []
+        pending = set()
+        for data_path in files:
+            for record in iter_records(data_path):
+                batch.append(record['payload'])
+                if len(batch) >= args.batch_size:
+                    pending.add(asyncio.ensure_future(worker.save_batch(batch)))
+                    batch = []
+                    if len(pending) >= args.concurrency:
+                        _, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        if batch:
+            pending.add(asyncio.ensure_future(worker.save_batch(batch)))
+        if pending:
+            await asyncio.wait(pending)
+        log(f'✅ {worker.summary()}')
+        return worker.stats['errors'] == 0
+    finally:
+        await worker.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Archive JSONL des conversations')
+    parser.add_argument('--dir', type=str, default=str(ARCHIVE_DIR), help='Dossier racine de l\'archive')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p_ls = sub.add_parser('ls', help='Lister les fichiers d\'archive')
+    p_ls.add_argument('--db', type=str, help='Une seule base')
+
+    p_get = sub.add_parser('get', help='Versions archivées d\'une conversation (via les index)')
+    p_get.add_argument('conversation_id')
+    p_get.add_argument('--db', type=str, help='Une seule base')
+    p_get.add_argument('--compact', action='store_true', help='Une ligne JSON par version')
+
+    p_cat = sub.add_parser('cat', help='Toutes les lignes d\'un fichier')
+    p_cat.add_argument('file', type=Path)
+
+    p_replay = sub.add_parser('replay', help='Renvoyer l\'archive d\'un utilisateur vers api.php')
+    p_replay.add_argument('--config', type=str, required=True, help='Config scraper (apiUrl, db_name)')
+    p_replay.add_argument('--since', type=str, help='Fichiers à partir de ce run (YYYYMMDD[-HHMMSS])')
+    p_replay.add_argument('--batch-size', type=int, default=20)
+    p_replay.add_argument('--concurrency', type=int, default=4)
+
+    args = parser.parse_args()
+    if args.command == 'ls':
+        cmd_ls(args)
+    elif args.command == 'get':
+        sys.exit(0 if cmd_get(args) else 1)
+    elif args.command == 'cat':
+        cmd_cat(args)
+    elif args.command == 'replay':
+        sys.exit(0 if asyncio.run(replay(args)) else 1)
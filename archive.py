@@ -0,0 +1,146 @@
+"""
+Archive brute des conversations scrapées (JSONL compressé, en ajout seul)
+
+Chaque payload remis au worker d'ingestion est aussi écrit dans
+archive/<db_name>/<run>-<n>.jsonl.gz, indépendamment de api.php :
+
+- un lot = un membre gzip (un fichier gzip multi-membres se lit avec zcat)
+- un fichier par run, coupé en parties de `max_bytes` compressés (64 Mo par défaut)
+- à côté, <run>-<n>.idx : une ligne JSON par conversation
+  {"conversation_id", "offset", "length", "line"} → on décompresse seulement
+  le membre qui la contient
+
+Une ligne d'archive : {"archived_at", "db_name", "conversation_id", "payload"}.
+L'index n'est écrit qu'après son membre : un crash laisse au pire un membre
+final sans entrée d'index, ignoré par find().
+"""
+
+import gzip
+import json
+import time
+import threading
+from pathlib import Path
+
+ARCHIVE_DIR = Path(__file__).parent / 'archive'
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+class ArchiveWriter:
+    def __init__(self, db_name, directory=None, max_bytes=DEFAULT_MAX_BYTES, compresslevel=6):
+        self.db_name = db_name
+        self.directory = Path(directory or ARCHIVE_DIR) / db_name
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.run = time.strftime('%Y%m%d-%H%M%S')
+        self.max_bytes = max_bytes
+        self.compresslevel = compresslevel
+        self.lock = threading.Lock()
+        self.part = 0
+        self.data_file = None
+        self.index_file = None
+        self.stats = {'conversations': 0, 'members': 0, 'files': 0, 'raw_bytes': 0, 'bytes': 0}
+
+    # ========== ÉCRITURE ==========
+    def write(self, payloads):
+        """Archive un lot (appelé depuis les threads du worker) ; retourne le nombre de lignes"""
+        now = time.time()
+        lines = [json.dumps({
+            'archived_at': now,
+            'db_name': self.db_name,
+            'conversation_id': payload.get('conversation_id'),
+            'payload': payload
+        }, ensure_ascii=False, separators=(',', ':')) for payload in payloads]
+        if not lines:
+            return 0
+        raw = ('\n'.join(lines) + '\n').encode('utf-8')
+        member = gzip.compress(raw, compresslevel=self.compresslevel)
+
+        with self.lock:
+            if self.data_file is None or self.data_file.tell() + len(member) > self.max_bytes:
+                self._rotate()
+            offset = self.data_file.tell()
+            self.data_file.write(member)
+            self.data_file.flush()
+            self.index_file.write(''.join(
+                json.dumps({'conversation_id': payload.get('conversation_id'), 'offset': offset,
+                            'length': len(member), 'line': k}) + '\n'
+                for k, payload in enumerate(payloads)
+            ))
+            self.index_file.flush()
+            self.stats['conversations'] += len(lines)
+            self.stats['members'] += 1
+            self.stats['raw_bytes'] += len(raw)
+            self.stats['bytes'] += len(member)
+        return len(lines)
+
+    def _rotate(self):
+        self._close_files()
+        self.part += 1
+        base = self.directory / f'{self.run}-{self.part:03d}'
+        self.data_file = open(base.with_suffix('.jsonl.gz'), 'ab')
+        self.index_file = open(base.with_suffix('.idx'), 'a', encoding='utf-8')
+        self.stats['files'] += 1
+
+    def _close_files(self):
+        for f in (self.data_file, self.index_file):
+            if f:
+                f.close()
+        self.data_file = None
+        self.index_file = None
+
+    def close(self):
+        with self.lock:
+            self._close_files()
+
+    def summary(self):
+        s = self.stats
+        ratio = s['raw_bytes'] / s['bytes'] if s['bytes'] else 0
+        return (f'{s["conversations"]} conversations, {s["files"]} fichier(s), '
+                f'{s["bytes"] / 1_000_000:.1f} Mo (x{ratio:.1f})')
+
+
+# ========== LECTURE ==========
+def archive_files(directory=None, db_name=None):
+    """Fichiers .jsonl.gz (tous les utilisateurs, ou un seul), du plus ancien au plus récent"""
+    root = Path(directory or ARCHIVE_DIR)
+    pattern = f'{db_name}/*.jsonl.gz' if db_name else '*/*.jsonl.gz'
+    return sorted(root.glob(pattern))
+
+
+def index_path(data_path):
+    return Path(str(data_path)[:-len('.jsonl.gz')] + '.idx')
+
+
+def iter_records(data_path):
+    """Toutes les lignes d'un fichier d'archive (s'arrête avant un membre final tronqué)"""
+    with gzip.open(data_path, 'rt', encoding='utf-8') as f:
+        try:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        except (EOFError, gzip.BadGzipFile, ValueError):
+            return
+
+
+def read_entry(data_path, entry):
+    """Une ligne d'archive à partir de son entrée d'index (seul son membre est décompressé)"""
+    with open(data_path, 'rb') as f:
+        f.seek(entry['offset'])
+        member = f.read(entry['length'])
+    lines = gzip.decompress(member).decode('utf-8').splitlines()
+    return json.loads(lines[entry['line']])
+
+
+def find(conversation_id, directory=None, db_name=None):
+    """Versions archivées d'une conversation, de la plus ancienne à la plus récente"""
+    conversation_id = str(conversation_id)
+    records = []
+    for data_path in archive_files(directory, db_name):
+        idx = index_path(data_path)
+        if not idx.exists():
+            continue
+        with open(idx, encoding='utf-8') as f:
+            for line in f:
+                entry = json.loads(line)
+                if str(entry.get('conversation_id')) == conversation_id:
+                    records.append(read_entry(data_path, entry))
+    return records
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Benchmark de bout en bout sur la fixture locale (fixture_server.py)
+
+Lance la fixture, puis sync.py dans chaque mode demandé, et mesure le temps
+total et le débit (conversations/s) à partir des métriques du run :
+
+- full    : base vide (stub remis à zéro, index local supprimé), toutes les conversations
+- smart   : après un full, `--touch` conversations reçoivent un nouveau message
+- firefox : comme full, avec --firefox
+
+Usage:
+    python3 benchmark.py
+    python3 benchmark.py --modes full smart --conversations 500 --latency 80 --failure-rate 0.02
+    python3 benchmark.py --extra-args --direct          # options passées à sync.py
+"""
+
+import sys
+import json
+import time
+import argparse
+import subprocess
+from pathlib import Path
+from urllib.request import Request, urlopen
+
+from fixture_server import FixtureSite, start_in_thread
+from sync_state import STATE_DIR
+
+SCRAPER_DIR = Path(__file__).parent
+BENCH_DIR = SCRAPER_DIR / 'metrics' / 'bench'
+DB_NAME = 'annonces_messages_bench'
+
+MODES = {
+    'full': ['--full'],
+    'smart': [],
+    'firefox': ['--full', '--firefox'],
+}
+
+
+def log(msg):
+    print(f'[{time.strftime("%Y-%m-%d %H:%M:%S")}][BENCH] {msg}', flush=True)
+
+
+def bench_config(base_url, max_conversations):
+    """Config scraper pointant sur la fixture (sélecteurs et timeouts de scraper-config.json)"""
+    shared = {}
+    shared_path = SCRAPER_DIR / 'scraper-config.json'
+    if shared_path.exists():
+        with open(shared_path) as f:
+            shared = json.load(f)
+    return {
+        'email': 'bench@fixture.local',
+        'password': 'bench',
+        'db_name': DB_NAME,
+        'apiUrl': f'{base_url}/api.php?action=save',
+        'maxConversations': max_conversations,
+        'timeouts': shared.get('timeouts', {}),
+        'selectors': shared.get('selectors', {}),
+        'network': shared.get('network', {})
+    }
+
+
+def control(base_url, path):
+    urlopen(Request(f'{base_url}{path}', method='POST', data=b''), timeout=10).read()
+
+
+def run_mode(mode, config_path, base_url, extra_args):
+    metrics_dir = BENCH_DIR / mode
+    metrics_dir.mkdir(parents=True, exist_ok=True)
+    cmd = [sys.executable, str(SCRAPER_DIR / 'sync.py'), f'--config={config_path}',
+           f'--target-url={base_url}/dashboard/conversations', f'--metrics={metrics_dir}'] + MODES[mode] + extra_args
+
+    started = time.time()
+    proc = subprocess.run(cmd, cwd=SCRAPER_DIR, capture_output=True, text=True)
+    wall = time.time() - started
+
+    runs = sorted(metrics_dir.glob(f'{DB_NAME}-*.json'), key=lambda p: p.stat().st_mtime)
+    metrics = json.loads(runs[-1].read_text()) if runs and runs[-1].stat().st_mtime >= started else {}
+    summary = metrics.get('summary', {})
+    conversations = summary.get('conversations', 0)
+    if proc.returncode != 0:
+        log(f'⚠️  {mode}: sync.py code {proc.returncode}')
+        log('   ' + '\n   '.join((proc.stderr or proc.stdout).strip().splitlines()[-5:]))
+    return {
+        'mode': mode,
+        'exit_code': proc.returncode,
+        'wall_seconds': round(wall, 2),
+        'conversations': conversations,
+        'conversations_per_sec': round(conversations / wall, 2) if wall else 0,
+        'new_messages': summary.get('new_messages', 0),
+        'failed': summary.get('failed', 0),
+        'phases': metrics.get('phases', {})
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark sync.py sur la fixture locale')
+    parser.add_argument('--modes', nargs='+', choices=list(MODES), default=['full', 'smart'])
+    parser.add_argument('--port', type=int, default=8780)
+    parser.add_argument('--conversations', type=int, default=300)
+    parser.add_argument('--latency', type=int, default=50, help='Latence des XHR de la fixture (ms)')
+    parser.add_argument('--jitter', type=int, default=20)
+    parser.add_argument('--failure-rate', type=float, default=0.0)
+    parser.add_argument('--touch', type=int, default=10, help='Conversations modifiées avant le mode smart')
+    parser.add_argument('--extra-args', nargs=argparse.REMAINDER, default=[], help='Options ajoutées à sync.py')
+    args = parser.parse_args()
+
+    base_url = f'http://127.0.0.1:{args.port}'
+    site = FixtureSite(args.conversations, args.latency, args.jitter, args.failure_rate, base_url=base_url)
+    server = start_in_thread(site, port=args.port)
+    log(f'🧪 Fixture: {base_url} ({args.conversations} conversations, {args.latency}±{args.jitter}ms, '
+        f'échecs {args.failure_rate:.0%})')
+
+    BENCH_DIR.mkdir(parents=True, exist_ok=True)
+    config_path = BENCH_DIR / 'bench-config.json'
+    config_path.write_text(json.dumps(bench_config(base_url, args.conversations), indent=2))
+
+    results = []
+    try:
+        for mode in args.modes:
+            if mode == 'smart':
+                control(base_url, f'/__touch?n={args.touch}')
+            else:
+                control(base_url, '/__reset')
+                for path in STATE_DIR.glob(f'{DB_NAME}.sqlite*'):
+                    path.unlink()
+            log(f'▶️  {mode}...')
+            result = run_mode(mode, config_path, base_url, args.extra_args)
+            results.append(result)
+            log(f'⏹️  {mode}: {result["conversations"]} conversations en {result["wall_seconds"]}s '
+                f'({result["conversations_per_sec"]} conv/s)')
+    finally:
+        server.shutdown()
+
+    log('')
+    log(f'{"mode":<8} {"wall (s)":>9} {"convs":>6} {"conv/s":>7} {"nouveaux":>9} {"échecs":>7}')
+    for r in results:
+        log(f'{r["mode"]:<8} {r["wall_seconds"]:>9} {r["conversations"]:>6} {r["conversations_per_sec"]:>7} '
+            f'{r["new_messages"]:>9} {r["failed"]:>7}')
+
+    report = BENCH_DIR / f'bench-{time.strftime("%Y%m%d-%H%M%S")}.json'
+    report.write_text(json.dumps({
+        'fixture': vars(args),
+        'fixture_stats': site.stats(),
+        'results': results
+    }, indent=2))
+    log(f'📈 Rapport: {report}')
+    return all(r['exit_code'] == 0 for r in results)
+
+
+if __name__ == '__main__':
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,487 @@
+#!/usr/bin/env python3
+"""
+Chargement en masse des payloads archivés dans le schéma messages (sans api.php)
+
+Sources : fichiers d'archive (archive.py, .jsonl.gz), JSONL (lignes d'archive ou
+payloads bruts) ou dossiers de .json (un payload, une liste, ou {"conversations": [...]}).
+Même logique d'upsert que api.php?action=save_batch (COALESCE sur les annonces et
+l'annonce d'une conversation, messages et images jamais écrasés), mais :
+
+- INSERT multi-lignes par paquets, une transaction pour des dizaines de milliers de lignes
+- index secondaires supprimés avant le chargement et reconstruits une fois à la fin
+- MySQL : unique_checks / foreign_key_checks désactivés pendant le chargement
+- compteurs de stats_counters recomptés à la fin (api.php ne les voit pas passer)
+
+Cibles : SQLite (--sqlite fichier) ou MySQL (--mysql base, nécessite pymysql).
+
+Usage:
+    python3 bulk-load.py archive/annonces_messages_bob --sqlite /tmp/bob.sqlite
+    python3 bulk-load.py archive/annonces_messages_bob --mysql annonces_messages_bob
+    python3 bulk-load.py dump/*.json --mysql annonces_messages_bob --host 127.0.0.1 --user root --password mysqlroot
+"""
+
+import re
+import sys
+import json
+import time
+import sqlite3
+import argparse
+from pathlib import Path
+from datetime import datetime
+
+from archive import iter_records
+
+SCRAPER_DIR = Path(__file__).parent
+SCHEMA_FILE = SCRAPER_DIR / 'schema_update.sql'
+
+TABLES = ('annonces', 'users', 'conversations', 'messages', 'message_images')
+
+# Compteurs de ?action=stats (table stats_counters, voir getStats() dans api.php)
+STATS_TABLES = ('annonces', 'users', 'conversations', 'messages')
+
+COLUMNS = {
+    'annonces': ['id', 'url', 'title', 'site', 'description', 'is_deleted'],
+    'users': ['user_id', 'user_name'],
+    'conversations': ['id', 'annonce_id', 'user_id'],
+    'messages': ['id', 'conversation_id', 'from_me', 'message_text',
+                 'message_date', 'message_datetime', 'api_from_user_id', 'api_status'],
+    'message_images': ['message_id', 'full_url'],
+}
+
+# (préfixe, suffixe) par dialecte : mêmes règles que saveConversationBatch()
+UPSERTS = {
+    'mysql': {
+        'annonces': ('INSERT INTO annonces', """ON DUPLICATE KEY UPDATE
+            url = COALESCE(VALUES(url), url),
+            title = COALESCE(VALUES(title), title),
+            site = COALESCE(VALUES(site), site),
+            description = COALESCE(VALUES(description), description),
+            is_deleted = VALUES(is_deleted)"""),
+        'users': ('INSERT IGNORE INTO users', ''),
+        'conversations': ('INSERT INTO conversations', """ON DUPLICATE KEY UPDATE
+            annonce_id = COALESCE(VALUES(annonce_id), annonce_id),
+            user_id = VALUES(user_id)"""),
+        'messages': ('INSERT INTO messages', 'ON DUPLICATE KEY UPDATE id = id'),
+        'message_images': ('INSERT INTO message_images', 'ON DUPLICATE KEY UPDATE full_url = VALUES(full_url)'),
+    },
+    'sqlite': {
+        'annonces': ('INSERT INTO annonces', """ON CONFLICT(id) DO UPDATE SET
+            url = COALESCE(excluded.url, url),
+            title = COALESCE(excluded.title, title),
+            site = COALESCE(excluded.site, site),
+            description = COALESCE(excluded.description, description),
+            is_deleted = excluded.is_deleted"""),
+        'users': ('INSERT OR IGNORE INTO users', ''),
+        'conversations': ('INSERT INTO conversations', """ON CONFLICT(id) DO UPDATE SET
+            annonce_id = COALESCE(excluded.annonce_id, annonce_id),
+            user_id = excluded.user_id"""),
+        'messages': ('INSERT OR IGNORE INTO messages', ''),
+        'message_images': ('INSERT OR IGNORE INTO message_images', ''),
+    },
+}
+
+# Index de schema_update.sql : (nom, table, colonnes, sert une clé étrangère MySQL)
+INDEXES = [
+    ('idx_conversations_annonce', 'conversations', 'annonce_id', True),
+    ('idx_conversations_user', 'conversations', 'user_id', True),
+    ('idx_messages_conversation', 'messages', 'conversation_id', True),
+    ('idx_messages_datetime', 'messages', 'message_datetime', False),
+    ('idx_annonces_deleted', 'annonces', 'is_deleted', False),
+]
+
+# schema_update.sql traduit pour SQLite
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS annonces (
+    id TEXT PRIMARY KEY,
+    url TEXT,
+    title TEXT,
+    site TEXT DEFAULT 'annonces.nc',
+    description TEXT,
+    is_deleted INTEGER DEFAULT 0,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS users (
+    user_id INTEGER PRIMARY KEY,
+    user_name TEXT,
+    name TEXT,
+    photo_url TEXT,
+    phone TEXT,
+    facebook TEXT,
+    whatsapp TEXT,
+    commentaire TEXT,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS conversations (
+    id INTEGER PRIMARY KEY,
+    annonce_id TEXT REFERENCES annonces(id) ON DELETE SET NULL,
+    user_id INTEGER REFERENCES users(user_id) ON DELETE CASCADE,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY,
+    conversation_id INTEGER NOT NULL REFERENCES conversations(id) ON DELETE CASCADE,
+    from_me INTEGER DEFAULT 0,
+    message_text TEXT,
+    message_date TEXT,
+    message_datetime TEXT,
+    api_from_user_id INTEGER,
+    api_status TEXT,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS message_images (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    message_id INTEGER NOT NULL REFERENCES messages(id) ON DELETE CASCADE,
+    full_url TEXT,
+    local_path TEXT,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE (message_id, full_url)
+);
+CREATE TABLE IF NOT EXISTS stats_counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL DEFAULT 0,
+    reconciled_at TEXT
+);
+"""
+
+
+def log(msg):
+    print(f'[{time.strftime("%Y-%m-%d %H:%M:%S")}][BULK] {msg}', flush=True)
+
+
+def parse_api_datetime(value):
+    """Équivalent de parseApiDateToDateTime() : 'Y-m-d H:i:s' ou None"""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(str(value)).strftime('%Y-%m-%d %H:%M:%S')
+    except ValueError:
+        return None
+
+
+# ========== SOURCES ==========
+def expand_sources(paths):
+    """Fichiers à lire, dans l'ordre (un dossier → ses .jsonl.gz / .jsonl / .json triés)"""
+    files = []
+    for path in map(Path, paths):
+        if path.is_dir():
+            files.extend(sorted(p for p in path.rglob('*')
+                                if p.name.endswith(('.jsonl.gz', '.jsonl', '.json'))))
+        else:
+            files.append(path)
+    return files
+
+
+def unwrap(record):
+    """Ligne d'archive {"payload": {...}} ou payload brut"""
+    return record['payload'] if isinstance(record, dict) and 'payload' in record else record
+
+
+def iter_payloads(path):
+    if path.name.endswith('.jsonl.gz'):
+        for record in iter_records(path):
+            yield unwrap(record)
+    elif path.name.endswith('.jsonl'):
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield unwrap(json.loads(line))
+    else:
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        if isinstance(data, dict) and isinstance(data.get('conversations'), list):
+            data = data['conversations']
+        for payload in data if isinstance(data, list) else [data]:
+            yield unwrap(payload)
+
+
+# ========== LIGNES ==========
+class RowBuffer:
+    """Lignes à écrire, dédoublonnées comme dans saveConversationBatch() (la dernière version gagne)"""
+
+    def __init__(self):
+        self.rows = {table: {} for table in TABLES}
+        self.conversations = 0
+
+    def add(self, conv):
+        if not isinstance(conv, dict) or not conv.get('user_id') or not conv.get('conversation_id'):
+            return False
+        info = conv.get('info') or {}
+        conversation_id = conv['conversation_id']
+        user_id = conv['user_id']
+
+        annonce_id = conv.get('annonce_id') or None
+        if annonce_id:
+            self.rows['annonces'][annonce_id] = (
+                annonce_id,
+                conv.get('annonce_url'),
+                info.get('title', 'Sans titre'),
+                info.get('site', 'annonces.nc'),
+                conv.get('annonce_description'),
+                1 if str(annonce_id).startswith('deleted_') else 0
+            )
+
+        self.rows['users'][user_id] = (user_id, info.get('user', f'Utilisateur {user_id}'))
+        self.rows['conversations'][conversation_id] = (conversation_id, annonce_id, user_id)
+
+        for msg in conv.get('messages') or []:
+            message_id = msg.get('id')
+            if not message_id:
+                continue
+            self.rows['messages'][int(message_id)] = (
+                message_id,
+                conversation_id,
+                1 if msg.get('my_message') else 0,
+                msg.get('content') or '',
+                msg.get('created_at'),
+                parse_api_datetime(msg.get('created_at')),
+                msg.get('from'),
+                msg.get('status')
+            )
+            for media in msg.get('medias') or []:
+                full_url = ((media.get('versions') or {}).get('original') or {}).get('url')
+                if full_url:
+                    self.rows['message_images'][(int(message_id), full_url)] = (message_id, full_url)
+
+        self.conversations += 1
+        return True
+
+    def __len__(self):
+        return sum(len(rows) for rows in self.rows.values())
+
+    def clear(self):
+        self.rows = {table: {} for table in TABLES}
+        self.conversations = 0
+
+
+# ========== CIBLES ==========
+class Target:
+    dialect = None
+    placeholder = '?'
+    max_params = 999
+    max_rows = 1000
+
+    def __init__(self):
+        self.conn = None
+        self.written = {table: 0 for table in TABLES}
+
+    def upsert(self, table, rows):
+        """INSERT multi-lignes par paquets (limite de paramètres du moteur)"""
+        columns = COLUMNS[table]
+        prefix, suffix = UPSERTS[self.dialect][table]
+        chunk_size = max(1, min(self.max_rows, self.max_params // len(columns)))
+        row_sql = '(' + ', '.join([self.placeholder] * len(columns)) + ')'
+        cursor = self.conn.cursor()
+        for start in range(0, len(rows), chunk_size):
+            chunk = rows[start:start + chunk_size]
+            sql = (f'{prefix} ({", ".join(columns)}) VALUES '
+                   + ', '.join([row_sql] * len(chunk)) + f' {suffix}')
+            cursor.execute(sql, [value for row in chunk for value in row])
+        cursor.close()
+        self.written[table] += len(rows)
+
+    def write(self, buffer):
+        # Ordre des clés étrangères (utile si elles sont vérifiées)
+        for table in TABLES:
+            if buffer.rows[table]:
+                self.upsert(table, list(buffer.rows[table].values()))
+
+    def commit(self):
+        self.conn.commit()
+
+    def reconcile_stats(self, upsert_sql):
+        """Recompte stats_counters après le chargement (COUNT(*) sur chaque table)"""
+        cursor = self.conn.cursor()
+        for table in STATS_TABLES:
+            cursor.execute(f'SELECT COUNT(*) FROM {table}')
+            cursor.execute(upsert_sql, (table, cursor.fetchone()[0]))
+        cursor.close()
+
+    def close(self):
+        if self.conn:
+            self.conn.close()
+
+
+class SqliteTarget(Target):
+    dialect = 'sqlite'
+    placeholder = '?'
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = Path(path)
+        # SQLITE_MAX_VARIABLE_NUMBER : 32766 depuis 3.32, 999 avant
+        self.max_params = 32766 if sqlite3.sqlite_version_info >= (3, 32, 0) else 999
+        self.conn = sqlite3.connect(str(self.path), isolation_level=None)
+
+    def prepare(self, defer_indexes=True):
+        self.conn.executescript(SQLITE_SCHEMA)
+        if defer_indexes:
+            for name, _, _, _ in INDEXES:
+                self.conn.execute(f'DROP INDEX IF EXISTS {name}')
+        # Chargement : pas de journal sur disque ni de fsync par transaction
+        self.conn.execute('PRAGMA journal_mode = MEMORY')
+        self.conn.execute('PRAGMA synchronous = OFF')
+        self.conn.execute('PRAGMA cache_size = -200000')
+        self.conn.execute('BEGIN')
+
+    def commit(self):
+        self.conn.execute('COMMIT')
+        self.conn.execute('BEGIN')
+
+    def finish(self):
+        self.conn.execute('COMMIT')
+        for name, table, columns, _ in INDEXES:
+            self.conn.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {table}({columns})')
+        self.reconcile_stats('INSERT OR REPLACE INTO stats_counters (name, value, reconciled_at) '
+                             'VALUES (?, ?, CURRENT_TIMESTAMP)')
+        self.conn.execute('PRAGMA synchronous = FULL')
+        self.conn.execute('ANALYZE')
+
+    def describe(self):
+        return f'SQLite {self.path}'
+
+
+class MysqlTarget(Target):
+    dialect = 'mysql'
+    placeholder = '%s'
+    max_params = 65535
+
+    def __init__(self, db_name, host='127.0.0.1', port=3306, user='root', password='mysqlroot'):
+        super().__init__()
+        try:
+            import pymysql
+        except ImportError:
+            raise SystemExit('❌ pymysql requis pour --mysql (pip install pymysql)')
+        if not re.fullmatch(r'[A-Za-z0-9_]+', db_name):
+            raise SystemExit(f'❌ Nom de base invalide: {db_name}')
+        self.db_name = db_name
+        self.host = host
+        self.conn = pymysql.connect(host=host, port=port, user=user, password=password,
+                                    charset='utf8mb4', autocommit=False)
+
+    def _index_exists(self, cursor, table, name):
+        cursor.execute('SELECT 1 FROM information_schema.statistics '
+                       'WHERE table_schema = %s AND table_name = %s AND index_name = %s LIMIT 1',
+                       (self.db_name, table, name))
+        return cursor.fetchone() is not None
+
+    def prepare(self, defer_indexes=True):
+        cursor = self.conn.cursor()
+        cursor.execute(f'CREATE DATABASE IF NOT EXISTS `{self.db_name}` '
+                       'CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci')
+        cursor.execute(f'USE `{self.db_name}`')
+        # Tables de schema_update.sql (ses CREATE INDEX sont rejoués par finish())
+        for statement in SCHEMA_FILE.read_text().split(';'):
+            sql = '\n'.join(line for line in statement.splitlines() if not line.strip().startswith('--')).strip()
+            if sql.upper().startswith('CREATE TABLE'):
+                cursor.execute(sql)
+        if defer_indexes:
+            # Les index qui portent une clé étrangère ne peuvent pas être supprimés
+            for name, table, _, backs_fk in INDEXES:
+                if not backs_fk and self._index_exists(cursor, table, name):
+                    cursor.execute(f'DROP INDEX {name} ON {table}')
+        cursor.execute('SET SESSION unique_checks = 0')
+        cursor.execute('SET SESSION foreign_key_checks = 0')
+        cursor.close()
+
+    def finish(self):
+        self.conn.commit()
+        cursor = self.conn.cursor()
+        cursor.execute('SET SESSION unique_checks = 1')
+        cursor.execute('SET SESSION foreign_key_checks = 1')
+        for name, table, columns, _ in INDEXES:
+            if not self._index_exists(cursor, table, name):
+                cursor.execute(f'CREATE INDEX {name} ON {table}({columns})')
+        cursor.close()
+        self.reconcile_stats('INSERT INTO stats_counters (name, value, reconciled_at) VALUES (%s, %s, NOW()) '
+                             'ON DUPLICATE KEY UPDATE value = VALUES(value), reconciled_at = VALUES(reconciled_at)')
+        self.conn.commit()
+
+    def describe(self):
+        return f'MySQL {self.host}/{self.db_name}'
+
+
+# ========== CHARGEMENT ==========
+def load(target, files, batch_size=1000, commit_rows=100_000, defer_indexes=True):
+    target.prepare(defer_indexes)
+    buffer = RowBuffer()
+    stats = {'files': 0, 'payloads': 0, 'invalid': 0, 'conversations': 0}
+    started = time.time()
+    uncommitted = 0
+
+    def flush():
+        nonlocal uncommitted
+        if not buffer.conversations:
+            return
+        uncommitted += len(buffer)
+        stats['conversations'] += buffer.conversations
+        target.write(buffer)
+        buffer.clear()
+        if uncommitted >= commit_rows:
+            target.commit()
+            uncommitted = 0
+            rows = sum(target.written.values())
+            log(f'   {stats["conversations"]} conversations, {rows} lignes '
+                f'({rows / max(time.time() - started, 1e-6):,.0f} lignes/s)')
+
+    for path in files:
+        stats['files'] += 1
+        try:
+            for payload in iter_payloads(path):
+                stats['payloads'] += 1
+                if not buffer.add(payload):
+                    stats['invalid'] += 1
+                if buffer.conversations >= batch_size:
+                    flush()
+        except (OSError, ValueError) as e:
+            log(f'⚠️  {path}: {e}')
+    flush()
+
+    load_seconds = time.time() - started
+    log('🔨 Reconstruction des index et des compteurs de stats...')
+    index_started = time.time()
+    target.finish()
+    stats['load_seconds'] = load_seconds
+    stats['index_seconds'] = time.time() - index_started
+    return stats
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Chargement en masse des payloads archivés')
+    parser.add_argument('sources', nargs='+', help='Fichiers .jsonl.gz / .jsonl / .json ou dossiers')
+    target_group = parser.add_mutually_exclusive_group(required=True)
+    target_group.add_argument('--sqlite', type=str, help='Fichier SQLite cible (créé si absent)')
+    target_group.add_argument('--mysql', type=str, help='Base MySQL cible (créée si absente)')
+    parser.add_argument('--host', type=str, default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=3306)
+    parser.add_argument('--user', type=str, default='root')
+    parser.add_argument('--password', type=str, default='mysqlroot')
+    parser.add_argument('--batch', type=int, default=1000, help='Conversations par écriture multi-lignes')
+    parser.add_argument('--commit-rows', type=int, default=100_000, help='Lignes par transaction')
+    parser.add_argument('--keep-indexes', action='store_true', help='Ne pas supprimer les index secondaires pendant le chargement')
+    args = parser.parse_args()
+
+    files = expand_sources(args.sources)
+    if not files:
+        log('❌ Aucune source trouvée')
+        sys.exit(1)
+
+    if args.sqlite:
+        target = SqliteTarget(args.sqlite)
+    else:
+        target = MysqlTarget(args.mysql, args.host, args.port, args.user, args.password)
+
+    log(f'📥 {len(files)} fichier(s) → {target.describe()}')
+    try:
+        stats = load(target, files, args.batch, args.commit_rows, not args.keep_indexes)
+    finally:
+        target.close()
+
+    total = stats['load_seconds'] + stats['index_seconds']
+    rows = sum(target.written.values())
+    log('━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━')
+    log(f'✅ {stats["conversations"]} conversations ({stats["invalid"]} payloads invalides) '
+        f'depuis {stats["files"]} fichier(s)')
+    for table in TABLES:
+        log(f'   {table:<15} {target.written[table]:>9} lignes')
+    log(f'⏱️  Chargement {stats["load_seconds"]:.1f}s ({rows / max(stats["load_seconds"], 1e-6):,.0f} lignes/s), '
+        f'index {stats["index_seconds"]:.1f}s, total {total:.1f}s')
@@ -2,5 +2,7 @@
 // Configuration de l'application
 define('BASE_URL', '/ann2');  // Ton chemin (ou '' si à la racine)
 define('BASE_PATH', __DIR__);
+define('SYNC_BUDGET', 90);    // Durée max (s) d'un sync SMART lancé depuis le web (FULL : illimité), 0 = illimité
+define('STATS_RECONCILE_HOURS', 24);  // Âge max (h) des compteurs de stats avant recomptage COUNT(*)
 $tz = @file_get_contents('/etc/timezone') ?: trim(shell_exec('readlink /etc/localtime | sed "s|.*/zoneinfo/||"'));
 if ($tz) date_default_timezone_set(trim($tz));
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Télécharge les images de messages dans media/ et remplit message_images.local_path
+
+Même travail que l'étape `sync.py --images`, mais sans navigateur : utile pour
+rattraper les images des conversations déjà en base.
+
+Usage:
+    python3 download-images.py --config=config/temp_user1.json
+    python3 download-images.py --config config/user_*.json --concurrency 16
+"""
+
+import sys
+import glob
+import json
+import time
+import asyncio
+import argparse
+from pathlib import Path
+
+from image_store import ImageDownloader
+
+
+def log(msg):
+    print(f'[{time.strftime("%Y-%m-%d %H:%M:%S")}][IMG] {msg}', flush=True)
+
+
+def load_config(path):
+    """Config scraper minimale : apiUrl + db_name (déduit du nom de fichier comme sync.py)"""
+    with open(path) as f:
+        config = json.load(f)
+    if not isinstance(config, dict) or not config.get('apiUrl'):
+        raise ValueError('apiUrl manquant')
+    if not config.get('db_name'):
+        if path.name == 'scraper-config.json':
+            config['db_name'] = 'annonces_messages_default'
+        else:
+            config['db_name'] = f'annonces_messages_{path.stem.replace("temp_", "")}'
+    return config
+
+
+async def main(paths, concurrency):
+    ok = True
+    for path in paths:
+        try:
+            config = load_config(path)
+        except (OSError, ValueError) as e:
+            log(f'⏭️  {path.name} ignoré: {e}')
+            continue
+
+        log(f'🖼️  {config["db_name"]}...')
+        downloader = ImageDownloader(config, concurrency=concurrency, log=log)
+        try:
+            stats = await downloader.run()
+            log(f'   {downloader.summary()}')
+            ok = ok and stats['failed'] == 0
+        finally:
+            await downloader.close()
+    return ok
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Téléchargement des images de messages')
+    parser.add_argument('--config', type=str, nargs='+', required=True, help='Config(s) scraper JSON (globs acceptés)')
+    parser.add_argument('--concurrency', type=int, default=8, help='Téléchargements en parallèle')
+    args = parser.parse_args()
+
+    paths = []
+    for pattern in args.config:
+        paths.extend(Path(p) for p in (sorted(glob.glob(pattern)) or [pattern]))
+
+    sys.exit(0 if asyncio.run(main(paths, args.concurrency)) else 1)
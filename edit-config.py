@@ -9,23 +9,51 @@ Usage:
     python3 edit-config.py set-max-pages 5
     python3 edit-config.py set-timeout modal 2000
     python3 edit-config.py set-selector convList ".my-custom-selector"
+    python3 edit-config.py set-direct-fetch on 4
+    python3 edit-config.py net-show
+    python3 edit-config.py net-block type image
+    python3 edit-config.py net-allow domain cdn.annonces.nc
+    python3 edit-config.py autotune [--fixture] [--login] [--percentile 95] [--margin 50] [--dry-run]
     python3 edit-config.py export
     python3 edit-config.py import config.json
     python3 edit-config.py reset
 """
 
 import sys
+import copy
 import json
+import math
+import argparse
+import tempfile
+import subprocess
 from pathlib import Path
 
+from net_filter import DEFAULT_RULES, RESOURCE_TYPES
+
 CONFIG_FILE = Path(__file__).parent / 'scraper-config.json'
 
+# Timeouts qui plafonnent une attente sur signal (mesurés par les phases wait_<nom>).
+# input/submit et betweenConvs sont des pauses, pas des attentes : autotune n'y touche pas.
+TUNABLE_TIMEOUTS = ('modal', 'loginSuccess', 'xhrTimeout', 'annonceModal', 'loadMore', 'images')
+
 DEFAULT_CONFIG = {
     "email": "",
     "password": "",
     "apiUrl": "http://127.0.0.1/ann2/api.php?action=save",
     "maxPages": 2,
     "maxConversations": 30,
+    "directFetch": False,
+    "directFetchConcurrency": 4,
+    "network": DEFAULT_RULES,
+    "circuitBreaker": 5,
+    "selectorFallbacks": [],
+    "throttle": {
+        "enabled": True,
+        "initialRate": 2,
+        "minRate": 0.2,
+        "maxRate": 10,
+        "targetLatency": 1500
+    },
     "timeouts": {
         "modal": 1500,
         "input": 200,
@@ -136,6 +164,132 @@ def set_selector(selector_name, value):
     save_config(config)
     print(f"✅ Sélecteur '{selector_name}': {value}")
 
+def set_direct_fetch(state, concurrency=None):
+    """Active/désactive le fetch direct des messages (sans clic ni attente XHR)"""
+    config = load_config()
+    config['directFetch'] = state.lower() in ('on', 'true', '1', 'oui')
+    if concurrency is not None:
+        config['directFetchConcurrency'] = int(concurrency)
+    save_config(config)
+    print(f"✅ Fetch direct: {'OUI' if config['directFetch'] else 'NON'} "
+          f"(concurrence {config.get('directFetchConcurrency', 4)})")
+    if config['directFetch'] and config.get('fetchAnnonce', True):
+        print("ℹ️  fetchAnnonce actif: seules les conversations dont l'annonce est en cache évitent le clic")
+
+def add_fallback(selectors_json):
+    """Ajoute un jeu de sélecteurs de secours (sélecteurs partiels, complétés par le jeu principal)"""
+    fallback = json.loads(selectors_json)
+    if not isinstance(fallback, dict):
+        print("❌ Attendu: un objet JSON {\"nom\": \"sélecteur\"}")
+        return
+    config = load_config()
+    unknown = [name for name in fallback if name not in config['selectors']]
+    if unknown:
+        print(f"❌ Sélecteurs inconnus: {', '.join(unknown)}")
+        return
+    config.setdefault('selectorFallbacks', []).append(fallback)
+    save_config(config)
+    print(f"✅ Jeu de secours #{len(config['selectorFallbacks'])}: {fallback}")
+
+def list_fallbacks():
+    """Liste les jeux de sélecteurs de secours"""
+    config = load_config()
+    fallbacks = config.get('selectorFallbacks', [])
+    if not fallbacks:
+        print("ℹ️  Aucun jeu de secours")
+    for k, fallback in enumerate(fallbacks, start=1):
+        print(f"  #{k}:")
+        for name, value in fallback.items():
+            print(f"    {name}: {value}")
+    print(f"Disjoncteur: {config.get('circuitBreaker', 5)} échecs structurels de suite")
+
+def clear_fallbacks():
+    config = load_config()
+    config['selectorFallbacks'] = []
+    save_config(config)
+    print("✅ Jeux de secours supprimés")
+
+def set_breaker(threshold):
+    config = load_config()
+    config['circuitBreaker'] = int(threshold)
+    save_config(config)
+    print(f"✅ Disjoncteur: {config['circuitBreaker'] or 'désactivé'}")
+
+def set_throttle(state, key=None, value=None):
+    """Débit adaptatif : on/off, ou un réglage (initialRate, minRate, maxRate, targetLatency...)"""
+    config = load_config()
+    throttle = config.setdefault('throttle', copy.deepcopy(DEFAULT_CONFIG['throttle']))
+    if state == 'set':
+        throttle[key] = float(value)
+        save_config(config)
+        print(f"✅ Débit {key}: {throttle[key]}")
+        return
+    throttle['enabled'] = state.lower() in ('on', 'true', '1', 'oui')
+    save_config(config)
+    print(f"✅ Débit adaptatif: {'OUI' if throttle['enabled'] else 'NON (pause fixe betweenConvs)'}")
+
+def get_network(config):
+    """Règles réseau de la config (complétées par les défauts)"""
+    network = copy.deepcopy(dict(DEFAULT_RULES, **config.get('network', {})))
+    config['network'] = network
+    return network
+
+def show_network():
+    """Affiche les règles de blocage réseau"""
+    network = get_network(load_config())
+    print("━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━")
+    print("🚧 BLOCAGE RÉSEAU")
+    print("━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━")
+    print(f"  Actif: {'OUI' if network['enabled'] else 'NON'}")
+    print(f"  Types bloqués: {', '.join(network['blockTypes']) or '-'}")
+    print(f"  Domaines bloqués: {', '.join(network['blockDomains']) or '-'}")
+    print(f"  Domaines autorisés: {', '.join(network['allowDomains']) or '-'}")
+    print("━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━")
+    print(f"Types possibles: {', '.join(RESOURCE_TYPES)}")
+
+def set_network(state):
+    """Active/désactive le blocage réseau"""
+    config = load_config()
+    network = get_network(config)
+    network['enabled'] = state.lower() in ('on', 'true', '1', 'oui')
+    save_config(config)
+    print(f"✅ Blocage réseau: {'OUI' if network['enabled'] else 'NON'}")
+
+def edit_network_rule(action, kind, value):
+    """net-block / net-allow / net-remove sur un type de ressource ou un domaine"""
+    config = load_config()
+    network = get_network(config)
+
+    if kind == 'type':
+        if value not in RESOURCE_TYPES:
+            print(f"❌ Type inconnu: {value} (possibles: {', '.join(RESOURCE_TYPES)})")
+            return
+        if action == 'allow':
+            print("❌ net-allow ne s'applique qu'aux domaines (retirer le type avec net-remove)")
+            return
+        keys = {'block': 'blockTypes', 'remove': ['blockTypes']}
+    elif kind == 'domain':
+        value = value.lower()
+        keys = {'block': 'blockDomains', 'allow': 'allowDomains', 'remove': ['blockDomains', 'allowDomains']}
+    else:
+        print(f"❌ Règle inconnue: {kind} (type ou domain)")
+        return
+
+    if action == 'remove':
+        removed = False
+        for key in keys['remove']:
+            if value in network[key]:
+                network[key].remove(value)
+                removed = True
+        save_config(config)
+        print(f"✅ Règle retirée: {kind} {value}" if removed else f"ℹ️  Aucune règle pour {kind} {value}")
+        return
+
+    if value not in network[keys[action]]:
+        network[keys[action]].append(value)
+    save_config(config)
+    print(f"✅ {'Bloqué' if action == 'block' else 'Autorisé'}: {kind} {value}")
+
 def list_timeouts():
     """Liste tous les timeouts disponibles"""
     config = load_config()
@@ -185,6 +339,122 @@ def import_config(filepath):
     print(f"📥 Config importée depuis {filepath}")
     show_config()
 
+def autotune(argv):
+    """Sonde instrumentée (sync.py --full sur quelques conversations) puis timeouts = percentile + marge"""
+    parser = argparse.ArgumentParser(prog='edit-config.py autotune',
+                                     description='Mesure les attentes réelles et ajuste les timeouts')
+    parser.add_argument('--config', type=Path, default=CONFIG_FILE, help='Config à mesurer et à mettre à jour')
+    parser.add_argument('--fixture', action='store_true', help='Sonder la fixture locale (fixture_server.py) au lieu du site')
+    parser.add_argument('--port', type=int, default=8780)
+    parser.add_argument('--latency', type=int, default=50, help='Latence des XHR de la fixture (ms)')
+    parser.add_argument('--sample', type=int, default=60, help='Conversations ouvertes par la sonde')
+    parser.add_argument('--login', action='store_true', help='Refaire le login (mesure modal et loginSuccess)')
+    parser.add_argument('--percentile', type=float, default=95)
+    parser.add_argument('--margin', type=float, default=50, help='Marge ajoutée au percentile (%%)')
+    parser.add_argument('--min', type=int, default=200, help='Timeout minimal (ms)')
+    parser.add_argument('--min-samples', type=int, default=5, help='Mesures nécessaires pour changer un timeout')
+    parser.add_argument('--dry-run', action='store_true', help='Afficher sans écrire')
+    args = parser.parse_args(argv)
+
+    with open(args.config) as f:
+        target = json.load(f)
+    before = dict(DEFAULT_CONFIG['timeouts'], **target.get('timeouts', {}))
+
+    # Sonde : plafonds larges pour voir la vraie distribution plutôt que des attentes coupées
+    server = None
+    sync_args = []
+    if args.fixture:
+        from benchmark import bench_config, control
+        from fixture_server import FixtureSite, start_in_thread
+        base_url = f'http://127.0.0.1:{args.port}'
+        server = start_in_thread(FixtureSite(args.sample, args.latency, base_url=base_url), port=args.port)
+        control(base_url, '/__reset')
+        probe = bench_config(base_url, args.sample)
+        probe['selectors'] = dict(probe['selectors'], **target.get('selectors', {}))
+        sync_args.append(f'--target-url={base_url}/dashboard/conversations')
+        print(f"🧪 Fixture: {base_url} ({args.sample} conversations, {args.latency}ms)")
+    else:
+        probe = copy.deepcopy(target)
+        probe['maxConversations'] = args.sample
+        # Même base que sync.py --config=<args.config> (la config de sonde a un autre nom)
+        if not probe.get('db_name'):
+            probe['db_name'] = ('annonces_messages_default' if args.config.name == 'scraper-config.json'
+                                else f'annonces_messages_{args.config.stem.replace("temp_", "")}')
+    probe['timeouts'] = {key: (min(max(value * 3, 5000), 30000) if key in TUNABLE_TIMEOUTS else value)
+                         for key, value in before.items()}
+    if args.login:
+        sync_args.append('--fresh-login')
+    # La sonde ne doit rien changer au sync de l'utilisateur : ni images, ni archive
+    probe['downloadImages'] = False
+    probe['archive'] = False
+
+    # Index local, checkpoint et métriques jetables : le --full de la sonde ne doit ni effacer
+    # le checkpoint de l'utilisateur, ni compter comme son dernier sync réussi, ni notifier
+    print(f"🔬 Sonde: {args.sample} conversations (mode full, plafonds x3)...")
+    with tempfile.TemporaryDirectory(prefix='autotune-') as scratch:
+        scratch = Path(scratch)
+        probe_path = scratch / 'probe-config.json'
+        probe_path.write_text(json.dumps(probe, indent=2))
+        try:
+            proc = subprocess.run([sys.executable, str(Path(__file__).parent / 'sync.py'), f'--config={probe_path}',
+                                   f'--metrics={scratch / "metrics"}', f'--state-dir={scratch / "state"}',
+                                   '--no-notify', '--full'] + sync_args,
+                                  cwd=Path(__file__).parent, capture_output=True, text=True)
+        finally:
+            if server:
+                server.shutdown()
+
+        runs = list((scratch / 'metrics').glob('*.json'))
+        if not runs:
+            print(f"❌ Sonde sans métriques (sync.py code {proc.returncode})")
+            print('   ' + '\n   '.join((proc.stderr or proc.stdout).strip().splitlines()[-5:]))
+            return False
+        metrics = json.loads(max(runs, key=lambda p: p.stat().st_mtime).read_text())
+    if proc.returncode != 0:
+        print(f"⚠️  sync.py code {proc.returncode} : mesures partielles")
+
+    # Percentile par rang le plus proche sur les durées brutes des attentes (ms)
+    from run_metrics import percentile
+    waits = metrics.get('waits', {})
+    after = dict(before)
+    print("━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━")
+    print(f"{'timeout':<14}{'avant':>8}{'mesures':>9}{'p50':>8}{'p' + format(args.percentile, 'g'):>8}"
+          f"{'expirées':>10}{'après':>8}")
+    print("━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━")
+    for key in TUNABLE_TIMEOUTS:
+        # samples_ms est un échantillon de taille bornée : les proportions se font sur count
+        samples = waits.get(key, {}).get('samples_ms', [])
+        count = waits.get(key, {}).get('count', len(samples))
+        expired = waits.get(key, {}).get('expired', 0)
+        note = ''
+        if count < args.min_samples or not samples:
+            note = '  (pas assez de mesures)'
+        elif expired / count > (100 - args.percentile) / 100:
+            # Le percentile tombe sur le plafond de la sonde : valeur inconnue, garder la plus large
+            after[key] = max(before[key], probe['timeouts'][key])
+            note = '  ⚠️  plafond de la sonde atteint'
+        else:
+            value = percentile(samples, args.percentile) * (1 + args.margin / 100)
+            after[key] = max(args.min, int(math.ceil(value / 50) * 50))
+        p50 = f"{percentile(samples, 50):.0f}" if samples else '-'
+        pct = f"{percentile(samples, args.percentile):.0f}" if samples else '-'
+        print(f"{key:<14}{before[key]:>8}{count:>9}{p50:>8}{pct:>8}{expired:>10}{after[key]:>8}{note}")
+    print("━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━")
+
+    conversations = metrics.get('summary', {}).get('conversations', 0)
+    gain = sum(before[k] - after[k] for k in ('xhrTimeout', 'annonceModal'))
+    print(f"Pire cas par conversation (XHR + modal annonce): {before['xhrTimeout'] + before['annonceModal']}ms → "
+          f"{after['xhrTimeout'] + after['annonceModal']}ms ({-gain:+d}ms), sonde sur {conversations} conversations")
+
+    if args.dry_run or after == before:
+        print("ℹ️  Config inchangée" + (' (--dry-run)' if args.dry_run else ''))
+        return True
+    target['timeouts'] = after
+    with open(args.config, 'w') as f:
+        json.dump(target, f, indent=2)
+    print(f"✅ Timeouts écrits dans {args.config}")
+    return True
+
 def show_help():
     """Affiche l'aide"""
     print("""
@@ -209,7 +479,7 @@ TIMEOUTS (en millisecondes):
   
   Timeouts disponibles:
     - modal, input, submit, loginSuccess
-    - xhrTimeout, annonceModal, betweenConvs
+    - xhrTimeout, annonceModal, betweenConvs (si débit adaptatif désactivé)
     - loadMore, images
 
 SÉLECTEURS CSS:
@@ -222,10 +492,39 @@ SÉLECTEURS CSS:
     - annonceBtn, annonceDesc, annonceBadge, annonceErrorMsg, annonceClose
     - images
 
+  Jeux de secours (essayés si le contrôle avant run ou le disjoncteur échoue):
+  python edit-config.py add-fallback '{"convUser": ".user-name", "annonceBtn": "button.annonce"}'
+  python edit-config.py list-fallbacks
+  python edit-config.py clear-fallbacks
+  python edit-config.py set-breaker 5          Échecs structurels de suite avant bascule/arrêt (0 = off)
+
+FETCH DIRECT (messages récupérés par ID, sans clic):
+  python edit-config.py set-direct-fetch on 4  Activer (concurrence 4)
+  python edit-config.py set-direct-fetch off   Désactiver
+
+DÉBIT ADAPTATIF (requêtes/s vers annonces.nc, remplace betweenConvs):
+  python edit-config.py throttle on|off                  Activer/désactiver
+  python edit-config.py throttle set maxRate 5           Plafond (req/s)
+  python edit-config.py throttle set targetLatency 1000  Latence au-delà de laquelle on freine (ms)
+
+BLOCAGE RÉSEAU (ressources inutiles au scraping):
+  python edit-config.py net-show                       Afficher les règles
+  python edit-config.py net on|off                     Activer/désactiver
+  python edit-config.py net-block type image           Bloquer un type de ressource
+  python edit-config.py net-block domain hotjar.com    Bloquer un domaine (et sous-domaines)
+  python edit-config.py net-allow domain annonces.nc   Toujours autoriser un domaine
+  python edit-config.py net-remove domain hotjar.com   Retirer une règle
+
 IMPORT/EXPORT:
   python edit-config.py export                 Exporter la config en JSON
   python edit-config.py import config.json     Importer une config
 
+AUTOTUNE (mesure les attentes réelles, timeouts = percentile + marge):
+  python edit-config.py autotune                         Sonde le site (60 conversations)
+  python edit-config.py autotune --login --percentile 99 --margin 30
+  python edit-config.py autotune --fixture --dry-run     Sonde la fixture locale, sans écrire
+  python edit-config.py autotune --config config/temp_bob.json
+
 RESET:
   python edit-config.py reset                  Réinitialiser aux défauts
 
@@ -257,6 +556,28 @@ if __name__ == '__main__':
         set_timeout(sys.argv[2], sys.argv[3])
     elif cmd == 'set-selector' and len(sys.argv) == 4:
         set_selector(sys.argv[2], sys.argv[3])
+    elif cmd == 'set-direct-fetch' and len(sys.argv) in (3, 4):
+        set_direct_fetch(sys.argv[2], sys.argv[3] if len(sys.argv) == 4 else None)
+    elif cmd == 'add-fallback' and len(sys.argv) == 3:
+        add_fallback(sys.argv[2])
+    elif cmd == 'list-fallbacks':
+        list_fallbacks()
+    elif cmd == 'clear-fallbacks':
+        clear_fallbacks()
+    elif cmd == 'set-breaker' and len(sys.argv) == 3:
+        set_breaker(sys.argv[2])
+    elif cmd == 'throttle' and len(sys.argv) == 3:
+        set_throttle(sys.argv[2])
+    elif cmd == 'throttle' and len(sys.argv) == 5 and sys.argv[2] == 'set':
+        set_throttle('set', sys.argv[3], sys.argv[4])
+    elif cmd == 'net-show':
+        show_network()
+    elif cmd == 'net' and len(sys.argv) == 3:
+        set_network(sys.argv[2])
+    elif cmd in ('net-block', 'net-allow', 'net-remove') and len(sys.argv) == 4:
+        edit_network_rule(cmd[len('net-'):], sys.argv[2], sys.argv[3])
+    elif cmd == 'autotune':
+        sys.exit(0 if autotune(sys.argv[2:]) else 1)
     elif cmd == 'export':
         export_config()
     elif cmd == 'import' and len(sys.argv) == 3:
@@ -0,0 +1,514 @@
+#!/usr/bin/env python3
+"""
+Faux annonces.nc en local, pour mesurer sync.py + login.js + scraper.js sans le vrai site
+
+Sert un dashboard qui reproduit le DOM attendu par les sélecteurs par défaut de
+scraper-config.json :
+
+- modal de login (mat-dialog-container annonces-login), cookie de session ;
+- sidebar des conversations (.conversations__sidebar__content > .clickable)
+  avec bouton "Voir plus" paginé en XHR ;
+- messages par XHR GET /api/conversations/{id}/messages (medias compris) ;
+- modal annonce (badge "Annonce N", description, ou "n'est plus en ligne") ;
+- images factices sous /media/.
+
+Un stub de api.php (/api.php?action=save|save_batch|stats|annonce_index|
+pending_images|set_image_paths) garde les messages en mémoire pour calculer new_messages.
+
+Contrôle : POST /__reset (vide le stub), POST /__touch?n=10 (un nouveau message
+dans les n conversations les plus récentes), GET /__stats.
+
+Usage:
+    python3 fixture_server.py --port 8780 --conversations 300 --latency 80 --failure-rate 0.02
+    python3 sync.py --config=bench.json --target-url=http://127.0.0.1:8780/dashboard/conversations
+"""
+
+import re
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+PAGE_SIZE = 25
+SESSION_COOKIE = 'fx_session'
+
+DASHBOARD_HTML = r"""<!doctype html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>annonces.nc (fixture)</title>
+<style>
+  body { font-family: sans-serif; display: flex; margin: 0; }
+  .conversations__sidebar__content { width: 360px; height: 100vh; overflow-y: auto; border-right: 1px solid #ddd; }
+  .clickable { padding: 8px; border-bottom: 1px solid #eee; cursor: pointer; }
+  .chat { flex: 1; padding: 16px; }
+  mat-dialog-container { position: fixed; top: 20%; left: 30%; width: 40%; background: #fff; border: 1px solid #999; padding: 16px; }
+  annonces-image img { width: 80px; }
+</style>
+</head>
+<body>
+<div class="conversations__sidebar__content" id="sidebar"></div>
+<div class="chat">
+  <div id="chat-actions"></div>
+  <div class="chat-content" id="chat"></div>
+</div>
+<div id="overlay"></div>
+<script>
+(function () {
+    const LOGGED_IN = __LOGGED_IN__;
+    const sidebar = document.getElementById('sidebar');
+    const chat = document.getElementById('chat');
+    const actions = document.getElementById('chat-actions');
+    const overlay = document.getElementById('overlay');
+    let page = 0;
+
+    // XHR (et pas fetch) : c'est ce que le scraper intercepte
+    function xhr(method, url, body) {
+        return new Promise((resolve, reject) => {
+            const req = new XMLHttpRequest();
+            req.open(method, url);
+            req.setRequestHeader('Content-Type', 'application/json');
+            req.onload = () => (req.status === 200 ? resolve(JSON.parse(req.responseText)) : reject(req.status));
+            req.onerror = () => reject(0);
+            req.send(body ? JSON.stringify(body) : null);
+        });
+    }
+
+    function el(tag, className, text) {
+        const node = document.createElement(tag);
+        if (className) node.className = className;
+        if (text !== undefined) node.textContent = text;
+        return node;
+    }
+
+    function addConversation(conv) {
+        const item = el('div', 'clickable');
+        item.setAttribute('ng-reflect-router-link', '/dashboard/conversations/' + conv.id);
+        item.appendChild(el('div', 'text-dark text-sm', conv.title));
+        item.appendChild(el('div', 'font-weight-normal position-relative', 'Utilisateur ' + conv.user_id));
+        item.appendChild(el('div', 'preview text-muted', conv.preview + ' · ' + conv.date));
+        item.addEventListener('click', () => openConversation(conv));
+        sidebar.appendChild(item);
+    }
+
+    async function loadPage() {
+        const button = sidebar.querySelector('button.rounded-pill');
+        if (button) button.textContent = 'Chargement...';
+        const data = await xhr('GET', '/api/conversations?page=' + page);
+        page++;
+        if (button) button.remove();
+        data.items.forEach(addConversation);
+        if (data.more) {
+            const more = el('button', 'btn btn-light rounded-pill', 'Voir plus');
+            more.addEventListener('click', loadPage);
+            sidebar.appendChild(more);
+        }
+    }
+
+    async function openConversation(conv) {
+        chat.innerHTML = '';
+        actions.innerHTML = '';
+        let messages;
+        try {
+            messages = await xhr('GET', '/api/conversations/' + conv.id + '/messages');
+        } catch (status) {
+            chat.appendChild(el('div', 'error', 'Erreur ' + status));
+            return;
+        }
+        const annonceBtn = el('button', 'btn btn-primary ml-2', "Voir l'annonce");
+        annonceBtn.addEventListener('click', () => openAnnonce(conv.annonce_id));
+        actions.appendChild(annonceBtn);
+        for (const msg of messages) {
+            const line = el('div', 'message', msg.content);
+            for (const media of msg.medias) {
+                const image = document.createElement('annonces-image');
+                const img = document.createElement('img');
+                img.setAttribute('src', media.versions.tiny.url);
+                image.appendChild(img);
+                line.appendChild(image);
+            }
+            chat.appendChild(line);
+        }
+    }
+
+    function closeModal() {
+        overlay.innerHTML = '';
+    }
+
+    async function openAnnonce(annonceId) {
+        const annonce = await xhr('GET', '/api/annonces/' + annonceId);
+        const modal = el('mat-dialog-container', 'mat-dialog-container');
+        const close = el('span', 'text-2x', '×');
+        close.addEventListener('click', closeModal);
+        modal.appendChild(close);
+        if (annonce.online) {
+            const body = el('div', 'card-body');
+            body.appendChild(el('span', 'badge badge-light text-sm', 'Annonce ' + annonce.id));
+            body.appendChild(el('div', 'pre-wrap text-justify', annonce.description));
+            modal.appendChild(body);
+        } else {
+            modal.appendChild(el('div', 'text-lg', "Cette annonce n'est plus en ligne"));
+        }
+        overlay.appendChild(modal);
+    }
+
+    function showLogin() {
+        const modal = el('mat-dialog-container', 'mat-dialog-container');
+        const login = document.createElement('annonces-login');
+        const form = document.createElement('form');
+        const email = document.createElement('input');
+        email.type = 'email';
+        const password = document.createElement('input');
+        password.type = 'password';
+        const submit = el('button', 'btn btn-primary', 'Connexion');
+        submit.type = 'submit';
+        submit.disabled = true;
+        const validate = () => { submit.disabled = !(email.value && password.value); };
+        email.addEventListener('input', validate);
+        password.addEventListener('input', validate);
+        form.addEventListener('submit', async (event) => {
+            event.preventDefault();
+            try {
+                await xhr('POST', '/api/login', { email: email.value, password: password.value });
+                modal.remove();
+                loadPage();
+            } catch (status) {
+                form.appendChild(el('div', 'error', 'Identifiants invalides'));
+            }
+        });
+        form.append(email, password, submit);
+        login.appendChild(form);
+        modal.appendChild(login);
+        overlay.appendChild(modal);
+    }
+
+    if (LOGGED_IN) {
+        loadPage();
+    } else {
+        showLogin();
+    }
+})();
+</script>
+</body>
+</html>
+"""
+
+
+class FixtureSite:
+    """Données générées (déterministes) + stub de api.php"""
+
+    def __init__(self, conversations=300, latency_ms=50, jitter_ms=20, failure_rate=0.0,
+                 gone_rate=0.1, image_rate=0.15, password=None, seed=42, base_url=''):
+        self.base_url = base_url  # URLs d'images absolues (le téléchargeur d'images les récupère)
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.failure_rate = failure_rate
+        self.password = password
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+
+        self.conversations = []
+        self.annonces = {}
+        next_message_id = 1_000_000
+        for i in range(conversations):
+            annonce_id = 70_000 + i // 3
+            self.annonces.setdefault(annonce_id, {
+                'id': annonce_id,
+                'description': f'Description de l\'annonce {annonce_id}',
+                'online': self.random.random() >= gone_rate
+            })
+            messages = []
+            for k in range(self.random.randint(2, 12)):
+                next_message_id += 1
+                messages.append(self._message(next_message_id, i, k, image_rate))
+            self.conversations.append({
+                'id': 200_000 + i,
+                'user_id': 5_000 + i,
+                'annonce_id': annonce_id,
+                'title': f'Annonce test {annonce_id}',
+                'messages': messages
+            })
+        self.next_message_id = next_message_id
+        self.image_rate = image_rate
+        self.reset()
+
+    def _message(self, message_id, conv_index, k, image_rate):
+        medias = []
+        if self.random.random() < image_rate:
+            name = f'img{message_id}'
+            medias.append({'versions': {
+                'original': {'url': f'{self.base_url}/media/{name}.jpg'},
+                'tiny': {'url': f'{self.base_url}/media/tiny_{name}.jpg'}
+            }})
+        return {
+            'id': message_id,
+            'content': f'Message {k + 1} de la conversation {conv_index}',
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%S+11:00', time.localtime(time.time() - (conv_index * 3600 + k))),
+            'my_message': k % 2 == 1,
+            'from': 5_000 + conv_index,
+            'status': 'read',
+            'medias': medias
+        }
+
+    # ========== CONTRÔLE ==========
+    def reset(self):
+        with self.lock:
+            self.saved_messages = {}
+            self.saved_conversations = {}
+            self.saved_annonces = {}
+            self.images = {}
+            self.counters = {'save_requests': 0, 'batch_requests': 0, 'messages_xhr': 0, 'failures_injected': 0}
+
+    def touch(self, n):
+        """Un nouveau message dans les n premières conversations (l'activité récente du smart mode)"""
+        with self.lock:
+            for index, conv in enumerate(self.conversations[:n]):
+                self.next_message_id += 1
+                conv['messages'].append(self._message(self.next_message_id, index, len(conv['messages']), 0))
+
+    def stats(self):
+        with self.lock:
+            return dict(self.counters, saved_messages=sum(len(ids) for ids in self.saved_messages.values()))
+
+    def delay(self):
+        if self.latency_ms or self.jitter_ms:
+            time.sleep(max(0, self.latency_ms + self.random.uniform(-self.jitter_ms, self.jitter_ms)) / 1000)
+
+    def should_fail(self):
+        if self.failure_rate and self.random.random() < self.failure_rate:
+            self.counters['failures_injected'] += 1
+            return True
+        return False
+
+    # ========== SITE ==========
+    def conversation_page(self, page):
+        items = []
+        for conv in self.conversations[page * PAGE_SIZE:(page + 1) * PAGE_SIZE]:
+            last = conv['messages'][-1]
+            items.append({
+                'id': conv['id'],
+                'user_id': conv['user_id'],
+                'annonce_id': conv['annonce_id'],
+                'title': conv['title'],
+                'preview': last['content'],
+                'date': last['created_at'][:10]
+            })
+        return {'items': items, 'more': (page + 1) * PAGE_SIZE < len(self.conversations)}
+
+    def messages(self, conversation_id):
+        self.counters['messages_xhr'] += 1
+        for conv in self.conversations:
+            if conv['id'] == conversation_id:
+                return conv['messages']
+        return None
+
+    # ========== STUB API.PHP ==========
+    def save(self, db_name, payload):
+        if not payload.get('conversation_id') or not isinstance(payload.get('messages'), list):
+            return {'error': 'conversation_id et messages requis', 'new_messages': 0}
+        with self.lock:
+            seen = self.saved_messages.setdefault(db_name, set())
+            ids = {m.get('id') for m in payload['messages'] if m.get('id')}
+            new = len(ids - seen)
+            seen.update(ids)
+            self.saved_conversations.setdefault(db_name, set()).add(payload['conversation_id'])
+            if payload.get('annonce_id'):
+                self.saved_annonces.setdefault(db_name, {})[payload['conversation_id']] = {
+                    'conversation_id': payload['conversation_id'],
+                    'annonce_id': payload['annonce_id'],
+                    'title': (payload.get('info') or {}).get('title'),
+                    'description': payload.get('annonce_description'),
+                    'is_deleted': 0
+                }
+            for image in payload.get('images', []):
+                self.images.setdefault(db_name, {}).setdefault(image.get('full'), None)
+        return {
+            'status': 'saved',
+            'success': True,
+            'conversation_id': payload['conversation_id'],
+            'messages_count': len(ids),
+            'new_messages': new,
+            'images_count': len(payload.get('images', [])),
+            'annonce_updated': 'annonce_id' in payload
+        }
+
+    def api(self, method, action, db_name, query, body):
+        if action == 'save' and method == 'POST':
+            self.counters['save_requests'] += 1
+            return self.save(db_name, body)
+        if action == 'save_batch' and method == 'POST':
+            self.counters['batch_requests'] += 1
+            results = [self.save(db_name, payload) for payload in body.get('conversations', [])]
+            return {'status': 'saved', 'success': True,
+                    'new_messages': sum(r.get('new_messages', 0) for r in results), 'results': results}
+        if action == 'stats':
+            with self.lock:
+                return {'annonces': 0, 'users': 0,
+                        'conversations': len(self.saved_conversations.get(db_name, ())),
+                        'messages': len(self.saved_messages.get(db_name, ()))}
+        if action == 'annonce_index':
+            with self.lock:
+                return {'success': True, 'annonces': list(self.saved_annonces.get(db_name, {}).values())}
+        if action == 'pending_images':
+            limit = int(query.get('limit', ['500'])[0])
+            after = query.get('after', [''])[0]
+            with self.lock:
+                urls = sorted(u for u, p in self.images.get(db_name, {}).items() if u and p is None and u > after)
+            return {'success': True, 'urls': urls[:limit]}
+        if action == 'set_image_paths' and method == 'POST':
+            updated = 0
+            with self.lock:
+                images = self.images.setdefault(db_name, {})
+                for image in body.get('images', []):
+                    if images.get(image.get('url'), '') is None:
+                        images[image['url']] = image.get('local_path')
+                        updated += 1
+            return {'success': True, 'updated': updated}
+        return None
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    site = None  # FixtureSite, défini par make_server()
+
+    def log_message(self, format, *args):
+        pass
+
+    # ========== RÉPONSES ==========
+    def send_json(self, data, status=200, headers=None):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_bytes(self, body, content_type):
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if not length:
+            return {}
+        try:
+            return json.loads(self.rfile.read(length))
+        except ValueError:
+            return {}
+
+    def logged_in(self):
+        return f'{SESSION_COOKIE}=ok' in (self.headers.get('Cookie') or '')
+
+    # ========== ROUTAGE ==========
+    def do_GET(self):
+        self.route('GET')
+
+    def do_POST(self):
+        self.route('POST')
+
+    def route(self, method):
+        site = self.site
+        url = urlsplit(self.path)
+        path, query = url.path, parse_qs(url.query)
+
+        if path == '/api.php':
+            body = self.read_json() if method == 'POST' else {}
+            db_name = self.headers.get('X-User-Database')
+            if not db_name:
+                return self.send_json({'error': 'Header X-User-Database manquant', 'success': False}, 400)
+            result = site.api(method, query.get('action', [''])[0], db_name, query, body)
+            if result is None:
+                return self.send_json({'error': 'Action invalide', 'success': False}, 400)
+            return self.send_json(result)
+
+        if path == '/__reset' and method == 'POST':
+            site.reset()
+            return self.send_json({'success': True})
+        if path == '/__touch' and method == 'POST':
+            site.touch(int(query.get('n', ['10'])[0]))
+            return self.send_json({'success': True})
+        if path == '/__stats':
+            return self.send_json(site.stats())
+
+        if path in ('/', '/dashboard/conversations'):
+            html = DASHBOARD_HTML.replace('__LOGGED_IN__', 'true' if self.logged_in() else 'false')
+            return self.send_bytes(html.encode(), 'text/html; charset=utf-8')
+
+        if path.startswith('/media/'):
+            # Octets déterministes par nom : deux URLs différentes = deux images différentes
+            return self.send_bytes(path.encode() * 200, 'image/jpeg')
+
+        if path == '/api/login' and method == 'POST':
+            site.delay()
+            body = self.read_json()
+            if not body.get('email') or not body.get('password') or (site.password and body['password'] != site.password):
+                return self.send_json({'error': 'invalid_credentials'}, 401)
+            return self.send_json({'success': True}, headers={'Set-Cookie': f'{SESSION_COOKIE}=ok; Path=/'})
+
+        if not self.logged_in():
+            return self.send_json({'error': 'unauthorized'}, 401)
+
+        if path == '/api/conversations':
+            site.delay()
+            return self.send_json(site.conversation_page(int(query.get('page', ['0'])[0])))
+
+        match = re.fullmatch(r'/api/conversations/(\d+)/messages', path)
+        if match:
+            site.delay()
+            if site.should_fail():
+                return self.send_json({'error': 'injected_failure'}, 500)
+            messages = site.messages(int(match.group(1)))
+            if messages is None:
+                return self.send_json({'error': 'not_found'}, 404)
+            return self.send_json(messages)
+
+        match = re.fullmatch(r'/api/annonces/(\d+)', path)
+        if match:
+            site.delay()
+            annonce = site.annonces.get(int(match.group(1)))
+            return self.send_json(annonce or {'id': match.group(1), 'online': False})
+
+        self.send_json({'error': 'not_found'}, 404)
+
+
+def make_server(site, host='127.0.0.1', port=8780):
+    handler = type('BoundFixtureHandler', (FixtureHandler,), {'site': site})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def start_in_thread(site, host='127.0.0.1', port=8780):
+    """Démarre le serveur en arrière-plan ; retourne le serveur (server.shutdown() pour l'arrêter)"""
+    server = make_server(site, host, port)
+    threading.Thread(target=server.serve_forever, daemon=True, name='fixture').start()
+    return server
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Faux annonces.nc local (benchmarks)')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8780)
+    parser.add_argument('--conversations', type=int, default=300, help='Nombre de conversations générées')
+    parser.add_argument('--latency', type=int, default=50, help='Latence ajoutée aux XHR du site (ms)')
+    parser.add_argument('--jitter', type=int, default=20, help='Variation de latence (± ms)')
+    parser.add_argument('--failure-rate', type=float, default=0.0, help='Part des XHR messages en erreur 500')
+    parser.add_argument('--gone-rate', type=float, default=0.1, help="Part des annonces \"plus en ligne\"")
+    parser.add_argument('--password', type=str, default=None, help='Mot de passe exigé (défaut: tout mot de passe non vide)')
+    args = parser.parse_args()
+
+    site = FixtureSite(args.conversations, args.latency, args.jitter, args.failure_rate, args.gone_rate,
+                       password=args.password, base_url=f'http://{args.host}:{args.port}')
+    server = make_server(site, args.host, args.port)
+    print(f'🧪 Fixture annonces.nc: http://{args.host}:{args.port}/dashboard/conversations '
+          f'({args.conversations} conversations, {args.latency}±{args.jitter}ms, échecs {args.failure_rate:.0%})', flush=True)
+    print(f'   API stub: http://{args.host}:{args.port}/api.php?action=save', flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,276 @@
+"""
+Téléchargement des images de messages (remplit message_images.local_path)
+
+Les URLs sans local_path sont lues via api.php?action=pending_images, puis
+téléchargées avec une concurrence bornée (session HTTP poolée, threads) :
+
+- une URL déjà téléchargée (par n'importe quel utilisateur) n'est pas refaite :
+  state/images.sqlite garde url → fichier ;
+- les fichiers sont adressés par contenu (media/<sha[:2]>/<sha256>.<ext>), deux
+  URLs qui servent la même image partagent donc le même fichier ;
+- l'extension vient du Content-Type, limité à IMAGE_TYPES (jamais de l'URL :
+  media/ est servi par Apache, un .php ou un .svg y serait exécuté ou rendu) ;
+  toute autre réponse est refusée ;
+- un téléchargement interrompu reprend depuis state/images-partial/ (Range HTTP),
+  hors de media/ comme l'index ;
+- les chemins sont renvoyés par lots à api.php?action=set_image_paths.
+
+Les chemins sont relatifs à la racine web de l'app (media/...), directement
+utilisables comme src par app.js.
+"""
+
+import re
+import time
+import shutil
+import asyncio
+import hashlib
+import sqlite3
+import contextvars
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from worker_auth import worker_headers
+
+MEDIA_DIR = Path(__file__).parent / 'media'
+STATE_DIR = Path(__file__).parent / 'state'
+INDEX_FILE = STATE_DIR / 'images.sqlite'
+PARTIAL_DIR = STATE_DIR / 'images-partial'
+
+# Seuls types stockés sous media/ (servi publiquement) : Content-Type → extension
+IMAGE_TYPES = {
+    'image/jpeg': '.jpg',
+    'image/png': '.png',
+    'image/webp': '.webp',
+    'image/gif': '.gif'
+}
+
+# Forme des chemins acceptés par api.php?action=set_image_paths
+LOCAL_PATH_RE = re.compile(r'^media/[0-9a-f]{2}/[0-9a-f]{64}\.(jpg|png|webp|gif)$')
+
+# Au-delà, une URL en échec n'est plus retentée (image supprimée côté site)
+MAX_ATTEMPTS = 3
+
+# Téléchargements en cours dans ce process (sync.py --users : plusieurs bases, mêmes URLs)
+_IN_FLIGHT = {}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS urls (
+    url TEXT PRIMARY KEY,
+    sha256 TEXT,
+    path TEXT,
+    bytes INTEGER,
+    fetched_at REAL
+);
+CREATE TABLE IF NOT EXISTS failures (
+    url TEXT PRIMARY KEY,
+    attempts INTEGER,
+    last_error TEXT,
+    updated_at REAL
+);
+"""
+
+
+def migrate_legacy_files():
+    """Index et partiels d'avant le déplacement hors de media/ (servi par Apache)"""
+    legacy_index = MEDIA_DIR / 'index.sqlite'
+    if legacy_index.exists() and not INDEX_FILE.exists():
+        legacy_index.replace(INDEX_FILE)
+    for suffix in ('-wal', '-shm'):
+        Path(f'{legacy_index}{suffix}').unlink(missing_ok=True)
+    legacy_index.unlink(missing_ok=True)
+    shutil.rmtree(MEDIA_DIR / '.partial', ignore_errors=True)
+
+
+class ImageDownloader:
+    def __init__(self, config, concurrency=8, page_size=500, timeout=30, log=print):
+        self.api_url = config['apiUrl']
+        self.headers = worker_headers(config['db_name'])
+        self.concurrency = concurrency
+        self.page_size = page_size
+        self.timeout = timeout
+        self.log = log
+
+        retry = Retry(total=3, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504),
+                      allowed_methods=None, raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=concurrency, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='image')
+
+        MEDIA_DIR.mkdir(parents=True, exist_ok=True)
+        PARTIAL_DIR.mkdir(parents=True, exist_ok=True)
+        migrate_legacy_files()
+        # Index partagé entre utilisateurs (et process) : accès depuis la boucle asyncio uniquement
+        self.index = sqlite3.connect(str(INDEX_FILE), timeout=30)
+        self.index.executescript(SCHEMA)
+
+        self.stats = {'downloaded': 0, 'reused': 0, 'deduplicated': 0, 'resumed': 0,
+                      'failed': 0, 'bytes': 0, 'updated': 0, 'seconds': 0.0}
+
+    # ========== API ==========
+    def _api(self, action):
+        return self.api_url.replace('action=save', f'action={action}')
+
+    def _pending_page(self, after):
+        response = self.session.get(self._api('pending_images'), headers=self.headers, timeout=self.timeout,
+                                    params={'limit': self.page_size, 'after': after})
+        response.raise_for_status()
+        return response.json().get('urls', [])
+
+    def _set_paths(self, images):
+        response = self.session.post(self._api('set_image_paths'), json={'images': images},
+                                     headers=self.headers, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json().get('updated', 0)
+
+    # ========== INDEX LOCAL ==========
+    def _known_path(self, url):
+        row = self.index.execute('SELECT path FROM urls WHERE url = ?', (url,)).fetchone()
+        if row and LOCAL_PATH_RE.match(row[0]) and (MEDIA_DIR.parent / row[0]).exists():
+            return row[0]
+        return None
+
+    def _gave_up(self, url):
+        row = self.index.execute('SELECT attempts FROM failures WHERE url = ?', (url,)).fetchone()
+        return bool(row) and row[0] >= MAX_ATTEMPTS
+
+    def _record(self, url, sha, path, size):
+        self.index.execute('INSERT OR REPLACE INTO urls (url, sha256, path, bytes, fetched_at) VALUES (?, ?, ?, ?, ?)',
+                           (url, sha, path, size, time.time()))
+        self.index.execute('DELETE FROM failures WHERE url = ?', (url,))
+        self.index.commit()
+
+    def _record_failure(self, url, err):
+        self.index.execute("""
+            INSERT INTO failures (url, attempts, last_error, updated_at) VALUES (?, 1, ?, ?)
+            ON CONFLICT(url) DO UPDATE SET attempts = attempts + 1, last_error = excluded.last_error,
+                                           updated_at = excluded.updated_at
+        """, (url, str(err)[:200], time.time()))
+        self.index.commit()
+
+    # ========== TÉLÉCHARGEMENT (threads) ==========
+    def _download(self, url):
+        """Télécharge (ou reprend) url → (sha256, chemin relatif, taille, dédupliquée, reprise)"""
+        partial = PARTIAL_DIR / (hashlib.sha1(url.encode()).hexdigest() + '.part')
+        type_file = partial.with_suffix('.type')  # Content-Type du premier morceau (reprise 416)
+        offset = partial.stat().st_size if partial.exists() and type_file.exists() else 0
+        headers = {'Range': f'bytes={offset}-'} if offset else {}
+
+        with self.session.get(url, headers=headers, stream=True, timeout=self.timeout) as response:
+            if response.status_code == 416 and offset:
+                resumed = True  # Le fichier partiel est déjà complet
+                content_type = type_file.read_text().strip()
+            elif response.status_code in (200, 206):
+                resumed = response.status_code == 206
+                content_type = response.headers.get('Content-Type', '').split(';')[0].strip().lower()
+                if content_type not in IMAGE_TYPES:
+                    # Refusé avant d'écrire quoi que ce soit
+                    partial.unlink(missing_ok=True)
+                    type_file.unlink(missing_ok=True)
+                    raise requests.HTTPError(f'Type refusé: {content_type or "absent"}')
+                type_file.write_text(content_type)
+                with open(partial, 'ab' if resumed else 'wb') as f:
+                    for chunk in response.iter_content(chunk_size=65536):
+                        f.write(chunk)
+            else:
+                raise requests.HTTPError(f'HTTP {response.status_code}')
+
+        sha = hashlib.sha256()
+        with open(partial, 'rb') as f:
+            for chunk in iter(lambda: f.read(65536), b''):
+                sha.update(chunk)
+        digest = sha.hexdigest()
+
+        if content_type not in IMAGE_TYPES:
+            partial.unlink(missing_ok=True)
+            type_file.unlink(missing_ok=True)
+            raise requests.HTTPError(f'Type refusé: {content_type or "absent"}')
+        final = MEDIA_DIR / digest[:2] / f'{digest}{IMAGE_TYPES[content_type]}'
+        size = partial.stat().st_size
+        deduplicated = final.exists()
+        if deduplicated:
+            partial.unlink()
+        else:
+            final.parent.mkdir(parents=True, exist_ok=True)
+            partial.replace(final)
+        type_file.unlink(missing_ok=True)
+        return digest, str(final.relative_to(MEDIA_DIR.parent)), size, deduplicated, resumed
+
+    # ========== PIPELINE ==========
+    async def _fetch_one(self, url, semaphore):
+        path = self._known_path(url)
+        if path:
+            self.stats['reused'] += 1
+            return {'url': url, 'local_path': path}
+        if self._gave_up(url):
+            return None
+        if url in _IN_FLIGHT:
+            path = await _IN_FLIGHT[url]
+            self.stats['reused'] += int(path is not None)
+            return {'url': url, 'local_path': path} if path else None
+
+        future = asyncio.get_running_loop().create_future()
+        _IN_FLIGHT[url] = future
+        try:
+            path = await self._download_and_record(url, semaphore)
+        finally:
+            del _IN_FLIGHT[url]
+            future.set_result(path)
+        return {'url': url, 'local_path': path} if path else None
+
+    async def _download_and_record(self, url, semaphore):
+        async with semaphore:
+            loop = asyncio.get_running_loop()
+            ctx = contextvars.copy_context()
+            try:
+                digest, path, size, deduplicated, resumed = await loop.run_in_executor(
+                    self.executor, ctx.run, self._download, url)
+            except (requests.RequestException, OSError) as e:
+                self.stats['failed'] += 1
+                self._record_failure(url, e)
+                return None
+
+        self._record(url, digest, path, size)
+        self.stats['deduplicated' if deduplicated else 'downloaded'] += 1
+        self.stats['resumed'] += int(resumed)
+        self.stats['bytes'] += size
+        return path
+
+    async def run(self):
+        """Télécharge toutes les images en attente de la base ; retourne les stats"""
+        started = time.time()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        after = ''
+        try:
+            while True:
+                urls = await asyncio.to_thread(self._pending_page, after)
+                if not urls:
+                    break
+                after = urls[-1]
+                done = await asyncio.gather(*(self._fetch_one(url, semaphore) for url in urls))
+                images = [img for img in done if img]
+                if images:
+                    self.stats['updated'] += await asyncio.to_thread(self._set_paths, images)
+                if len(urls) < self.page_size:
+                    break
+        except (requests.RequestException, ValueError) as e:
+            self.log(f'⚠️  Erreur API images: {e}')
+        finally:
+            self.stats['seconds'] += time.time() - started
+        return self.stats
+
+    async def close(self):
+        self.executor.shutdown(wait=True)
+        self.session.close()
+        self.index.close()
+
+    def summary(self):
+        s = self.stats
+        return (f'{s["downloaded"]} téléchargées ({s["bytes"] / 1_000_000:.1f} Mo, {s["resumed"]} reprises), '
+                f'{s["reused"]} déjà en cache, {s["deduplicated"]} doublons de contenu, {s["failed"]} échecs, '
+                f'{s["updated"]} lignes mises à jour en {s["seconds"]:.1f}s')
@@ -0,0 +1,116 @@
+"""
+Worker d'ingestion côté Python
+
+Le scraper (dans la page) remet ses lots de conversations via la binding
+window.pySaveBatch ; ce worker les envoie à api.php?action=save_batch sur une
+session HTTP poolée (keep-alive), avec retries, un nombre borné de requêtes en
+vol et donc de la contre-pression : tant qu'un créneau n'est pas libre, la
+promesse côté navigateur reste en attente.
+
+Avec un ArchiveWriter (archive.py), chaque lot est aussi ajouté à l'archive
+JSONL compressée avant l'envoi, que l'API réponde ou non.
+"""
+
+import time
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+class SaveWorker:
+    def __init__(self, config, max_in_flight=4, retries=3, timeout=30, log=print, metrics=None, archive=None):
+        self.api_url = config['apiUrl']
+        self.batch_url = self.api_url.replace('action=save', 'action=save_batch')
+        self.headers = {'X-User-Database': config['db_name']}
+        self.timeout = timeout
+        self.log = log
+        self.metrics = metrics
+        self.archive = archive
+
+        # Les saves sont des upserts : rejouer un POST est sans risque
+        retry = Retry(
+            total=retries,
+            backoff_factor=0.5,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=None,
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_in_flight, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self.max_in_flight = max_in_flight
+        self.semaphore = asyncio.Semaphore(max_in_flight)
+        self.executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix='save')
+
+        self.stats = {'batches': 0, 'conversations': 0, 'fallbacks': 0, 'errors': 0, 'seconds': 0.0}
+
+    # ========== BINDING ==========
+    async def save_batch(self, payloads):
+        """Appelée depuis la page : retourne un résultat par payload, dans l'ordre"""
+        async with self.semaphore:
+            loop = asyncio.get_running_loop()
+            # copy_context : garder le préfixe utilisateur des logs dans le thread
+            ctx = contextvars.copy_context()
+            return await loop.run_in_executor(self.executor, ctx.run, self._post_batch, payloads)
+
+    # ========== HTTP (threads) ==========
+    def _post_json(self, url, body):
+        response = self.session.post(url, json=body, headers=self.headers, timeout=self.timeout)
+        try:
+            return response.json()
+        except ValueError:
+            return {'raw': response.text[:200], 'new_messages': 0, 'error': f'HTTP {response.status_code}'}
+
+    def _post_batch(self, payloads):
+        if self.archive:
+            try:
+                self.archive.write(payloads)
+            except OSError as e:
+                self.log(f'⚠️  Archive: écriture impossible ({e})')
+        started = time.time()
+        self.stats['batches'] += 1
+        self.stats['conversations'] += len(payloads)
+        try:
+            data = self._post_json(self.batch_url, {'conversations': payloads})
+            results = data.get('results')
+            if isinstance(results, list) and len(results) == len(payloads):
+                return results
+
+            # Lot refusé : repli conversation par conversation
+            self.stats['fallbacks'] += 1
+            self.log(f'⚠️  Lot refusé ({data.get("error", "réponse invalide")}), envoi unitaire')
+            results = []
+            for payload in payloads:
+                try:
+                    results.append(self._post_json(self.api_url, payload))
+                except requests.RequestException:
+                    self.stats['errors'] += 1
+                    results.append(None)
+            return results
+
+        except requests.RequestException as e:
+            self.stats['errors'] += 1
+            self.log(f'⚠️  Erreur envoi lot: {e}')
+            return [None] * len(payloads)
+
+        finally:
+            elapsed = time.time() - started
+            self.stats['seconds'] += elapsed
+            if self.metrics:
+                self.metrics.record('save_http', elapsed)
+
+    async def close(self):
+        self.executor.shutdown(wait=True)
+        self.session.close()
+
+    def summary(self):
+        s = self.stats
+        avg = s['seconds'] / s['batches'] if s['batches'] else 0
+        return (f'{s["batches"]} lots, {s["conversations"]} conversations, '
+                f'{s["fallbacks"]} replis unitaires, {s["errors"]} erreurs, {avg:.2f}s/lot')
@@ -5,9 +5,10 @@ SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
 CONFIG_FILE="$1"
 LOG_FILE="$2"
 LOCK_FILE="$3"
+BUDGET="${4:-0}"
 
 if [ -z "$CONFIG_FILE" ] || [ -z "$LOG_FILE" ] || [ -z "$LOCK_FILE" ]; then
-    echo "Usage: $0 CONFIG_FILE LOG_FILE LOCK_FILE" >&2
+    echo "Usage: $0 CONFIG_FILE LOG_FILE LOCK_FILE [BUDGET_SECONDS]" >&2
     exit 1
 fi
 
@@ -52,8 +53,14 @@ fi
 log "Dependencies OK"
 log "Lancement scraper..."
 
+EXTRA_ARGS=""
+if [ "$BUDGET" != "0" ]; then
+    EXTRA_ARGS="--budget=$BUDGET"
+    log "Budget: ${BUDGET}s"
+fi
+
 cd "$SCRIPT_DIR"
-nohup $PYTHON_BIN -u sync.py --config="$CONFIG_FILE" >> "$LOG_FILE" 2>&1 &
+nohup $PYTHON_BIN -u sync.py --config="$CONFIG_FILE" $EXTRA_ARGS >> "$LOG_FILE" 2>&1 &
 PID=$!
 
 echo $PID > "$LOCK_FILE"
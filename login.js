@@ -8,7 +8,36 @@
         error: (msg) => console.error('[LOGIN]', msg)
     };
 
-    const wait = (ms) => new Promise(resolve => setTimeout(resolve, ms));
+    // Attente sur signal : résout dès que check() renvoie une valeur (mutation DOM),
+    // ou null après timeoutMs. Les timeouts de la config sont des plafonds, pas des pauses.
+    const waitFor = (check, timeoutMs) => new Promise(resolve => {
+        const first = check();
+        if (first) return resolve(first);
+        let timer = null;
+        const observer = new MutationObserver(() => {
+            const value = check();
+            if (value) finish(value);
+        });
+        const finish = (value) => {
+            observer.disconnect();
+            clearTimeout(timer);
+            resolve(value);
+        };
+        observer.observe(document.documentElement, { childList: true, subtree: true, attributes: true, characterData: true });
+        timer = setTimeout(() => finish(check() || null), timeoutMs);
+    });
+    const waitForSelector = (selector, timeoutMs) => waitFor(() => document.querySelector(selector), timeoutMs);
+    const waitForGone = (selector, timeoutMs) => waitFor(() => !document.querySelector(selector), timeoutMs);
+
+    // Durée réelle des attentes plafonnées (binding pyMetric de sync.py, pour edit-config.py autotune)
+    async function timedWait(key, promise) {
+        const started = performance.now();
+        const value = await promise;
+        if (typeof window.pyMetric === 'function') {
+            window.pyMetric({ wait: key, ms: performance.now() - started, expired: !value }).catch(() => {});
+        }
+        return value;
+    }
 
     S.log('━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━');
     S.log('🔐 LOGIN ANNONCES.NC');
@@ -40,12 +69,12 @@
     S.log('Config OK');
     S.log('Email: ' + config.email);
 
-    // Attendre chargement modal
-    S.log('⏳ Attente modal (' + config.timeouts.modal + 'ms)...');
-    await wait(config.timeouts.modal);
-
-    // Chercher modal
+    // Attendre la modal de login (ou la liste des conversations si déjà connecté)
+    S.log('⏳ Attente modal (max ' + config.timeouts.modal + 'ms)...');
     S.log('🔍 Recherche modal: ' + config.selectors.loginModal);
+    const convListSelector = config.selectors.convList;
+    await timedWait('modal', waitFor(() => document.querySelector(config.selectors.loginModal)
+        || (convListSelector && document.querySelector(convListSelector)), config.timeouts.modal));
     const modal = document.querySelector(config.selectors.loginModal);
 
     if (!modal) {
@@ -86,13 +115,12 @@
     emailInput.dispatchEvent(new Event('input', { bubbles: true }));
     emailInput.dispatchEvent(new Event('change', { bubbles: true }));
 
-    await wait(config.timeouts.input);
-
     passwordInput.value = config.password;
     passwordInput.dispatchEvent(new Event('input', { bubbles: true }));
     passwordInput.dispatchEvent(new Event('change', { bubbles: true }));
 
-    await wait(config.timeouts.submit);
+    // Laisser la validation du formulaire activer le bouton (plafond input + submit)
+    await waitFor(() => !submitBtn.disabled, config.timeouts.input + config.timeouts.submit);
 
     // Activer et cliquer bouton
     submitBtn.disabled = false;
@@ -102,8 +130,8 @@
     submitBtn.click();
 
     // Attendre disparition modal
-    S.log('⏳ Attente disparition modal (' + config.timeouts.loginSuccess + 'ms)...');
-    await wait(config.timeouts.loginSuccess);
+    S.log('⏳ Attente disparition modal (max ' + config.timeouts.loginSuccess + 'ms)...');
+    await timedWait('loginSuccess', waitForGone(config.selectors.loginModal, config.timeouts.loginSuccess));
 
     const stillThere = document.querySelector(config.selectors.loginModal);
 
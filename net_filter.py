@@ -0,0 +1,120 @@
+"""
+Filtrage réseau des contextes de scraping (Playwright context.route)
+
+Le scraper n'a besoin que du DOM, du JSON des messages et des URLs d'images,
+pas des octets des images, polices ou scripts tiers. Les règles sont dans la
+clé "network" de scraper-config.json (gérées par edit-config.py) :
+
+    "network": {
+        "enabled": true,
+        "blockTypes": ["image", "media", "font"],
+        "blockDomains": ["google-analytics.com", ...],
+        "allowDomains": []
+    }
+
+allowDomains est prioritaire sur les deux listes de blocage. Les requêtes
+bloquées n'ont pas de taille connue : les octets économisés sont estimés par
+type de ressource.
+
+Playwright désactive le cache HTTP d'un contexte dès qu'une route y est
+installée : chaque requête autorisée repasse par le réseau. C'est le prix du
+filtrage par type de ressource ("enabled": false rend le cache).
+"""
+
+import json
+from pathlib import Path
+from urllib.parse import urlsplit
+
+SHARED_CONFIG_FILE = Path(__file__).parent / 'scraper-config.json'
+
+DEFAULT_RULES = {
+    'enabled': True,
+    'blockTypes': ['image', 'media', 'font'],
+    'blockDomains': [
+        'google-analytics.com',
+        'googletagmanager.com',
+        'doubleclick.net',
+        'googlesyndication.com',
+        'facebook.net',
+        'hotjar.com'
+    ],
+    'allowDomains': []
+}
+
+# Types de ressource Playwright (request.resource_type)
+RESOURCE_TYPES = (
+    'document', 'stylesheet', 'image', 'media', 'font', 'script', 'texttrack',
+    'xhr', 'fetch', 'eventsource', 'websocket', 'manifest', 'other'
+)
+
+# Taille moyenne estimée d'une réponse bloquée, par type (octets)
+ESTIMATED_BYTES = {
+    'image': 60_000,
+    'media': 500_000,
+    'font': 40_000,
+    'stylesheet': 30_000,
+    'script': 80_000,
+    'other': 5_000
+}
+
+
+def resolve_rules(config):
+    """Règles de la config utilisateur, sinon celles de scraper-config.json, sinon les défauts"""
+    rules = config.get('network')
+    if rules is None and SHARED_CONFIG_FILE.exists():
+        try:
+            with open(SHARED_CONFIG_FILE) as f:
+                rules = json.load(f).get('network')
+        except (OSError, ValueError):
+            rules = None
+    return dict(DEFAULT_RULES, **(rules or {}))
+
+
+def domain_matches(host, domains):
+    """True si host est l'un des domaines ou un sous-domaine"""
+    return any(host == d or host.endswith('.' + d) for d in domains)
+
+
+class RequestFilter:
+    def __init__(self, rules, log=print):
+        self.block_types = set(rules.get('blockTypes', []))
+        self.block_domains = [d.lower() for d in rules.get('blockDomains', [])]
+        self.allow_domains = [d.lower() for d in rules.get('allowDomains', [])]
+        self.enabled = rules.get('enabled', True) and bool(self.block_types or self.block_domains)
+        self.log = log
+        self.reset_stats()
+
+    def reset_stats(self):
+        """Compteurs remis à zéro au début de chaque sync (contexte réutilisé en mode --daemon)"""
+        self.stats = {'allowed': 0, 'blocked': 0, 'bytes_saved': 0, 'by_type': {}}
+
+    def should_block(self, url, resource_type):
+        host = (urlsplit(url).hostname or '').lower()
+        if domain_matches(host, self.allow_domains):
+            return False
+        return resource_type in self.block_types or domain_matches(host, self.block_domains)
+
+    async def install(self, context):
+        if self.enabled:
+            await context.route('**/*', self._handle)
+
+    async def _handle(self, route):
+        request = route.request
+        resource_type = request.resource_type
+        if not self.should_block(request.url, resource_type):
+            self.stats['allowed'] += 1
+            await route.continue_()
+            return
+
+        self.stats['blocked'] += 1
+        self.stats['bytes_saved'] += ESTIMATED_BYTES.get(resource_type, ESTIMATED_BYTES['other'])
+        self.stats['by_type'][resource_type] = self.stats['by_type'].get(resource_type, 0) + 1
+        await route.abort('blockedbyclient')
+
+    def summary(self):
+        s = self.stats
+        if not self.enabled:
+            return 'désactivé'
+        by_type = ', '.join(f'{t}: {n}' for t, n in sorted(s['by_type'].items(), key=lambda kv: -kv[1]))
+        return (f'{s["blocked"]} requêtes bloquées ({by_type or "aucune"}), {s["allowed"]} autorisées, '
+                f'~{s["bytes_saved"] / 1_000_000:.1f} Mo économisés (estimé)')
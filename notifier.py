@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+"""
+Envoi des notifications Telegram depuis l'outbox
+
+api.php (nouveaux messages à chaque save) et sync.py (résumé de fin de sync)
+ne parlent plus à Telegram : ils déposent un événement JSON dans outbox/
+(écrit en .tmp puis renommé). Ce worker les lit, les regroupe par chat
+Telegram et envoie un seul message récapitulatif :
+
+- un chat attend `window` secondes (60) après son plus vieil événement, pour
+  regrouper la rafale de saves d'un sync ; un résumé de sync est dû tout de suite
+- au plus un message par chat toutes les `min_interval` secondes (300), les
+  événements suivants s'accumulent dans le récapitulatif suivant
+- un 429 de Telegram (retry_after), une erreur 5xx ou réseau laisse les
+  fichiers en place : ils repartent au tour suivant
+- les autres 4xx (chat introuvable, bot bloqué, HTML refusé) ne passeront
+  jamais : les événements vont dans outbox/dead/ au lieu d'être retentés
+
+Les chats sont résolus dans config/users.json (relu s'il change) : par
+db_name, puis par email ; les résumés de sync retombent sur
+admin_telegram_chat_id comme avant.
+
+Usage:
+    python3 notifier.py                  # boucle (service systemd)
+    python3 notifier.py --once           # envoie ce qui est dû puis sort (cron)
+    python3 notifier.py --status         # événements en attente par chat
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+from pathlib import Path
+
+import requests
+
+SCRAPER_DIR = Path(__file__).parent
+OUTBOX_DIR = SCRAPER_DIR / 'outbox'
+USERS_CONFIG = SCRAPER_DIR / 'config' / 'users.json'
+STATE_FILE = 'notifier.state'
+DEAD_DIR = 'dead'
+
+DEFAULT_WINDOW = 60
+DEFAULT_MIN_INTERVAL = 300
+ERROR_BACKOFF = 30
+
+# Résultats de send()
+SENT, RETRY, DEAD = 'sent', 'retry', 'dead'
+MAX_TITLES = 5
+
+
+def log(msg):
+    print(f'[{time.strftime("%Y-%m-%d %H:%M:%S")}][NOTIFY] {msg}', flush=True)
+
+
+def enqueue(event, directory=None):
+    """Dépose un événement dans l'outbox (appelé par sync.py ; api.php fait de même en PHP)"""
+    directory = Path(directory or OUTBOX_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    event = dict(event, created_at=event.get('created_at', time.time()))
+    name = f'{event.get("db_name", "default")}-{time.time():.6f}-{os.getpid()}.json'
+    tmp = directory / f'.{name}.tmp'
+    tmp.write_text(json.dumps(event, ensure_ascii=False))
+    tmp.replace(directory / name)
+    return directory / name
+
+
+class Notifier:
+    def __init__(self, directory=None, window=DEFAULT_WINDOW, min_interval=DEFAULT_MIN_INTERVAL, log=log):
+        self.directory = Path(directory or OUTBOX_DIR)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.window = window
+        self.min_interval = min_interval
+        self.log = log
+        self.session = requests.Session()
+        self._users = None
+        self._users_mtime = None
+        self._token_warned = False
+        # Par chat : dernier envoi et blocage (429 / erreur), persistés pour --once
+        self.state_path = self.directory / STATE_FILE
+        try:
+            self.state = json.loads(self.state_path.read_text())
+        except (OSError, ValueError):
+            self.state = {}
+        self.dead_dir = self.directory / DEAD_DIR
+        self.stats = {'sent': 0, 'events': 0, 'dropped': 0, 'errors': 0, 'dead': 0}
+
+    # ========== CONFIG ==========
+    def users(self):
+        """config/users.json, relu seulement s'il a changé"""
+        try:
+            mtime = USERS_CONFIG.stat().st_mtime
+        except OSError:
+            return {}
+        if mtime != self._users_mtime:
+            try:
+                self._users = json.loads(USERS_CONFIG.read_text())
+            except (OSError, ValueError) as e:
+                self.log(f'⚠️  users.json illisible: {e}')
+                return self._users or {}
+            self._users_mtime = mtime
+        return self._users
+
+    def chat_for(self, event):
+        users = self.users()
+        for user in users.get('users', []):
+            if event.get('db_name') and user.get('db_name') == event['db_name']:
+                return user.get('telegram_chat_id')
+        for user in users.get('users', []):
+            if event.get('email') and event['email'] in (user.get('email'), user.get('annonces_email')):
+                return user.get('telegram_chat_id')
+        if event.get('admin_fallback'):
+            return users.get('admin_telegram_chat_id')
+        return None
+
+    # ========== OUTBOX ==========
+    def pending(self):
+        """[(chemin, événement)] du plus ancien au plus récent ; les fichiers illisibles sont écartés"""
+        events = []
+        for path in sorted(self.directory.glob('*.json')):
+            try:
+                events.append((path, json.loads(path.read_text())))
+            except FileNotFoundError:
+                continue
+            except (OSError, ValueError) as e:
+                self.log(f'⚠️  Événement illisible écarté: {path.name} ({e})')
+                path.rename(path.with_suffix('.bad'))
+        return events
+
+    def by_chat(self):
+        chats = {}
+        for path, event in self.pending():
+            chat_id = self.chat_for(event)
+            if not chat_id:
+                # Personne à prévenir (pas de chat configuré) : comme avant, rien n'est envoyé
+                path.unlink(missing_ok=True)
+                self.stats['dropped'] += 1
+                continue
+            chats.setdefault(str(chat_id), []).append((path, event))
+        return chats
+
+    def is_due(self, chat_id, events, now):
+        state = self.state.get(chat_id, {})
+        if now < state.get('blocked_until', 0):
+            return False
+        if now - state.get('last_sent', 0) < self.min_interval:
+            return False
+        oldest = min(event.get('created_at', now) for _, event in events)
+        return any(event.get('kind') == 'sync_summary' for _, event in events) or now - oldest >= self.window
+
+    # ========== ENVOI ==========
+    def tick(self, now=None):
+        """Un passage : envoie les récapitulatifs dus ; retourne le nombre de messages envoyés"""
+        now = now or time.time()
+        users = self.users()
+        token = users.get('telegram_bot_token')
+        chats = self.by_chat()
+        if chats and not token:
+            if not self._token_warned:
+                self.log('⚠️  telegram_bot_token absent de users.json, événements conservés')
+                self._token_warned = True
+            return 0
+        self._token_warned = False
+
+        sent = 0
+        for chat_id, events in chats.items():
+            if not self.is_due(chat_id, events, now):
+                continue
+            status, retry_after = self.send(token, chat_id, digest([event for _, event in events]))
+            state = self.state.setdefault(chat_id, {})
+            if status == SENT:
+                for path, _ in events:
+                    path.unlink(missing_ok=True)
+                state['last_sent'] = now
+                state.pop('blocked_until', None)
+                sent += 1
+                self.stats['sent'] += 1
+                self.stats['events'] += len(events)
+                self.log(f'📱 Chat {chat_id}: 1 message pour {len(events)} événement(s)')
+            elif status == DEAD:
+                self.bury(events)
+                state.pop('blocked_until', None)
+                self.stats['dead'] += len(events)
+                self.log(f'🪦 Chat {chat_id}: refus définitif, {len(events)} événement(s) déplacé(s) dans {DEAD_DIR}/')
+            else:
+                state['blocked_until'] = now + (retry_after or ERROR_BACKOFF)
+                self.stats['errors'] += 1
+        self._save_state()
+        return sent
+
+    def send(self, token, chat_id, text):
+        """(SENT | RETRY | DEAD, retry_after en secondes)"""
+        try:
+            response = self.session.post(f'https://api.telegram.org/bot{token}/sendMessage', data={
+                'chat_id': chat_id,
+                'text': text,
+                'parse_mode': 'HTML',
+                'disable_web_page_preview': True
+            }, timeout=10)
+        except requests.RequestException as e:
+            self.log(f'⚠️  Chat {chat_id}: erreur réseau ({e}), nouvel essai dans {ERROR_BACKOFF}s')
+            return RETRY, None
+        if response.status_code == 200:
+            return SENT, None
+        if 400 <= response.status_code < 500 and response.status_code != 429:
+            description = ''
+            try:
+                description = response.json().get('description', '')
+            except ValueError:
+                pass
+            self.log(f'❌ Chat {chat_id}: HTTP {response.status_code} {description}'.rstrip())
+            return DEAD, None
+        retry_after = None
+        try:
+            retry_after = response.json().get('parameters', {}).get('retry_after')
+        except ValueError:
+            pass
+        self.log(f'⚠️  Chat {chat_id}: HTTP {response.status_code}'
+                 + (f', nouvel essai dans {retry_after}s' if retry_after else ''))
+        return RETRY, retry_after
+
+    def bury(self, events):
+        """Écarte des événements refusés définitivement (gardés pour inspection)"""
+        self.dead_dir.mkdir(exist_ok=True)
+        for path, _ in events:
+            try:
+                path.replace(self.dead_dir / path.name)
+            except FileNotFoundError:
+                pass
+
+    def _save_state(self):
+        tmp = self.state_path.with_suffix('.tmp')
+        tmp.write_text(json.dumps(self.state))
+        tmp.replace(self.state_path)
+
+    def summary(self):
+        s = self.stats
+        return f'{s["sent"]} messages pour {s["events"]} événements, {s["dropped"]} sans destinataire, {s["dead"]} refusés, {s["errors"]} erreurs'
+
+
+def html(text):
+    return str(text).replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+
+
+def digest(events):
+    """Un message pour tous les événements d'un chat (nouveaux messages + résumés de sync)"""
+    saves = [e for e in events if e.get('kind') == 'new_messages']
+    syncs = [e for e in events if e.get('kind') == 'sync_summary']
+    several = len({e.get('db_name') for e in events}) > 1
+    lines = []
+
+    if saves:
+        new_messages = sum(e.get('new_messages', 0) for e in saves)
+        titles = []
+        for e in saves:
+            titles += [t for t in e.get('titles', []) if t not in titles]
+        lines.append(f'🔔 <b>{new_messages} nouveau(x) message(s)</b> dans '
+                     f'{sum(e.get("conversations", 1) for e in saves)} conversation(s)')
+        if titles:
+            lines.append('')
+            lines.append('📋 <b>Annonces concernées:</b>')
+            lines += [f'  • {html(t)}' for t in titles[:MAX_TITLES]]
+            if len(titles) > MAX_TITLES:
+                lines.append(f'  • ... et {len(titles) - MAX_TITLES} autre(s)')
+
+    for e in syncs:
+        s = e.get('stats', {})
+        if lines:
+            lines.append('')
+        lines.append(f'✅ <b>Scraping {e.get("mode", "SMART")} terminé</b>'
+                     + (f' ({html(e.get("db_name"))})' if several else ''))
+        lines.append(f'📍 Source: <code>{html(e.get("host", socket.gethostname()))}</code>')
+        lines.append(f'  • Conversations: {s.get("total") or 0}')
+        lines.append(f'  • Nouveaux msgs: {s.get("total_new_messages") or 0}')
+        lines.append(f'  • Succès: {s.get("succeeded") or 0}')
+        lines.append(f'  • Échecs: {s.get("failed") or 0}')
+        lines.append(f'  • Arrêt: {html(s.get("stop_reason") or "fin normale")}')
+
+    lines.append('')
+    lines.append(f'⏰ {time.strftime("%d/%m/%Y à %H:%M")}')
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Envoi groupé des notifications Telegram (outbox/)')
+    parser.add_argument('--once', action='store_true', help='Un seul passage puis sortie')
+    parser.add_argument('--status', action='store_true', help='Afficher les événements en attente')
+    parser.add_argument('--window', type=float, default=DEFAULT_WINDOW, help='Secondes de regroupement par chat')
+    parser.add_argument('--min-interval', type=float, default=DEFAULT_MIN_INTERVAL, help='Secondes minimum entre deux messages à un même chat')
+    parser.add_argument('--poll', type=float, default=5, help='Secondes entre deux passages')
+    parser.add_argument('--dir', type=str, default=str(OUTBOX_DIR))
+    args = parser.parse_args()
+
+    notifier = Notifier(args.dir, args.window, args.min_interval)
+    if args.status:
+        for chat_id, events in notifier.by_chat().items():
+            kinds = {}
+            for _, event in events:
+                kinds[event.get('kind')] = kinds.get(event.get('kind'), 0) + 1
+            print(f'{chat_id:<15} {len(events):>5} événement(s) {kinds}')
+        return True
+    if args.once:
+        notifier.tick()
+        log(f'✅ {notifier.summary()}')
+        return True
+
+    log(f'📮 Outbox: {notifier.directory} (regroupement {args.window:g}s, 1 message / {args.min_interval:g}s par chat)')
+    try:
+        while True:
+            notifier.tick()
+            time.sleep(args.poll)
+    except KeyboardInterrupt:
+        log(f'🛑 Arrêt: {notifier.summary()}')
+    return True
+
+
+if __name__ == '__main__':
+    sys.exit(0 if main() else 1)
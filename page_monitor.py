@@ -0,0 +1,111 @@
+"""
+Mémoire de la page de scraping pendant le run (CDP Performance.getMetrics)
+
+Un run full garde dans un seul onglet toute la sidebar et chaque conversation
+ouverte : le tas JS et le nombre de nœuds DOM montent jusqu'aux pauses GC ou
+au crash de l'onglet. Le moniteur échantillonne toutes les `memorySampleSeconds`
+(15 s) et, au-delà de `recycleHeapMb` (768 Mo de tas JS utilisé) ou de
+`recycleDomNodes` (200 000 nœuds), demande au scraper de s'arrêter proprement
+(window.__scraperRecycle) : sync.py rouvre alors un contexte neuf avec la
+session courante et reprend au checkpoint. 0 désactive un seuil.
+
+Chromium seulement (pas de CDP sous Firefox : le moniteur se désactive).
+"""
+
+import time
+import asyncio
+
+from playwright.async_api import Error as PlaywrightError
+
+DEFAULT_HEAP_MB = 768
+DEFAULT_DOM_NODES = 200_000
+DEFAULT_INTERVAL = 15
+
+
+class PageMonitor:
+    def __init__(self, config, metrics=None, log=print):
+        self.heap_limit = config.get('recycleHeapMb', DEFAULT_HEAP_MB) * 1024 * 1024
+        self.nodes_limit = config.get('recycleDomNodes', DEFAULT_DOM_NODES)
+        self.interval = config.get('memorySampleSeconds', DEFAULT_INTERVAL)
+        self.metrics = metrics
+        self.log = log
+        self.page = None
+        self.cdp = None
+        self.task = None
+        self.recycle_reason = None
+        self.peak = {'heap_mb': 0.0, 'dom_nodes': 0}
+        self.last = None
+
+    async def start(self, page, context):
+        """Commence l'échantillonnage de `page` ; False si CDP indisponible"""
+        self.page = page
+        self.recycle_reason = None
+        if not self.interval:
+            return False
+        try:
+            self.cdp = await context.new_cdp_session(page)
+            await self.cdp.send('Performance.enable')
+        except PlaywrightError:
+            self.cdp = None
+            self.log('ℹ️  Mesure mémoire indisponible (CDP : Chromium seulement)')
+            return False
+        self.task = asyncio.create_task(self._run())
+        return True
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        if self.cdp:
+            try:
+                await self.cdp.detach()
+            except PlaywrightError:
+                pass
+            self.cdp = None
+
+    async def sample(self):
+        """{heap_mb, dom_nodes, listeners, documents} de la page"""
+        raw = await self.cdp.send('Performance.getMetrics')
+        values = {m['name']: m['value'] for m in raw['metrics']}
+        return {
+            't': round(time.time(), 1),
+            'heap_mb': round(values.get('JSHeapUsedSize', 0) / 1024 / 1024, 1),
+            'dom_nodes': int(values.get('Nodes', 0)),
+            'listeners': int(values.get('JSEventListeners', 0)),
+            'documents': int(values.get('Documents', 0))
+        }
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                sample = await self.sample()
+            except PlaywrightError:
+                return  # page fermée
+            self.last = sample
+            self.peak['heap_mb'] = max(self.peak['heap_mb'], sample['heap_mb'])
+            self.peak['dom_nodes'] = max(self.peak['dom_nodes'], sample['dom_nodes'])
+            if self.metrics:
+                self.metrics.record_memory(sample)
+
+            if self.recycle_reason:
+                continue
+            if self.heap_limit and sample['heap_mb'] * 1024 * 1024 > self.heap_limit:
+                self.recycle_reason = f'tas JS {sample["heap_mb"]:.0f} Mo'
+            elif self.nodes_limit and sample['dom_nodes'] > self.nodes_limit:
+                self.recycle_reason = f'{sample["dom_nodes"]} nœuds DOM'
+            if self.recycle_reason:
+                self.log(f'🧠 Seuil mémoire dépassé ({self.recycle_reason}), recyclage de la page demandé')
+                try:
+                    await self.page.evaluate('window.__scraperRecycle = true')
+                except PlaywrightError:
+                    return
+
+    def summary(self):
+        last = self.last or {}
+        return (f'pic {self.peak["heap_mb"]:.0f} Mo de tas JS, {self.peak["dom_nodes"]} nœuds DOM'
+                + (f' (dernier: {last["heap_mb"]:.0f} Mo, {last["dom_nodes"]} nœuds)' if last else ''))
@@ -0,0 +1,285 @@
+"""
+Métriques d'un run de synchronisation (durées par phase et par conversation)
+
+sync.py chronomètre ses propres phases (navigation, login, scraping...) et
+scraper.js remonte les siennes via la binding window.pyMetric (pagination,
+attente XHR, modal annonce, lots de sauvegarde, conversation complète). En fin
+de run :
+
+- metrics/<db_name>-<date>.json : phases, conversations, attentes, mémoire,
+  résumé (les METRICS_KEEP derniers runs par base sont conservés)
+- metrics/ann2_<db_name>.prom  : p50/p95/max par phase au format textfile
+  collector de node_exporter
+
+Rien ne grossit avec la longueur du run : chaque série garde compte, somme et
+max exacts plus un échantillon de taille fixe pour les percentiles (Series),
+les conversations sont agrégées par chemin (clic / direct) avec les plus lentes,
+et la courbe mémoire est décimée. Les résultats par conversation arrivent un
+par un via window.pyResult et sont réduits à des compteurs (ResultTally).
+"""
+
+import re
+import json
+import time
+import math
+import heapq
+import itertools
+import random
+from pathlib import Path
+from collections import Counter, deque
+from contextlib import contextmanager
+
+METRICS_DIR = Path(__file__).parent / 'metrics'
+METRICS_KEEP = 50          # JSON de runs gardés par base
+RESERVOIR_SIZE = 512       # valeurs gardées par série pour les percentiles
+SLOWEST_KEEP = 10          # conversations les plus lentes gardées en détail
+MEMORY_POINTS = 120        # points de la courbe mémoire
+
+
+def percentile(values, pct):
+    """Percentile par rang le plus proche (valeurs non triées)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def prom_escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Series:
+    """Compte, somme et max exacts ; échantillon réservoir (algorithme R) pour les percentiles"""
+
+    def __init__(self, size=RESERVOIR_SIZE):
+        self.size = size
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples = []
+        self._random = random.Random(0)
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value) if self.count > 1 else value
+        if len(self.samples) < self.size:
+            self.samples.append(value)
+        else:
+            slot = self._random.randrange(self.count)
+            if slot < self.size:
+                self.samples[slot] = value
+
+    def stats(self, digits=4):
+        return {
+            'count': self.count,
+            'total': round(self.total, digits),
+            'p50': round(percentile(self.samples, 50), digits),
+            'p95': round(percentile(self.samples, 95), digits),
+            'max': round(self.max, digits)
+        }
+
+
+class RunMetrics:
+    def __init__(self, db_name, mode):
+        self.db_name = db_name
+        self.mode = mode
+        self.started_at = time.time()
+        self.finished_at = None
+        self.phases = {}
+        self.conversations = {}   # chemin → {count, ms: Series, messages, images, annonces}
+        self.slowest = []         # tas des SLOWEST_KEEP conversations les plus lentes
+        self.arrivals = itertools.count()
+        self.waits = {}
+        self.memory = []
+        self.memory_stride = 1
+        self.memory_seen = 0
+        self.summary = {}
+
+    # ========== ENREGISTREMENT ==========
+    def record(self, phase, seconds):
+        self.phases.setdefault(phase, Series()).add(seconds)
+
+    def record_wait(self, key, seconds, expired=False):
+        """Attente plafonnée par timeouts[key] (phase wait_<key>) ; expired = plafond atteint"""
+        self.record(f'wait_{key}', seconds)
+        wait = self.waits.setdefault(key, {'count': 0, 'expired': 0, 'samples_ms': Series()})
+        wait['count'] += 1
+        wait['expired'] += expired
+        wait['samples_ms'].add(round(seconds * 1000))
+
+    def record_conversation(self, conv):
+        """Événement conversation de scraper.js : {index, id, ms, messages, images, path, annonce, rate}"""
+        path = conv.get('path') or 'click'
+        agg = self.conversations.setdefault(path, {'count': 0, 'ms': Series(), 'messages': 0, 'images': 0,
+                                                   'annonces': 0})
+        agg['count'] += 1
+        agg['ms'].add(conv.get('ms') or 0)
+        agg['messages'] += conv.get('messages') or 0
+        agg['images'] += conv.get('images') or 0
+        agg['annonces'] += bool(conv.get('annonce'))
+        entry = (conv.get('ms') or 0, next(self.arrivals), conv)
+        if len(self.slowest) < SLOWEST_KEEP:
+            heapq.heappush(self.slowest, entry)
+        elif entry[:2] > self.slowest[0][:2]:
+            heapq.heapreplace(self.slowest, entry)
+
+    def record_memory(self, sample):
+        """Échantillon page_monitor : {t, heap_mb, dom_nodes, listeners, documents}, courbe décimée"""
+        self.memory_seen += 1
+        if self.memory_seen % self.memory_stride:
+            return
+        self.memory.append(sample)
+        if len(self.memory) > MEMORY_POINTS:
+            self.memory = self.memory[::2]
+            self.memory_stride *= 2
+
+    @contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    def on_page_event(self, event):
+        """Binding pyMetric : {phase, ms}, {wait, ms, expired} ou {conversation: {...}}"""
+        if 'conversation' in event:
+            self.record_conversation(event['conversation'])
+        elif 'wait' in event:
+            self.record_wait(event['wait'], (event.get('ms') or 0) / 1000, bool(event.get('expired')))
+        elif 'phase' in event:
+            self.record(event['phase'], (event.get('ms') or 0) / 1000)
+        return True
+
+    # ========== AGRÉGATS ==========
+    def phase_stats(self):
+        return {name: series.stats() for name, series in self.phases.items()}
+
+    def conversation_stats(self):
+        by_path = {path: dict(agg, ms=agg['ms'].stats(0)) for path, agg in self.conversations.items()}
+        return {
+            'count': sum(agg['count'] for agg in self.conversations.values()),
+            'by_path': by_path,
+            'slowest': [conv for _, _, conv in sorted(self.slowest, key=lambda e: e[:2], reverse=True)]
+        }
+
+    def wait_stats(self):
+        """samples_ms : échantillon réservoir (au plus RESERVOIR_SIZE valeurs), lu par edit-config.py autotune"""
+        return {key: dict(wait, samples_ms=list(wait['samples_ms'].samples)) for key, wait in self.waits.items()}
+
+    def to_dict(self):
+        return {
+            'db_name': self.db_name,
+            'mode': self.mode,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'duration': round((self.finished_at or time.time()) - self.started_at, 3),
+            'phases': self.phase_stats(),
+            'conversations': self.conversation_stats(),
+            'waits': self.wait_stats(),
+            'memory': {'samples': self.memory_seen, 'every': self.memory_stride, 'points': self.memory},
+            'summary': self.summary
+        }
+
+    # ========== ÉCRITURE ==========
+    def finish(self, **summary):
+        self.finished_at = time.time()
+        self.summary.update(summary)
+
+    def write(self, directory=None):
+        """Écrit le JSON détaillé et le fichier Prometheus ; retourne le chemin du JSON"""
+        directory = Path(directory) if directory else METRICS_DIR
+        directory.mkdir(parents=True, exist_ok=True)
+        if self.finished_at is None:
+            self.finish()
+
+        stamp = time.strftime('%Y%m%d-%H%M%S', time.localtime(self.started_at))
+        json_path = directory / f'{self.db_name}-{stamp}.json'
+        self._write_atomic(json_path, json.dumps(self.to_dict(), indent=2, default=str))
+        self._write_atomic(directory / f'ann2_{self.db_name}.prom', self.to_prometheus())
+        self.prune(directory)
+        return json_path
+
+    def prune(self, directory, keep=METRICS_KEEP):
+        """Ne garde que les `keep` JSON de runs les plus récents de cette base"""
+        pattern = re.compile(re.escape(self.db_name) + r'-\d{8}-\d{6}\.json$')
+        runs = sorted((p for p in directory.glob(f'{self.db_name}-*.json') if pattern.match(p.name)),
+                      key=lambda p: p.name, reverse=True)
+        for path in runs[keep:]:
+            try:
+                path.unlink()
+            except OSError:
+                pass
+
+    def to_prometheus(self):
+        db = prom_escape(self.db_name)
+        lines = [
+            '# HELP ann2_phase_seconds Durée des phases du dernier sync (p50/p95/max)',
+            '# TYPE ann2_phase_seconds gauge'
+        ]
+        stats = self.phase_stats()
+        for name, s in sorted(stats.items()):
+            for stat in ('p50', 'p95', 'max'):
+                lines.append(f'ann2_phase_seconds{{db="{db}",phase="{prom_escape(name)}",stat="{stat}"}} {s[stat]}')
+        lines += ['# HELP ann2_phase_count Nombre de mesures par phase', '# TYPE ann2_phase_count gauge']
+        for name, s in sorted(stats.items()):
+            lines.append(f'ann2_phase_count{{db="{db}",phase="{prom_escape(name)}"}} {s["count"]}')
+
+        lines += ['# HELP ann2_run_info Résumé du dernier sync', '# TYPE ann2_run_info gauge']
+        for key, value in sorted(self.summary.items()):
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                lines.append(f'ann2_run_info{{db="{db}",field="{prom_escape(key)}"}} {value}')
+        lines += ['# HELP ann2_run_timestamp_seconds Fin du dernier sync', '# TYPE ann2_run_timestamp_seconds gauge']
+        lines.append(f'ann2_run_timestamp_seconds{{db="{db}"}} {int(self.finished_at or time.time())}')
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def _write_atomic(path, content):
+        tmp = path.with_suffix(path.suffix + '.tmp')
+        tmp.write_text(content)
+        tmp.replace(path)
+
+
+class ResultTally:
+    """Binding pyResult : {index, conversation_id, success, new_messages, error} → compteurs"""
+
+    def __init__(self, log=print, progress_every=100, keep_errors=10):
+        self.log = log
+        self.progress_every = progress_every
+        self.succeeded = 0
+        self.failed = 0
+        self.new_messages = 0
+        self.with_new = 0
+        self.errors = Counter()
+        self.last_errors = deque(maxlen=keep_errors)
+
+    def on_result(self, result):
+        if result.get('success'):
+            self.succeeded += 1
+            self.new_messages += result.get('new_messages') or 0
+            self.with_new += bool(result.get('new_messages'))
+        else:
+            self.failed += 1
+            cause = str(result.get('error') or 'inconnue')[:80]
+            self.errors[cause] += 1
+            self.last_errors.append({'index': result.get('index'), 'conversation_id': result.get('conversation_id'),
+                                     'error': cause})
+        total = self.succeeded + self.failed
+        if self.progress_every and total % self.progress_every == 0:
+            self.log(f'📊 {self.summary()}')
+        return True
+
+    def summary(self):
+        return (f'{self.succeeded + self.failed} résultats: {self.succeeded} OK '
+                f'({self.with_new} avec nouveaux messages, {self.new_messages} messages), {self.failed} échecs')
+
+    def to_dict(self):
+        return {
+            'succeeded': self.succeeded,
+            'failed': self.failed,
+            'new_messages': self.new_messages,
+            'errors': dict(self.errors.most_common()),
+            'last_errors': list(self.last_errors)
+        }
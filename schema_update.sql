@@ -61,6 +61,13 @@ CREATE TABLE IF NOT EXISTS message_images (
     UNIQUE KEY unique_message_image (message_id, full_url(255))
 ) ENGINE = InnoDB DEFAULT CHARSET = utf8mb4 COLLATE = utf8mb4_unicode_ci;
 
+-- Compteurs de lignes pour ?action=stats (tenus par api.php, recomptés périodiquement)
+CREATE TABLE IF NOT EXISTS stats_counters (
+    name VARCHAR(50) PRIMARY KEY,
+    value BIGINT NOT NULL DEFAULT 0,
+    reconciled_at TIMESTAMP NULL
+) ENGINE = InnoDB DEFAULT CHARSET = utf8mb4 COLLATE = utf8mb4_unicode_ci;
+
 -- Index pour performances
 CREATE INDEX idx_conversations_annonce ON conversations(annonce_id);
 
@@ -14,6 +14,128 @@
 
     const wait = (ms) => new Promise(resolve => setTimeout(resolve, ms));
 
+    // Attente sur signal : résout dès que check() renvoie une valeur (mutation DOM),
+    // ou null après timeoutMs. Les timeouts de la config sont des plafonds, pas des pauses.
+    const waitFor = (check, timeoutMs) => new Promise(resolve => {
+        const first = check();
+        if (first) return resolve(first);
+        let timer = null;
+        const observer = new MutationObserver(() => {
+            const value = check();
+            if (value) finish(value);
+        });
+        const finish = (value) => {
+            observer.disconnect();
+            clearTimeout(timer);
+            resolve(value);
+        };
+        observer.observe(document.documentElement, { childList: true, subtree: true, attributes: true, characterData: true });
+        timer = setTimeout(() => finish(check() || null), timeoutMs);
+    });
+    const waitForSelector = (selector, timeoutMs) => waitFor(() => document.querySelector(selector), timeoutMs);
+    const waitForGone = (selector, timeoutMs) => waitFor(() => !document.querySelector(selector), timeoutMs);
+
+    // Timings remontés à sync.py (run_metrics.py) ; sans la binding, rien n'est mesuré
+    const metric = typeof window.pyMetric === 'function'
+        ? (event) => { window.pyMetric(event).catch(() => {}); }
+        : () => {};
+    async function timed(phase, fn) {
+        const started = performance.now();
+        try {
+            return await fn();
+        } finally {
+            metric({ phase: phase, ms: performance.now() - started });
+        }
+    }
+    // Attente plafonnée par CONFIG.timeouts[key] : durée réelle et expiration (edit-config.py autotune)
+    async function timedWait(key, promise) {
+        const started = performance.now();
+        const value = await promise;
+        metric({ wait: key, ms: performance.now() - started, expired: !value });
+        return value;
+    }
+
+    // ========== DÉBIT ADAPTATIF (AIMD) ==========
+    // Remplace la pause fixe betweenConvs : un débit cible (requêtes/s vers annonces.nc) qui
+    // augmente de `step` tant que les réponses sont rapides et saines, et est multiplié par
+    // `backoff` sur réponse lente (> targetLatency), HTTP 429/5xx ou timeout XHR.
+    function createThrottle(options) {
+        const o = Object.assign({
+            initialRate: 2, minRate: 0.2, maxRate: 10, step: 0.25,
+            backoff: 0.5, slowBackoff: 0.8, targetLatency: 1500, cooldown: 1000
+        }, options || {});
+        const t = {
+            rate: o.initialRate,
+            minSeen: o.initialRate,
+            maxSeen: o.initialRate,
+            increases: 0,
+            decreases: 0,
+            waitedMs: 0,
+            lastDecrease: 0,
+            nextSlot: 0,
+            pausedUntil: 0
+        };
+
+        function clamp() {
+            t.rate = Math.min(o.maxRate, Math.max(o.minRate, t.rate));
+            t.minSeen = Math.min(t.minSeen, t.rate);
+            t.maxSeen = Math.max(t.maxSeen, t.rate);
+        }
+
+        // Une seule baisse par `cooldown` : une rafale d'échecs simultanés ne divise pas le débit N fois
+        function decrease(factor, reason) {
+            const now = performance.now();
+            if (now - t.lastDecrease < o.cooldown) return;
+            t.lastDecrease = now;
+            const before = t.rate;
+            t.rate *= factor;
+            clamp();
+            t.decreases++;
+            S.log('   🐢 Débit ' + before.toFixed(2) + ' → ' + t.rate.toFixed(2) + ' req/s (' + reason + ')');
+        }
+
+        return {
+            // Attend le prochain créneau (1/rate secondes après le précédent)
+            async acquire() {
+                const now = performance.now();
+                const slot = Math.max(now, t.nextSlot, t.pausedUntil);
+                t.nextSlot = slot + 1000 / t.rate;
+                if (slot > now) {
+                    t.waitedMs += slot - now;
+                    await wait(slot - now);
+                }
+            },
+            // Résultat d'une requête : latence (ms), statut HTTP (0 = timeout), Retry-After éventuel (s)
+            report(latencyMs, status, retryAfter) {
+                if (status === 429 || status >= 500 || status === 0) {
+                    if (retryAfter > 0) {
+                        t.pausedUntil = Math.max(t.pausedUntil, performance.now() + retryAfter * 1000);
+                    }
+                    decrease(o.backoff, status ? 'HTTP ' + status : 'timeout');
+                } else if (latencyMs > o.targetLatency) {
+                    decrease(o.slowBackoff, 'réponse lente ' + Math.round(latencyMs) + 'ms');
+                } else if (status < 400) {
+                    t.rate += o.step;
+                    clamp();
+                    t.increases++;
+                }
+            },
+            get rate() {
+                return t.rate;
+            },
+            stats() {
+                return {
+                    rate: Math.round(t.rate * 100) / 100,
+                    min_rate: Math.round(t.minSeen * 100) / 100,
+                    max_rate: Math.round(t.maxSeen * 100) / 100,
+                    increases: t.increases,
+                    decreases: t.decreases,
+                    waited_ms: Math.round(t.waitedMs)
+                };
+            }
+        };
+    }
+
     S.log('━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━');
     S.log('🚀 SCRAPER ANNONCES.NC');
     S.log('━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━');
@@ -40,12 +162,57 @@
     // Option pour désactiver la recherche d'annonce (par défaut: activée)
     const FETCH_ANNONCE = CONFIG.fetchAnnonce !== false;
 
+    // Mode direct: récupère les messages par ID via l'API du site au lieu de cliquer/attendre l'XHR
+    const DIRECT_FETCH = CONFIG.directFetch === true;
+    const DIRECT_CONCURRENCY = CONFIG.directFetchConcurrency || 4;
+
+    // Sauvegarde par lots (api.php?action=save_batch). En smart, des lots courts
+    // pour ne pas retarder la détection des collisions. 1 = une requête par conversation.
+    const SAVE_BATCH_SIZE = CONFIG.saveBatchSize || (SMART_STOP ? COLLISION_THRESHOLD : 20);
+    const SAVE_BATCH_MS = CONFIG.saveBatchMs || 2000;
+    const SAVE_BATCH_BYTES = CONFIG.saveBatchBytes || 1024 * 1024;
+
+    // Si sync.py expose window.pySaveBatch, la persistance est déléguée au worker Python :
+    // la boucle n'attend plus les saves, sauf quand trop de lots sont en vol (contre-pression)
+    const PY_SAVE = typeof window.pySaveBatch === 'function';
+    const SAVE_MAX_IN_FLIGHT = CONFIG.saveMaxInFlight || 4;
+
+    // Index local (sync.py → state/<db>.sqlite) : en smart, n'ouvrir que les conversations modifiées
+    const HAS_STATE = typeof window.pyStateLookup === 'function';
+    const USE_STATE = HAS_STATE && SMART_STOP;
+
+    // Reprise d'un run interrompu (sync.py --resume) : pages à recharger + conversations déjà faites
+    const RESUME = CONFIG.resume || null;
+    const HAS_CHECKPOINT = typeof window.pyCheckpoint === 'function';
+
+    // Cache annonces (sync.py → annonce_cache.py) : pas de modal pour une annonce connue et fraîche
+    const ANNONCE_CACHE = FETCH_ANNONCE && typeof window.pyAnnonceLookup === 'function';
+
+    // Débit adaptatif ("throttle": {"enabled": false} → ancienne pause fixe timeouts.betweenConvs)
+    const ADAPTIVE = CONFIG.throttle?.enabled !== false;
+    const throttle = createThrottle(CONFIG.throttle);
+
+    // Budget temps (sync.py --budget) : échéance en ms epoch. Les conversations sont alors
+    // traitées par priorité (non lues, modifiées, récentes, ancienne traîne) jusqu'à l'échéance
+    const DEADLINE = CONFIG.deadline || null;
+
     S.log('✅ Config chargée');
     S.log('API: ' + CONFIG.apiUrl);
     S.log('Max pages: ' + CONFIG.maxPages);
     S.log('Max conversations: ' + CONFIG.maxConversations);
     S.log('Smart stop: ' + (SMART_STOP ? 'OUI (seuil=' + COLLISION_THRESHOLD + ')' : 'NON'));
-    S.log('Fetch annonce: ' + (FETCH_ANNONCE ? 'OUI' : 'NON'));
+    S.log('Fetch annonce: ' + (FETCH_ANNONCE ? 'OUI' + (ANNONCE_CACHE ? ' (cache)' : '') : 'NON'));
+    S.log('Fetch direct: ' + (DIRECT_FETCH ? 'OUI (x' + DIRECT_CONCURRENCY + ')' : 'NON'));
+    S.log('Débit: ' + (ADAPTIVE ? 'adaptatif, départ ' + throttle.rate + ' req/s' : 'pause fixe ' + CONFIG.timeouts.betweenConvs + 'ms'));
+    S.log('Sauvegarde: ' + (SAVE_BATCH_SIZE > 1 ? 'lots de ' + SAVE_BATCH_SIZE + ' / ' + SAVE_BATCH_MS + 'ms' : 'unitaire')
+        + (PY_SAVE ? ' via worker Python (max ' + SAVE_MAX_IN_FLIGHT + ' en vol)' : ''));
+    S.log('Index local: ' + (USE_STATE ? 'OUI (conversations inchangées ignorées)' : HAS_STATE ? 'mise à jour seule' : 'NON'));
+    if (DEADLINE) {
+        S.log('Budget: ' + Math.round((DEADLINE - Date.now()) / 1000) + 's (traitement par priorité)');
+    }
+    if (RESUME) {
+        S.log('Reprise: ' + RESUME.pages + ' pages à recharger, conversations déjà sauvegardées ignorées');
+    }
     S.log('');
 
     // ========== SMART STOP VARIABLES ==========
@@ -58,15 +225,8 @@
     S.log('🔍 Vérification présence conversations...');
     S.log('   Sélecteur: ' + CONFIG.selectors.convList);
 
-    await wait(2000);
-
-    let initialConvs = document.querySelectorAll(CONFIG.selectors.convList);
-    let attempts = 0;
-    while (initialConvs.length === 0 && attempts < 50) {
-        await wait(200);
-        initialConvs = document.querySelectorAll(CONFIG.selectors.convList);
-        attempts++;
-    }
+    await waitForSelector(CONFIG.selectors.convList, 12000);
+    const initialConvs = document.querySelectorAll(CONFIG.selectors.convList);
 
     if (initialConvs.length === 0) {
         S.error('❌ Aucune conversation trouvée !');
@@ -79,16 +239,56 @@
     // ========== INTERCEPTEUR XHR ==========
     const xhrData = { conversationId: null, messages: null };
 
+    // Réveille l'attente en cours dès que la réponse messages arrive
+    let onMessages = null;
+
+    function waitForMessages(timeoutMs) {
+        if (xhrData.messages) return Promise.resolve(xhrData.messages);
+        return new Promise(resolve => {
+            const timer = setTimeout(() => {
+                onMessages = null;
+                resolve(xhrData.messages);
+            }, timeoutMs);
+            onMessages = () => {
+                clearTimeout(timer);
+                onMessages = null;
+                resolve(xhrData.messages);
+            };
+        });
+    }
+
+    // Endpoint messages + headers d'auth appris sur la première requête interceptée
+    const directApi = { template: null, headers: {} };
+
+    function learnMessagesEndpoint(xhr, url) {
+        if (directApi.template) return;
+        const match = url.match(/\/conversations\/(\d+)\/messages/);
+        if (!match) return;
+        const absolute = new URL(url, location.href).href;
+        directApi.template = absolute.replace('/conversations/' + match[1] + '/', '/conversations/{id}/');
+        directApi.headers = Object.assign({}, xhr._headers || {});
+        if (DIRECT_FETCH) {
+            S.log('🔑 Endpoint messages appris: ' + directApi.template);
+        }
+    }
+
     const originalSend = XMLHttpRequest.prototype.send;
     XMLHttpRequest.prototype.send = function () {
         const xhr = this;
         xhr.addEventListener('readystatechange', function () {
+            // 429 / 5xx du site : freiner tout de suite (la conversation finira en timeout XHR)
+            if (xhr.readyState === 4 && ADAPTIVE && (xhr.status === 429 || xhr.status >= 500)
+                && (xhr._url || '').includes('/conversations')) {
+                throttle.report(0, xhr.status, parseFloat(xhr.getResponseHeader('Retry-After')) || 0);
+            }
             if (xhr.readyState === 4 && xhr.status === 200) {
                 const url = xhr._url || '';
                 if (url.includes('/conversations/') && url.includes('/messages')) {
                     try {
                         const response = JSON.parse(xhr.responseText || xhr.response);
                         xhrData.messages = response;
+                        learnMessagesEndpoint(xhr, url);
+                        if (onMessages) onMessages();
                     } catch (e) {
                         S.error('Erreur parse XHR: ' + e.message);
                     }
@@ -101,6 +301,7 @@
     const originalOpen = XMLHttpRequest.prototype.open;
     XMLHttpRequest.prototype.open = function (method, url) {
         this._url = url;
+        this._headers = {};
         const convMatch = url?.match(/\/conversations\/(\d+)/);
         if (convMatch) {
             xhrData.conversationId = convMatch[1];
@@ -109,7 +310,104 @@
         return originalOpen.apply(this, arguments);
     };
 
-    // ========== EXTRACTION IMAGES ==========
+    const originalSetRequestHeader = XMLHttpRequest.prototype.setRequestHeader;
+    XMLHttpRequest.prototype.setRequestHeader = function (name, value) {
+        if (this._headers) this._headers[name] = value;
+        return originalSetRequestHeader.apply(this, arguments);
+    };
+
+    // ========== FETCH DIRECT ==========
+    // ID de conversation lisible dans la sidebar sans cliquer (lien / attribut), sinon null
+    function getConversationIdFromElement(convEl) {
+        const candidates = [convEl, ...convEl.querySelectorAll('[href], [routerlink], [ng-reflect-router-link]')];
+        for (const el of candidates) {
+            for (const attr of el.attributes) {
+                const match = attr.value.match(/conversations\/(\d+)/);
+                if (match) return match[1];
+            }
+        }
+        const dataId = convEl.dataset?.conversationId || convEl.dataset?.id;
+        return dataId && /^\d+$/.test(dataId) ? dataId : null;
+    }
+
+    function createLimiter(max) {
+        let active = 0;
+        const queue = [];
+        const next = () => {
+            if (active >= max || queue.length === 0) return;
+            active++;
+            const { fn, resolve } = queue.shift();
+            fn().then(resolve, () => resolve(null)).finally(() => {
+                active--;
+                next();
+            });
+        };
+        return (fn) => new Promise(resolve => {
+            queue.push({ fn, resolve });
+            next();
+        });
+    }
+
+    const directLimit = createLimiter(DIRECT_CONCURRENCY);
+
+    async function fetchMessagesDirect(conversationId) {
+        if (ADAPTIVE) await throttle.acquire();
+        const started = performance.now();
+        const response = await fetch(directApi.template.replace('{id}', conversationId), {
+            credentials: 'include',
+            headers: directApi.headers
+        });
+        if (ADAPTIVE) {
+            throttle.report(performance.now() - started, response.status,
+                parseFloat(response.headers.get('Retry-After')) || 0);
+        }
+        if (!response.ok) {
+            throw new Error('HTTP ' + response.status);
+        }
+        const messages = await response.json();
+        return Array.isArray(messages) ? messages : null;
+    }
+
+    // Préchargement des messages des prochaines conversations (concurrence limitée)
+    const prefetched = new Map();
+    // id → jeton du préchargement encore en file ; un jeton retiré avant son tour ne
+    // fait ni requête ni ne prend de jeton de débit (un nouveau préchargement a son propre jeton)
+    const queuedPrefetch = new Map();
+
+    function prefetchMessages(conversationId) {
+        if (!directApi.template || !conversationId || prefetched.has(conversationId)) return;
+        const job = { dropped: false };
+        queuedPrefetch.set(conversationId, job);
+        prefetched.set(conversationId, directLimit(() => {
+            if (queuedPrefetch.get(conversationId) === job) queuedPrefetch.delete(conversationId);
+            return job.dropped ? Promise.resolve(null) : fetchMessagesDirect(conversationId);
+        }));
+    }
+
+    function dropPrefetch(conversationId) {
+        prefetched.delete(conversationId);
+        const job = queuedPrefetch.get(conversationId);
+        if (job) {
+            job.dropped = true;
+            queuedPrefetch.delete(conversationId);
+        }
+    }
+
+    // Images depuis msg.medias (pas besoin du DOM de la conversation ouverte)
+    function imagesFromMessages(messages) {
+        const images = [];
+        for (const msg of messages) {
+            for (const media of msg.medias || []) {
+                const full = media.versions?.original?.url;
+                if (full) {
+                    images.push({ thumbnail: media.versions?.tiny?.url || full, full: full });
+                }
+            }
+        }
+        return images;
+    }
+
+    // ========== EXTRACTION IMAGES (repli DOM) ==========
     function extractImages() {
         const images = [];
         document.querySelectorAll(CONFIG.selectors.images).forEach(img => {
@@ -122,6 +420,14 @@
     }
 
     // ========== EXTRACTION ANNONCE - DÉTECTION INTELLIGENTE ==========
+    async function closeAnnonceModal() {
+        const closeBtn = document.querySelector(CONFIG.selectors.annonceClose);
+        if (closeBtn) {
+            closeBtn.click();
+            await waitForGone(CONFIG.selectors.annonceClose, 500);
+        }
+    }
+
     async function getAnnonceData() {
         const btn = document.querySelector(CONFIG.selectors.annonceBtn);
         if (!btn) {
@@ -131,7 +437,14 @@
 
         try {
             btn.click();
-            await wait(CONFIG.timeouts.annonceModal);
+
+            // Attendre le badge "Annonce N" ou le message d'annonce disparue
+            await timedWait('annonceModal', waitFor(() => {
+                const badge = document.querySelector(CONFIG.selectors.annonceBadge);
+                const gone = document.querySelector(CONFIG.selectors.annonceErrorMsg);
+                return /Annonce \d+/.test(badge?.textContent || '')
+                    || gone?.textContent.includes("n'est plus en ligne");
+            }, CONFIG.timeouts.annonceModal));
 
             // Vérifier si l'annonce a disparu
             const errorMsg = document.querySelector(CONFIG.selectors.annonceErrorMsg);
@@ -139,13 +452,9 @@
                 S.log('   ⚠️  Annonce disparue (message: "n\'est plus en ligne")');
                 
                 // Fermer la modal
-                const closeBtn = document.querySelector(CONFIG.selectors.annonceClose);
-                if (closeBtn) {
-                    closeBtn.click();
-                    await wait(500);
-                }
+                await closeAnnonceModal();
                 
-                return null; // Pas d'envoi à l'API
+                return { gone: true }; // Pas d'envoi à l'API (pas d'id)
             }
 
             // L'annonce existe, chercher les infos
@@ -155,9 +464,7 @@
             
             if (!annonceIdMatch) {
                 S.log('   ⚠️  Badge trouvé mais pas de numéro d\'annonce');
-                const closeBtn = document.querySelector(CONFIG.selectors.annonceClose);
-                if (closeBtn) closeBtn.click();
-                await wait(500);
+                await closeAnnonceModal();
                 return null;
             }
 
@@ -167,11 +474,7 @@
             const description = descElement?.textContent.trim() || '';
 
             // Fermer la modal
-            const closeBtn = document.querySelector(CONFIG.selectors.annonceClose);
-            if (closeBtn) {
-                closeBtn.click();
-                await wait(500);
-            }
+            await closeAnnonceModal();
 
             return { 
                 id: annonceId, 
@@ -185,21 +488,24 @@
     }
 
     // ========== API ==========
+    function apiHeaders() {
+        // Construire les headers
+        const headers = {
+            'Content-Type': 'application/json'
+        };
+        
+        // Ajouter le header X-User-Database si disponible dans la config
+        if (CONFIG.db_name) {
+            headers['X-User-Database'] = CONFIG.db_name;
+        }
+        return headers;
+    }
+
     async function sendToAPI(data) {
         try {
-            // Construire les headers
-            const headers = {
-                'Content-Type': 'application/json'
-            };
-            
-            // Ajouter le header X-User-Database si disponible dans la config
-            if (CONFIG.db_name) {
-                headers['X-User-Database'] = CONFIG.db_name;
-            }
-            
             const response = await fetch(CONFIG.apiUrl, {
                 method: 'POST',
-                headers: headers,
+                headers: apiHeaders(),
                 body: JSON.stringify(data)
             });
 
@@ -215,6 +521,181 @@
         }
     }
 
+    // Un lot → une requête save_batch ; en cas d'échec global, repli conversation par conversation
+    async function sendBatchToAPI(payloads) {
+        try {
+            const response = await fetch(CONFIG.apiUrl.replace('action=save', 'action=save_batch'), {
+                method: 'POST',
+                headers: apiHeaders(),
+                body: JSON.stringify({ conversations: payloads })
+            });
+            const data = JSON.parse(await response.text());
+            if (Array.isArray(data.results) && data.results.length === payloads.length) {
+                return data.results;
+            }
+            S.warn('⚠️  Lot refusé (' + (data.error || response.status) + '), envoi unitaire');
+        } catch (error) {
+            S.warn('⚠️  Erreur lot: ' + error.message + ', envoi unitaire');
+        }
+
+        const results = [];
+        for (const payload of payloads) {
+            results.push(await sendToAPI(payload));
+        }
+        return results;
+    }
+
+    // File d'envoi : regroupe les payloads par nombre, taille ou délai
+    function createSaveQueue(onResult) {
+        let items = [];
+        let bytes = 0;
+        let timer = null;
+        const inFlight = new Set();
+        // Les lots en vol peuvent finir dans le désordre : les résultats sont appliqués
+        // dans l'ordre d'envoi (compteur de collisions du smart stop)
+        let sent = 0;
+        let applied = 0;
+        const finished = new Map();
+
+        function applyInOrder() {
+            while (finished.has(applied)) {
+                const [batch, results] = finished.get(applied);
+                finished.delete(applied);
+                applied++;
+                batch.forEach((item, k) => onResult(item.meta, results[k] || null));
+            }
+        }
+
+        function flush() {
+            clearTimeout(timer);
+            timer = null;
+            if (items.length === 0) return;
+            const batch = items;
+            items = [];
+            bytes = 0;
+
+            let send;
+            if (PY_SAVE) {
+                send = window.pySaveBatch(batch.map(item => item.payload)).catch(error => {
+                    S.error('Erreur worker Python: ' + error);
+                    return [];
+                });
+            } else if (SAVE_BATCH_SIZE > 1) {
+                send = sendBatchToAPI(batch.map(item => item.payload));
+            } else {
+                send = sendToAPI(batch[0].payload).then(result => [result]);
+            }
+
+            const seq = sent++;
+            const sentAt = performance.now();
+            const done = send.then(results => {
+                metric({ phase: 'save_batch', ms: performance.now() - sentAt });
+                finished.set(seq, [batch, results || []]);
+            }, () => {
+                finished.set(seq, [batch, []]);
+            }).then(applyInOrder).finally(() => inFlight.delete(done));
+            inFlight.add(done);
+        }
+
+        return {
+            async push(payload, meta) {
+                items.push({ payload, meta });
+                bytes += JSON.stringify(payload).length;
+                if (items.length >= SAVE_BATCH_SIZE || bytes >= SAVE_BATCH_BYTES) {
+                    flush();
+                } else if (!timer) {
+                    timer = setTimeout(flush, SAVE_BATCH_MS);
+                }
+                // Contre-pression : ne pas accumuler plus de lots en vol que le worker n'en traite
+                while (inFlight.size >= SAVE_MAX_IN_FLIGHT) {
+                    await Promise.race(Array.from(inFlight));
+                }
+            },
+            async drain() {
+                flush();
+                while (inFlight.size > 0) {
+                    await Promise.all(Array.from(inFlight));
+                }
+            }
+        };
+    }
+
+    // ========== INDEX LOCAL ==========
+    function hashText(text) {
+        // FNV-1a 32 bits, suffisant pour détecter un changement d'aperçu
+        let h = 0x811c9dc5;
+        for (let k = 0; k < text.length; k++) {
+            h ^= text.charCodeAt(k);
+            h = Math.imul(h, 0x01000193);
+        }
+        return (h >>> 0).toString(16);
+    }
+
+    // Empreinte du texte de l'entrée (ou de selectors.convFingerprint), sans le badge non lu
+    function entryFingerprint(convEl) {
+        const fpEl = (CONFIG.selectors.convFingerprint && convEl.querySelector(CONFIG.selectors.convFingerprint)) || convEl;
+        let text = fpEl.textContent;
+        if (CONFIG.selectors.convUnread) {
+            const clone = fpEl.cloneNode(true);
+            clone.querySelectorAll(CONFIG.selectors.convUnread).forEach(el => el.remove());
+            text = clone.textContent;
+        }
+        return hashText(text.replace(/\s+/g, ' ').trim());
+    }
+
+    // Clé stable + empreinte d'une entrée de sidebar (sans l'ouvrir)
+    function sidebarEntry(convEl) {
+        const title = convEl.querySelector(CONFIG.selectors.convTitle)?.textContent.trim() || '';
+        const userName = convEl.querySelector(CONFIG.selectors.convUser)?.textContent.trim() || '';
+        const id = getConversationIdFromElement(convEl);
+        return {
+            key: id || ('u' + (userName.match(/Utilisateur (\d+)/)?.[1] || userName) + '|' + title),
+            fingerprint: entryFingerprint(convEl)
+        };
+    }
+
+    // unchanged[i] = true si l'entrée i est identique à la dernière sauvegarde
+    // alreadyDone[i] = true si l'entrée i a été sauvegardée par le run interrompu (--resume)
+    // unread[i] = true si l'entrée i porte le marqueur non lu (selectors.convUnread, optionnel)
+    const convElements = [];
+    const sidebarEntries = [];
+    const unchanged = [];
+    const alreadyDone = [];
+    const cachedAnnonces = [];
+    const unread = [];
+
+    // Toutes les recherches (checkpoint, cache annonces, index) sont faites sur les
+    // nouvelles entrées AVANT de les publier : ensureConversation() ne voit une
+    // entrée i qu'une fois tous ses drapeaux connus
+    async function scanSidebar() {
+        const els = Array.from(document.querySelectorAll(CONFIG.selectors.convList)).slice(sidebarEntries.length);
+        if (els.length === 0) return false;
+        const fresh = els.map(sidebarEntry);
+
+        const unreadSelector = CONFIG.selectors.convUnread;
+        const freshUnread = els.map(el => !!unreadSelector && (el.matches(unreadSelector) || !!el.querySelector(unreadSelector)));
+        const freshDone = RESUME && HAS_CHECKPOINT ? await window.pyCheckpointDone(fresh) : [];
+        const freshAnnonces = ANNONCE_CACHE ? await window.pyAnnonceLookup(els.map(el => ({
+            conversation_id: getConversationIdFromElement(el),
+            title: el.querySelector(CONFIG.selectors.convTitle)?.textContent.trim() || '',
+            user_id: el.querySelector(CONFIG.selectors.convUser)?.textContent.match(/Utilisateur (\d+)/)?.[1] || null
+        }))) : [];
+        // Avec un budget, l'index sert aussi à classer les conversations (même en full)
+        const lookupState = HAS_STATE && (USE_STATE || DEADLINE);
+        const freshUnchanged = lookupState ? await window.pyStateLookup(fresh) : [];
+
+        // Publication d'un bloc : les tableaux restent alignés sur sidebarEntries
+        for (let k = 0; k < els.length; k++) {
+            unread.push(freshUnread[k]);
+            alreadyDone.push(!!freshDone[k]);
+            cachedAnnonces.push(freshAnnonces[k] || null);
+            unchanged.push(!!freshUnchanged[k]);
+        }
+        convElements.push(...els);
+        sidebarEntries.push(...fresh);
+        return USE_STATE && lookupState && freshUnchanged.some(Boolean);
+    }
+
     // ========== PAGINATION ==========
     async function loadMoreConversations(pagesLoaded) {
         const btnVoirPlus = document.querySelector(CONFIG.selectors.voirPlus);
@@ -223,45 +704,164 @@
         }
 
         S.log('📄 Chargement page ' + (pagesLoaded + 1) + '/' + CONFIG.maxPages);
+        const before = document.querySelectorAll(CONFIG.selectors.convList).length;
+        if (ADAPTIVE) await throttle.acquire();
+        const started = performance.now();
         btnVoirPlus.click();
-        await wait(CONFIG.timeouts.loadMore);
+        const loaded = await timedWait('loadMore', waitFor(
+            () => document.querySelectorAll(CONFIG.selectors.convList).length > before, CONFIG.timeouts.loadMore));
+        if (ADAPTIVE) throttle.report(performance.now() - started, loaded ? 200 : 0);
         return true;
     }
 
-    // ========== CHARGEMENT PAGES ==========
-    S.log('━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━');
-    S.log('📋 CHARGEMENT CONVERSATIONS');
-    S.log('━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━');
-
-    const results = [];
+    // Pagination pipelinée : la page suivante se charge pendant le traitement de la
+    // courante (au plus un "Voir plus" en vol), au lieu de tout charger avant de commencer
+    const PAGE_PREFETCH = CONFIG.pagePrefetch || 10; // conversations restantes avant de demander la page suivante
     let pagesLoaded = 0;
+    let paginationDone = false;
+    let pageLoading = null;
 
-    while (pagesLoaded < CONFIG.maxPages) {
-        const currentCount = document.querySelectorAll(CONFIG.selectors.convList).length;
-        S.log('Conversations chargées: ' + currentCount);
+    // Sidebar triée par activité : dès qu'une entrée est inchangée, les suivantes le sont aussi
+    async function scanAndCheckStop() {
+        const replaying = RESUME && pagesLoaded < RESUME.pages;
+        if (await scanSidebar() && !replaying) {
+            S.log('📌 Conversations déjà synchronisées atteintes, pagination arrêtée');
+            paginationDone = true;
+        }
+    }
 
-        if (currentCount >= CONFIG.maxConversations) {
-            S.log('✅ Limite atteinte (' + CONFIG.maxConversations + ')');
-            break;
+    function loadNextPage() {
+        if (pageLoading || paginationDone) return pageLoading || Promise.resolve();
+        pageLoading = (async () => {
+            if (pagesLoaded >= CONFIG.maxPages) {
+                paginationDone = true;
+                return;
+            }
+            if (sidebarEntries.length >= CONFIG.maxConversations) {
+                S.log('✅ Limite atteinte (' + CONFIG.maxConversations + ')');
+                paginationDone = true;
+                return;
+            }
+            if (!await timed('pagination', () => loadMoreConversations(pagesLoaded))) {
+                S.log('ℹ️  Plus de bouton "Voir plus"');
+                paginationDone = true;
+                return;
+            }
+            pagesLoaded++;
+            if (HAS_CHECKPOINT && pagesLoaded > (RESUME?.pages || 0)) {
+                window.pyCheckpoint({ pages: pagesLoaded });
+            }
+            await scanAndCheckStop();
+        })().finally(() => {
+            pageLoading = null;
+        });
+        return pageLoading;
+    }
+
+    // true si la conversation i est chargée (en attendant les pages nécessaires)
+    async function ensureConversation(i) {
+        while (i >= sidebarEntries.length && !paginationDone) {
+            await loadNextPage();
         }
+        if (i + PAGE_PREFETCH >= sidebarEntries.length) {
+            loadNextPage();
+        }
+        return i < sidebarEntries.length;
+    }
 
-        const hasMore = await loadMoreConversations(pagesLoaded);
-        if (!hasMore) {
-            S.log('ℹ️  Plus de bouton "Voir plus"');
-            break;
+    // ========== BUDGET TEMPS ==========
+    const TIERS = ['unread', 'changed', 'recent', 'tail'];
+    const TIER_LABELS = { unread: 'non lues', changed: 'modifiées', recent: 'récentes', tail: 'ancienne traîne' };
+    const RECENT_COUNT = CONFIG.budgetRecent || 25; // "récentes" = première page de la sidebar
+
+    // Durées estimées (moyenne glissante) d'une conversation hors annonce et du modal annonce
+    const estimate = { conv: 1500, annonce: CONFIG.timeouts.annonceModal || 1500 };
+    const learn = (key, ms) => { estimate[key] = estimate[key] * 0.7 + ms * 0.3; };
+
+    // taken[i] = true une fois la conversation i choisie (traitée ou ignorée)
+    const taken = [];
+    let budgetExhausted = false;
+
+    function priority(i) {
+        if (unread[i]) return 0;
+        if (!unchanged[i]) return 1; // nouvelle ou modifiée depuis le dernier sync (ou index absent)
+        return i < RECENT_COUNT ? 2 : 3;
+    }
+
+    function pendingUpTo(tier) {
+        let count = 0;
+        for (let k = 0; k < sidebarEntries.length && k < CONFIG.maxConversations; k++) {
+            if (!taken[k] && priority(k) <= tier) count++;
         }
-        pagesLoaded++;
+        return count;
     }
 
-    S.log('');
-    S.log('✅ ' + pagesLoaded + ' pages chargées');
-    S.log('');
+    // Indice de la n-ième conversation à traiter : ordre de la sidebar, ou meilleure priorité avec un budget
+    async function nextConversation(n) {
+        if (!await ensureConversation(n)) return -1;
+        if (!DEADLINE) return n;
+        let best = -1;
+        for (let k = 0; k < sidebarEntries.length && k < CONFIG.maxConversations; k++) {
+            if (!taken[k] && (best < 0 || priority(k) < priority(best))) best = k;
+        }
+        return best;
+    }
+
+    // Prochaines conversations (après i) que la boucle traitera par fetch direct, dans l'ordre
+    // de traitement : ordre de la sidebar, ou priorité avec un budget ; sans les inchangées,
+    // les déjà faites et celles qui passeront par le clic (modal annonce hors cache)
+    function upcomingDirect(i, count) {
+        const limit = Math.min(convElements.length, CONFIG.maxConversations);
+        const upcoming = [];
+        for (let k = DEADLINE ? 0 : i + 1; k < limit && (DEADLINE || upcoming.length < count); k++) {
+            if (k === i || taken[k] || (USE_STATE && unchanged[k]) || alreadyDone[k]) continue;
+            if (FETCH_ANNONCE && !cachedAnnonces[k]) continue;
+            if (!getConversationIdFromElement(convElements[k])) continue;
+            upcoming.push(k);
+        }
+        if (DEADLINE) upcoming.sort((a, b) => priority(a) - priority(b) || a - b);
+        return upcoming.slice(0, count);
+    }
+
+    // Le modal annonce tient-il encore dans le budget pour tout le travail de même priorité ?
+    function annonceFitsBudget(i) {
+        const ahead = pendingUpTo(priority(i)) + 1;
+        return DEADLINE - Date.now() >= ahead * (estimate.conv + estimate.annonce);
+    }
+
+    S.log('━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━');
+    S.log('📋 CHARGEMENT CONVERSATIONS');
+    S.log('━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━');
 
-    const conversations = document.querySelectorAll(CONFIG.selectors.convList);
-    const totalToProcess = Math.min(conversations.length, CONFIG.maxConversations);
+    // Résultats par conversation : deux compteurs en page, le détail part vers Python (binding pyResult)
+    // au fil de l'eau → rien ne grossit avec la longueur du run, ni ici ni dans le retour de page.evaluate
+    const tally = { succeeded: 0, failed: 0 };
+    const streamResult = typeof window.pyResult === 'function'
+        ? (result) => { window.pyResult(result).catch(() => {}); }
+        : () => {};
+    function pushResult(result) {
+        if (result.success) {
+            tally.succeeded++;
+        } else {
+            tally.failed++;
+        }
+        streamResult(result);
+    }
+
+    await scanAndCheckStop();
+    S.log('Conversations chargées: ' + sidebarEntries.length + ' (pages suivantes chargées pendant le traitement)');
+
+    if (DIRECT_FETCH) {
+        const known = convElements.filter(el => getConversationIdFromElement(el)).length;
+        S.log('🔑 Fetch direct: ' + known + '/' + convElements.length + ' IDs lisibles dans la première page');
+        if (FETCH_ANNONCE) {
+            S.log('   ℹ️  fetchAnnonce actif: fetch direct seulement pour les annonces en cache');
+        }
+    }
+    S.log('');
 
     S.log('━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━');
-    S.log('💬 TRAITEMENT ' + totalToProcess + ' CONVERSATIONS');
+    S.log('💬 TRAITEMENT DES CONVERSATIONS (max ' + CONFIG.maxConversations + ')');
     S.log('━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━');
     S.log('');
 
@@ -269,19 +869,139 @@
     let processed = 0;
     let annonceFetched = 0;
     let annonceSkipped = 0;
+    let annonceCached = 0;
+    let skippedUnchanged = 0;
+    let skippedResumed = 0;
+    let annonceDeferred = 0;
+
+    // Résultat d'une sauvegarde (arrive de manière asynchrone, dans l'ordre des conversations)
+    function handleSaveResult(meta, result) {
+        const label = '   [' + meta.index + '] ';
+        // save_batch renvoie aussi des refus par conversation ({error: 'user_id requis'})
+        const saved = result?.status === 'saved' || !!result?.success;
+        if (saved) {
+            const newMsgs = result.new_messages || 0;
+            totalNewMessages += newMsgs;
+
+            if (HAS_STATE && meta.entry) {
+                window.pyStateRecord([meta.entry]);
+            }
+
+            if (newMsgs > 0) {
+                S.log(label + '✅ Sauvegardé (' + newMsgs + ' nouveaux)');
+                consecutiveCollisions = 0; // Reset collisions
+            } else {
+                consecutiveCollisions++;
+                S.log(label + '⏭️  Aucun nouveau (collision ' + consecutiveCollisions + '/' + COLLISION_THRESHOLD + ')');
+
+                // Vérifier seuil smart stop
+                if (SMART_STOP && consecutiveCollisions >= COLLISION_THRESHOLD) {
+                    shouldStop = true;
+                    stopReason = COLLISION_THRESHOLD + ' collisions consécutives';
+                }
+            }
+        } else {
+            S.log(label + '❌ Échec API' + (result?.error ? ': ' + result.error : ''));
+        }
+
+        pushResult({
+            index: meta.index,
+            conversation_id: meta.conversationId,
+            success: saved,
+            new_messages: result?.new_messages || 0,
+            error: saved ? null : (result?.error || 'api')
+        });
+    }
+
+    const saveQueue = createSaveQueue(handleSaveResult);
+
+    // ========== DISJONCTEUR (DOM MODIFIÉ) ==========
+    // N conversations de suite en échec structurel (XHR jamais reçu, convUser sans ID) : jeu de
+    // sélecteurs de secours suivant (CONFIG.selectorFallbacks), sinon arrêt du run plutôt qu'un
+    // timeout par conversation. Un bouton annonce absent n'en est pas un (annonce supprimée,
+    // message direct) : il est seulement journalisé. circuitBreaker: 0 désactive.
+    const BREAKER_THRESHOLD = CONFIG.circuitBreaker ?? 5;
+    const fallbackSelectors = (CONFIG.selectorFallbacks || []).slice();
+    const BREAKER_SELECTORS = { xhr_timeout: 'convList', user_missing: 'convUser' };
+    const breaker = { consecutive: 0, reasons: {}, switches: 0, tripped: null };
+
+    // Retourne true si le run doit s'arrêter
+    function structuralFailure(reason) {
+        breaker.consecutive++;
+        breaker.reasons[reason] = (breaker.reasons[reason] || 0) + 1;
+        if (!BREAKER_THRESHOLD || breaker.consecutive < BREAKER_THRESHOLD) return false;
+
+        const summary = Object.entries(breaker.reasons).map(([r, count]) => r + ' x' + count).join(', ');
+        if (fallbackSelectors.length) {
+            breaker.switches++;
+            CONFIG.selectors = Object.assign({}, CONFIG.selectors, fallbackSelectors.shift());
+            S.log('🔀 Disjoncteur: ' + breaker.consecutive + ' échecs structurels de suite (' + summary
+                + '), passage au jeu de sélecteurs de secours suivant');
+            breaker.consecutive = 0;
+            breaker.reasons = {};
+            return false;
+        }
+        breaker.tripped = {
+            reason: summary,
+            failures: breaker.consecutive,
+            selectors: Object.keys(breaker.reasons).map(r => BREAKER_SELECTORS[r])
+        };
+        stopReason = 'disjoncteur (' + summary + ')';
+        S.error('🔌 Disjoncteur ouvert: ' + breaker.consecutive + ' échecs structurels de suite (' + summary
+            + '), sélecteurs suspects: ' + breaker.tripped.selectors.join(', '));
+        return true;
+    }
+
+    function structuralSuccess() {
+        breaker.consecutive = 0;
+        breaker.reasons = {};
+    }
+
+    let recycleRequested = false;
+    for (let n = 0; n < CONFIG.maxConversations; n++) {
+        // Seuil mémoire dépassé (page_monitor.py) : sync.py reprendra au checkpoint dans une page neuve
+        if (window.__scraperRecycle) {
+            recycleRequested = true;
+            stopReason = 'recyclage de la page (mémoire)';
+            S.log('♻️  Recyclage demandé, arrêt après les sauvegardes en cours');
+            break;
+        }
 
-    for (let i = 0; i < totalToProcess; i++) {
         // Vérifier arrêt smart
         if (shouldStop) {
             S.log('🛑 Arrêt smart: ' + stopReason);
             break;
         }
 
+        const i = await nextConversation(n);
+        if (i < 0) {
+            break;
+        }
+
+        if (DEADLINE) {
+            if (DEADLINE - Date.now() < estimate.conv) {
+                budgetExhausted = true;
+                stopReason = 'budget épuisé';
+                S.log('⏱️  Budget épuisé, conversations restantes reportées');
+                break;
+            }
+            taken[i] = true;
+        }
+
         try {
             xhrData.conversationId = null;
             xhrData.messages = null;
 
-            const convEl = conversations[i];
+            if (USE_STATE && unchanged[i]) {
+                skippedUnchanged++;
+                continue;
+            }
+            if (alreadyDone[i]) {
+                skippedResumed++;
+                continue;
+            }
+
+            const convEl = convElements[i];
             const titleElement = convEl.querySelector(CONFIG.selectors.convTitle);
             const userElement = convEl.querySelector(CONFIG.selectors.convUser);
             const title = titleElement?.textContent.trim() || '';
@@ -290,30 +1010,83 @@
             const userIdMatch = userName.match(/Utilisateur (\d+)/);
             const userId = userIdMatch ? userIdMatch[1] : null;
 
-            S.log('[' + (i + 1) + '/' + totalToProcess + '] ' + title + ' - ' + userName);
+            // Sans user_id, api.php refuserait la conversation : inutile de l'ouvrir
+            if (!userId) {
+                S.log('[' + (i + 1) + '] ❌ ID utilisateur introuvable (convUser: "' + userName.slice(0, 40) + '")');
+                pushResult({ index: i + 1, success: false, error: 'user_id' });
+                if (structuralFailure('user_missing')) break;
+                continue;
+            }
 
-            convEl.click();
+            S.log('[' + (i + 1) + '/' + Math.min(sidebarEntries.length, CONFIG.maxConversations) + '] ' + title + ' - ' + userName
+                + (DEADLINE ? ' (' + TIER_LABELS[TIERS[priority(i)]] + ')' : '')
+                + (ADAPTIVE ? ' [' + throttle.rate.toFixed(2) + ' req/s]' : ''));
+            const convStarted = performance.now();
+            let fetchPath = 'click';
+            let annonceMs = 0;
 
-            // Attendre XHR
-            let attempts = 0;
-            const maxAttempts = CONFIG.timeouts.xhrTimeout / 100;
-            while (!xhrData.messages && attempts < maxAttempts) {
-                await wait(100);
-                attempts++;
-            }
+            // ========== MESSAGES : FETCH DIRECT OU CLIC + XHR ==========
+            let conversationId = null;
+            let messages = null;
+            let images = [];
 
-            if (!xhrData.messages) {
-                S.log('   ❌ Timeout XHR');
-                S.log('');
-                results.push({ success: false, error: 'timeout' });
-                continue;
+            // Le modal annonce a besoin de la conversation ouverte → chemin clic, sauf annonce en cache
+            const cachedAnnonce = cachedAnnonces[i] || null;
+            // Budget serré : modal annonce reporté (la conversation reste "à revoir" dans l'index)
+            const deferAnnonce = DEADLINE && FETCH_ANNONCE && !cachedAnnonce && !annonceFitsBudget(i);
+            const directId = DIRECT_FETCH && (!FETCH_ANNONCE || cachedAnnonce || deferAnnonce) ? getConversationIdFromElement(convEl) : null;
+
+            if (directId && directApi.template) {
+                // Préchargement des seules conversations que l'ordonnanceur traitera ensuite
+                // par fetch direct ; ce qui n'est plus au programme quitte la map
+                const ahead = upcomingDirect(i, DIRECT_CONCURRENCY * 2 - 1)
+                    .map(k => getConversationIdFromElement(convElements[k]));
+                const wanted = new Set([directId, ...ahead]);
+                for (const id of prefetched.keys()) {
+                    if (!wanted.has(id)) dropPrefetch(id);
+                }
+                prefetchMessages(directId);
+                ahead.forEach(prefetchMessages);
+                messages = await timed('direct_fetch', () => prefetched.get(directId));
+                prefetched.delete(directId);
+                if (messages) {
+                    conversationId = directId;
+                    fetchPath = 'direct';
+                    images = imagesFromMessages(messages);
+                } else {
+                    S.log('   ⚠️  Fetch direct échoué, repli sur clic');
+                }
             }
 
-            S.log('   📨 ' + xhrData.messages.length + ' messages');
+            if (!messages) {
+                if (ADAPTIVE) await timed('throttle_wait', () => throttle.acquire());
+                const clickedAt = performance.now();
+                convEl.click();
+
+                // Attendre XHR
+                await timed('xhr_wait', () => timedWait('xhrTimeout', waitForMessages(CONFIG.timeouts.xhrTimeout)));
+                if (ADAPTIVE) throttle.report(performance.now() - clickedAt, xhrData.messages ? 200 : 0);
 
-            // Images
-            await wait(CONFIG.timeouts.images);
-            const images = extractImages();
+                if (!xhrData.messages) {
+                    S.log('   ❌ Timeout XHR');
+                    S.log('');
+                    pushResult({ index: i + 1, success: false, error: 'timeout' });
+                    if (structuralFailure('xhr_timeout')) break;
+                    continue;
+                }
+
+                conversationId = xhrData.conversationId;
+                messages = xhrData.messages;
+
+                // Images listées par msg.medias ; le DOM seulement si la réponse n'en donne pas le détail
+                images = imagesFromMessages(messages);
+                if (images.length === 0 && messages.some(msg => msg.medias?.length)) {
+                    await timedWait('images', waitForSelector(CONFIG.selectors.images, CONFIG.timeouts.images));
+                    images = extractImages();
+                }
+            }
+
+            S.log('   📨 ' + messages.length + ' messages');
             if (images.length > 0) {
                 S.log('   📸 ' + images.length + ' images');
             }
@@ -321,14 +1094,30 @@
             // ========== ANNONCE - DÉTECTION INTELLIGENTE ==========
             let annonceData = null;
             
-            if (FETCH_ANNONCE) {
-                annonceData = await getAnnonceData();
+            if (FETCH_ANNONCE && cachedAnnonce) {
+                annonceData = cachedAnnonce;
+                annonceCached++;
+                S.log('   📄 ' + (annonceData.id ? 'Annonce ' + annonceData.id : 'Annonce disparue') + ' (cache)');
+            } else if (deferAnnonce) {
+                S.log('   ⏱️  Annonce reportée (budget)');
+                annonceDeferred++;
+            } else if (FETCH_ANNONCE && !document.querySelector(CONFIG.selectors.annonceBtn)) {
+                S.log('   ⚠️  Bouton annonce introuvable');
+                annonceSkipped++;
+            } else if (FETCH_ANNONCE) {
+                const annonceStarted = performance.now();
+                annonceData = await timed('annonce_modal', getAnnonceData);
+                annonceMs = performance.now() - annonceStarted;
+                learn('annonce', annonceMs);
                 if (annonceData?.id) {
                     S.log('   📄 Annonce ' + annonceData.id);
                     annonceFetched++;
                 } else {
                     annonceSkipped++;
                 }
+                if (ANNONCE_CACHE && annonceData) {
+                    window.pyAnnonceRecord(Object.assign({ conversation_id: conversationId, title: title, user_id: userId }, annonceData));
+                }
             } else {
                 S.log('   ⏭️  Récupération annonce désactivée');
                 annonceSkipped++;
@@ -336,10 +1125,10 @@
 
             // ========== PAYLOAD - NE PAS ENVOYER NULL ==========
             const payload = {
-                conversation_id: xhrData.conversationId,
+                conversation_id: conversationId,
                 user_id: userId,
                 info: { title: title, user: userName, site: 'annonces.nc' },
-                messages: xhrData.messages,
+                messages: messages,
                 images: images
             };
 
@@ -351,52 +1140,98 @@
             }
             // Sinon, on n'envoie rien, l'API gardera les valeurs existantes
 
-            const result = await sendToAPI(payload);
+            const lastMessage = messages.length > 0 ? messages[messages.length - 1] : null;
+            // Empreinte relue après ouverture : l'entrée est alors marquée lue, comme au
+            // prochain scan (sinon badge / compteur non lu la feraient toujours changer)
+            const entry = sidebarEntries[i] && !deferAnnonce ? Object.assign({}, sidebarEntries[i], {
+                fingerprint: convElements[i]?.isConnected ? entryFingerprint(convElements[i]) : sidebarEntries[i].fingerprint,
+                conversation_id: conversationId,
+                last_message_id: lastMessage?.id != null ? String(lastMessage.id) : null,
+                message_count: messages.length
+            }) : null;
+
+            await timed('save_enqueue', () => saveQueue.push(payload, { index: i + 1, conversationId: conversationId, entry: entry }));
             processed++;
+            S.log('');
 
-            if (result?.status === 'saved' || result?.success) {
-                const newMsgs = result.new_messages || 0;
-                totalNewMessages += newMsgs;
+            const convMs = performance.now() - convStarted;
+            learn('conv', convMs - annonceMs);
+            metric({ phase: 'conversation', ms: convMs });
+            metric({
+                conversation: {
+                    index: i + 1,
+                    id: conversationId,
+                    ms: Math.round(convMs),
+                    messages: messages.length,
+                    images: images.length,
+                    path: fetchPath,
+                    annonce: !!annonceData?.id,
+                    rate: ADAPTIVE ? Math.round(throttle.rate * 100) / 100 : null
+                }
+            });
 
-                if (newMsgs > 0) {
-                    S.log('   ✅ Sauvegardé (' + newMsgs + ' nouveaux)');
-                    consecutiveCollisions = 0; // Reset collisions
-                } else {
-                    consecutiveCollisions++;
-                    S.log('   ⏭️  Aucun nouveau (collision ' + consecutiveCollisions + '/' + COLLISION_THRESHOLD + ')');
+            structuralSuccess();
 
-                    // Vérifier seuil smart stop
-                    if (SMART_STOP && consecutiveCollisions >= COLLISION_THRESHOLD) {
-                        shouldStop = true;
-                        stopReason = COLLISION_THRESHOLD + ' collisions consécutives';
-                    }
-                }
-            } else {
-                S.log('   ❌ Échec API');
+            if (!ADAPTIVE) {
+                await wait(CONFIG.timeouts.betweenConvs);
             }
-            S.log('');
-
-            results.push({ success: !!result, response: result, new_messages: result?.new_messages || 0 });
-            await wait(CONFIG.timeouts.betweenConvs);
 
         } catch (error) {
             S.error('Erreur: ' + error.message);
             S.log('');
-            results.push({ success: false, error: error.message });
+            pushResult({ index: i + 1, success: false, error: error.message });
+        }
+    }
+
+    // Attendre les derniers lots (et la page éventuellement en cours de chargement)
+    await saveQueue.drain();
+    await pageLoading;
+    const totalToProcess = Math.min(sidebarEntries.length, CONFIG.maxConversations);
+
+    // Travail reporté faute de budget, par priorité (+ pages jamais chargées)
+    const deferred = { unread: 0, changed: 0, recent: 0, tail: 0 };
+    if (budgetExhausted) {
+        for (let k = 0; k < totalToProcess; k++) {
+            if (!taken[k] && !(USE_STATE && unchanged[k])) deferred[TIERS[priority(k)]]++;
         }
     }
 
+    // Préchargements restés sans usage (arrêt smart, budget, disjoncteur)
+    for (const id of prefetched.keys()) dropPrefetch(id);
+
     // ========== RÉSUMÉ ==========
     S.log('━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━');
     S.log('✨ TERMINÉ');
     S.log('━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━');
-    S.log('Conversations traitées: ' + processed + '/' + totalToProcess);
+    S.log('Conversations traitées: ' + processed + '/' + totalToProcess + ' (' + pagesLoaded + ' pages chargées)');
     S.log('Nouveaux messages: ' + totalNewMessages);
     S.log('Annonces récupérées: ' + annonceFetched);
     S.log('Annonces non récupérées: ' + annonceSkipped);
-    S.log('Succès: ' + results.filter(r => r.success).length);
-    S.log('Échecs: ' + results.filter(r => !r.success).length);
+    if (ANNONCE_CACHE) {
+        S.log('Annonces du cache (sans modal): ' + annonceCached);
+    }
+    if (USE_STATE) {
+        S.log('Inchangées (non ouvertes): ' + skippedUnchanged);
+    }
+    if (RESUME) {
+        S.log('Déjà faites (reprise): ' + skippedResumed);
+    }
+    if (DEADLINE) {
+        S.log('Reportées (budget): ' + TIERS.map(t => deferred[t] + ' ' + TIER_LABELS[t]).join(', ')
+            + (budgetExhausted && !paginationDone ? ', pages suivantes non chargées' : ''));
+        S.log('Annonces reportées (budget): ' + annonceDeferred);
+    }
+    if (ADAPTIVE) {
+        const ts = throttle.stats();
+        S.log('Débit: ' + ts.rate + ' req/s en fin de run (min ' + ts.min_rate + ', max ' + ts.max_rate + ', '
+            + ts.decreases + ' freinages, ' + Math.round(ts.waited_ms / 1000) + 's d\'attente)');
+    }
+    S.log('Succès: ' + tally.succeeded);
+    S.log('Échecs: ' + tally.failed);
     S.log('Arrêt: ' + stopReason);
+    if (breaker.switches) {
+        S.log('Jeux de sélecteurs de secours utilisés: ' + breaker.switches);
+    }
 
     return {
         success: true,
@@ -404,10 +1239,22 @@
         total_new_messages: totalNewMessages,
         annonces_fetched: annonceFetched,
         annonces_skipped: annonceSkipped,
-        succeeded: results.filter(r => r.success).length,
-        failed: results.filter(r => !r.success).length,
-        stop_reason: stopReason,
-        results: results
+        annonces_cached: annonceCached,
+        unchanged_skipped: skippedUnchanged,
+        resumed_skipped: skippedResumed,
+        pages_loaded: pagesLoaded,
+        budget_exhausted: budgetExhausted,
+        deferred: deferred,
+        pages_deferred: budgetExhausted && !paginationDone,
+        annonces_deferred: annonceDeferred,
+        throttle: ADAPTIVE ? throttle.stats() : null,
+        recycle: recycleRequested,
+        circuit_breaker: breaker.tripped,
+        selector_switches: breaker.switches,
+        selectors: breaker.switches ? CONFIG.selectors : null,
+        succeeded: tally.succeeded,
+        failed: tally.failed,
+        stop_reason: stopReason
     };
 
 })();
@@ -0,0 +1,87 @@
+"""
+Contrôle des sélecteurs CSS avant le scraping (page des conversations chargée)
+
+Quand annonces.nc change son markup, les sélecteurs de scraper-config.json
+cessent de matcher sans erreur : scraper.js attend alors xhrTimeout à chaque
+conversation, ou envoie user_id null. Ce contrôle tourne une fois après le
+login, sans ouvrir de conversation (ce qui la marquerait lue) :
+
+- convList doit trouver au moins une conversation
+- convTitle et convUser doivent matcher dans la première, et convUser donner
+  "Utilisateur <id>" (source du user_id)
+- chaque sélecteur doit être syntaxiquement valide
+
+Les sélecteurs de la conversation ouverte (annonceBtn...) sont surveillés
+pendant le run par le disjoncteur de scraper.js. La clé "selectorFallbacks"
+de la config est une liste de jeux de secours (sélecteurs partiels) essayés
+dans l'ordre si le jeu principal échoue.
+"""
+
+CHECK_JS = """
+(selectors) => {
+    const problems = [];
+    for (const [name, selector] of Object.entries(selectors)) {
+        try {
+            document.createDocumentFragment().querySelector(selector);
+        } catch (e) {
+            problems.push({ selector: name, reason: 'syntaxe invalide' });
+        }
+    }
+    if (problems.length) return { conversations: 0, problems: problems };
+
+    const items = document.querySelectorAll(selectors.convList);
+    if (!items.length) {
+        return { conversations: 0, problems: [{ selector: 'convList', reason: 'aucune conversation (sélecteur cassé ou boîte vide)' }] };
+    }
+    const first = items[0];
+    if (!first.querySelector(selectors.convTitle)) {
+        problems.push({ selector: 'convTitle', reason: 'absent de la première conversation' });
+    }
+    const user = first.querySelector(selectors.convUser);
+    if (!user) {
+        problems.push({ selector: 'convUser', reason: 'absent de la première conversation' });
+    } else if (!/Utilisateur \\d+/.test(user.textContent)) {
+        problems.push({ selector: 'convUser', reason: 'texte sans "Utilisateur <id>": ' + user.textContent.trim().slice(0, 40) });
+    }
+    return { conversations: items.length, problems: problems };
+}
+"""
+
+
+async def check_selectors(page, selectors):
+    """{conversations, problems: [{selector, reason}]} pour un jeu de sélecteurs"""
+    return await page.evaluate(CHECK_JS, selectors)
+
+
+def describe(problems):
+    return ', '.join(f'{p["selector"]} ({p["reason"]})' for p in problems)
+
+
+async def preflight(page, config, log=print):
+    """
+    Vérifie config['selectors'], puis les jeux de secours si besoin.
+    Retourne (ok, problèmes) ; config['selectors'] est remplacé par le premier jeu qui passe.
+    Une liste vide (convList sans résultat) n'est pas bloquante : le run n'y perdra aucun timeout.
+    """
+    result = await check_selectors(page, config['selectors'])
+    if not result['problems']:
+        log(f'🩺 Sélecteurs OK ({result["conversations"]} conversations visibles)')
+        return True, []
+
+    problems = result['problems']
+    log(f'🩺 Sélecteurs en échec: {describe(problems)}')
+    for k, fallback in enumerate(config.get('selectorFallbacks') or [], start=1):
+        candidate = dict(config['selectors'], **fallback)
+        attempt = await check_selectors(page, candidate)
+        if not attempt['problems']:
+            log(f'🔀 Jeu de sélecteurs de secours #{k} retenu ({attempt["conversations"]} conversations visibles)')
+            config['selectors'] = candidate
+            # Ce jeu est devenu le principal : les secours restants sont ceux qui le suivent
+            config['selectorFallbacks'] = config['selectorFallbacks'][k:]
+            return True, problems
+        log(f'   ✗ Secours #{k}: {describe(attempt["problems"])}')
+
+    if all(p['selector'] == 'convList' for p in problems) and not any('syntaxe' in p['reason'] for p in problems):
+        log('⚠️  Aucune conversation visible, on continue')
+        return True, problems
+    return False, problems
@@ -0,0 +1,108 @@
+"""
+Stockage des sessions navigateur par utilisateur (Playwright storage_state)
+
+Après un login réussi, les cookies + localStorage du contexte sont sauvegardés
+dans sessions/<email>.json. Les runs suivants rechargent cet état et ne
+repassent par login.js que si la session a expiré.
+
+La clé SCRAPER_CONFIG du localStorage (config injectée par sync.py, mot de passe
+compris) n'est jamais écrite : elle est retirée de l'état avant sauvegarde.
+"""
+
+import os
+import re
+import json
+import time
+from pathlib import Path
+
+SESSIONS_DIR = Path(__file__).parent / 'sessions'
+
+# Au-delà, on ne tente même pas de réutiliser la session (le site l'aura expirée)
+SESSION_MAX_AGE = 7 * 24 * 3600
+
+# Clés localStorage posées par sync.py, à ne pas persister (identifiants)
+PRIVATE_KEYS = {'SCRAPER_CONFIG'}
+
+
+def session_path(email):
+    """Chemin du fichier de session pour un email"""
+    safe = re.sub(r'[^a-zA-Z0-9_.@-]', '_', email or 'default')
+    return SESSIONS_DIR / f'{safe}.json'
+
+
+def scrub_state(state):
+    """storage_state sans les clés localStorage de PRIVATE_KEYS"""
+    origins = []
+    for origin in state.get('origins', []):
+        entries = [e for e in origin.get('localStorage', []) if e.get('name') not in PRIVATE_KEYS]
+        origins.append(dict(origin, localStorage=entries))
+    return dict(state, origins=origins)
+
+
+def load_session(email):
+    """Retourne le storage_state sauvegardé, ou None si absent / trop vieux / illisible"""
+    path = session_path(email)
+    if not path.exists():
+        return None
+
+    if time.time() - path.stat().st_mtime > SESSION_MAX_AGE:
+        return None
+
+    try:
+        with open(path) as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if not state.get('cookies'):
+        return None
+    scrubbed = scrub_state(state)
+    if scrubbed != state:
+        # Session écrite avant le filtrage : on la réécrit sans identifiants
+        save_session(email, scrubbed)
+    return scrubbed
+
+
+def save_session(email, state):
+    """Sauvegarde un storage_state sans identifiants (écriture atomique, fichier créé en 0600)"""
+    SESSIONS_DIR.mkdir(parents=True, exist_ok=True)
+    path = session_path(email)
+    tmp = path.with_suffix('.tmp')
+    try:
+        tmp.unlink()  # un .tmp resté d'un crash garderait ses droits
+    except FileNotFoundError:
+        pass
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, 'w') as f:
+        json.dump(scrub_state(state), f)
+    tmp.replace(path)
+    return path
+
+
+def drop_session(email):
+    """Supprime une session expirée"""
+    try:
+        session_path(email).unlink()
+    except FileNotFoundError:
+        pass
+
+
+async def probe_session(page, config, timeout=None):
+    """
+    Vérifie en une sonde si la page est authentifiée :
+    attend la liste des conversations OU la modal de login, selon ce qui apparaît en premier.
+    Retourne True si la liste est là (session valide).
+    """
+    selectors = config['selectors']
+    conv_list = selectors.get('convList')
+    login_modal = selectors['loginModal']
+    if timeout is None:
+        timeout = config['timeouts'].get('loginSuccess', 5000)
+
+    probe = f'{login_modal}, {conv_list}' if conv_list else login_modal
+    try:
+        await page.wait_for_selector(probe, timeout=timeout)
+    except Exception:
+        return False
+
+    return await page.query_selector(login_modal) is None
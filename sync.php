@@ -14,11 +14,30 @@ $user = Auth::getCurrentUser();
 $username = explode('@', $user['email'])[0];
 $lockFile = BASE_PATH . '/locks/' . $username . '.lock';
 $logFile = BASE_PATH . '/logs/' . $username . '_sync.log';
+$spoolDir = BASE_PATH . '/spool';
 
 // Créer les dossiers si nécessaire
 @mkdir(BASE_PATH . '/locks', 0755, true);
 @mkdir(BASE_PATH . '/logs', 0755, true);
 
+// ========== DAEMON (sync.py --daemon) ==========
+
+// PID du daemon s'il tourne : le sync lui est alors confié via spool/ (pas de fork)
+$daemonPidFile = BASE_PATH . '/locks/daemon.pid';
+$daemonPid = file_exists($daemonPidFile) ? trim(file_get_contents($daemonPidFile)) : '';
+$daemonRunning = !empty($daemonPid) && is_numeric($daemonPid) && posix_getpgid((int) $daemonPid) !== false;
+
+// Clic répété pendant un sync du daemon : on se rattache au sync en cours
+if ($daemonRunning && file_exists($lockFile) && trim(file_get_contents($lockFile)) === $daemonPid) {
+    echo json_encode([
+        'status' => 'started',
+        'message' => 'Synchronisation déjà en cours',
+        'pid' => $daemonPid,
+        'log_file' => basename($logFile)
+    ]);
+    exit;
+}
+
 // Vider le log au début
 file_put_contents($logFile, '');  // Vider le log
 
@@ -98,6 +117,32 @@ $tempConfigFile = BASE_PATH . '/config/temp_' . $username . '.json';
 file_put_contents($tempConfigFile, json_encode($scraperConfig, JSON_PRETTY_PRINT));
 logSync("Config temp créée: $tempConfigFile");
 
+// ========== DÉCLENCHER LE DAEMON ==========
+
+if ($daemonRunning) {
+    @mkdir($spoolDir, 0775, true);
+    $trigger = $spoolDir . '/' . $username . '.json';
+    // Écriture atomique : le daemon ne lit jamais un fichier à moitié écrit
+    file_put_contents($trigger . '.tmp', json_encode([
+        'config' => $tempConfigFile,
+        'budget' => SYNC_BUDGET,
+        'requested_at' => time()
+    ]));
+    rename($trigger . '.tmp', $trigger);
+
+    // Le lock désigne le daemon jusqu'à la fin du sync (sync-status.php, stream-logs.php)
+    file_put_contents($lockFile, $daemonPid);
+    logSync("Sync confié au daemon (PID: $daemonPid)");
+
+    echo json_encode([
+        'status' => 'started',
+        'message' => 'Sync confié au daemon',
+        'pid' => $daemonPid,
+        'log_file' => basename($logFile)
+    ]);
+    exit;
+}
+
 // ========== LANCER LE SCRAPER VIA SCRIPT SHELL ==========
 
 $launchScript = BASE_PATH . '/launch-scraper.sh';
@@ -124,11 +169,12 @@ logsync("[" . date('Y-m-d H:i:s') . "] ━━━━━━━━━━━━━
 
 // Lancer le script shell
 $cmd = sprintf(
-    '%s %s %s %s 2>&1',
+    '%s %s %s %s %s 2>&1',
     escapeshellarg($launchScript),
     escapeshellarg($tempConfigFile),
     escapeshellarg($logFile),
-    escapeshellarg($lockFile)
+    escapeshellarg($lockFile),
+    escapeshellarg((string) SYNC_BUDGET)
 );
 
 exec($cmd, $output, $returnCode);
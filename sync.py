@@ -8,21 +8,66 @@ Usage:
     python3 sync.py --config=config/temp_user1.json --full   # Mode complet (600 convs)
     python3 sync.py --config=config/temp_user1.json --headful
     python3 sync.py --config=config/temp_user1.json --firefox
+    python3 sync.py --config=config/temp_user1.json --fresh-login  # Ignore la session sauvegardée
+    python3 sync.py --users config/*.json --concurrency 4    # Plusieurs users, un seul navigateur
+    python3 sync.py --config=config/temp_user1.json --direct # Messages récupérés par ID, sans clic
+    python3 sync.py --config=config/temp_user1.json --resume # Reprend un run interrompu (checkpoint)
+    python3 sync.py --config=config/temp_user1.json --images # + téléchargement des images dans media/
+    python3 sync.py --config=config/temp_user1.json --metrics=/var/lib/node_exporter  # Dossier des métriques
+    python3 sync.py --config=bench.json --target-url=http://127.0.0.1:8780/dashboard/conversations  # Fixture locale
+    python3 sync.py --daemon --interval 30 --concurrency 2   # Navigateur chaud, syncs périodiques + déclenchements web
+    python3 sync.py --config=config/temp_user1.json --budget=90  # Au plus 90s, conversations prioritaires d'abord
+    python3 sync.py --config=config/temp_user1.json --archive    # + archive JSONL compressée dans archive/<db>/
 """
 
+import os
 import sys
+import glob
 import json
 import time
+import signal
+import random
+import socket
+import inspect
+import asyncio
 import argparse
+import contextvars
 from pathlib import Path
-from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeout
+import requests
+from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeout, Error as PlaywrightError
+from session_store import load_session, save_session, drop_session, probe_session, scrub_state
+from selector_health import preflight, describe
+from ingest import SaveWorker
+from sync_state import SyncState, STATE_DIR
+from net_filter import RequestFilter, resolve_rules
+from image_store import ImageDownloader
+from run_metrics import RunMetrics, ResultTally, METRICS_DIR
+from annonce_cache import AnnonceCache, fetch_annonce_index, DEFAULT_TTL_HOURS
+from archive import ArchiveWriter
+from page_monitor import PageMonitor
+from notifier import enqueue
 
 # ========== PARSE ARGUMENTS ==========
 parser = argparse.ArgumentParser(description='Scraper Annonces.nc')
 parser.add_argument('--config', type=str, help='Fichier de configuration JSON')
+parser.add_argument('--users', type=str, nargs='+', help='Plusieurs configs JSON (globs acceptés) synchronisées dans un seul navigateur')
+parser.add_argument('--concurrency', type=int, default=3, help='Nombre de contextes utilisateur en parallèle (avec --users)')
 parser.add_argument('--headful', action='store_true', help='Mode visible (debug)')
 parser.add_argument('--firefox', action='store_true', help='Utiliser Firefox')
 parser.add_argument('--full', action='store_true', help='Mode complet (désactive smart stop)')
+parser.add_argument('--fresh-login', action='store_true', help='Ignorer la session sauvegardée et refaire le login')
+parser.add_argument('--direct', action='store_true', help='Fetch direct des messages par ID (sans clic ni attente XHR)')
+parser.add_argument('--resume', action='store_true', help='Reprendre le run interrompu (pages déjà chargées, conversations déjà sauvegardées)')
+parser.add_argument('--images', action='store_true', help='Télécharger les images des messages dans media/ après le scraping')
+parser.add_argument('--archive', action='store_true', help='Archiver chaque payload dans archive/<db_name>/ (JSONL gzip + index)')
+parser.add_argument('--metrics', type=str, default=str(METRICS_DIR), help='Dossier des métriques du run (JSON + textfile Prometheus)')
+parser.add_argument('--state-dir', type=str, default=str(STATE_DIR), help='Dossier de l\'index local, du checkpoint et du cache annonces')
+parser.add_argument('--no-notify', action='store_true', help='Ne pas déposer le résumé de fin de sync dans outbox/ (sondes)')
+parser.add_argument('--target-url', type=str, default='https://annonces.nc/dashboard/conversations',
+                    help='Page des conversations (fixture_server.py pour les benchmarks)')
+parser.add_argument('--budget', type=float, help='Durée max du sync en secondes : conversations traitées par priorité, le reste est reporté')
+parser.add_argument('--daemon', action='store_true', help='Reste lancé : navigateur chaud, syncs périodiques des --users et déclenchements via spool/')
+parser.add_argument('--interval', type=float, default=30, help='Minutes entre deux syncs périodiques d\'un utilisateur (avec --daemon, 0 = jamais)')
 args = parser.parse_args()
 
 # ========== CONFIG ==========
@@ -35,85 +80,160 @@ else:
 
 LOGIN_JS = SCRAPER_DIR / 'login.js'
 SCRAPER_JS = SCRAPER_DIR / 'scraper.js'
-TARGET_URL = 'https://annonces.nc/dashboard/conversations'
+LOCKS_DIR = SCRAPER_DIR / 'locks'
+LOGS_DIR = SCRAPER_DIR / 'logs'
+SPOOL_DIR = SCRAPER_DIR / 'spool'
+DAEMON_PID_FILE = LOCKS_DIR / 'daemon.pid'
+# Registre du daemon : configs sans mot de passe (config/daemon_<user>.json)
+DAEMON_REGISTRY = SCRAPER_DIR / 'config' / 'daemon_*.json'
+
+
+def shared_setting(key):
+    """Clé de scraper-config.json (repli des configs temporaires), None si absente"""
+    try:
+        with open(SCRAPER_DIR / 'scraper-config.json') as f:
+            return json.load(f).get(key)
+    except (OSError, ValueError):
+        return None
+
+
+TARGET_URL = args.target_url
 
 # ========== SMART SCRAPING CONFIG ==========
 SMART_STOP_ENABLED = not args.full
 COLLISION_THRESHOLD = 5  # Arrêter après 5 convs sans nouveaux messages
 CONVS_PER_PAGE = 25  # Nombre de conversations par page sur annonces.nc
 
+# Utilisateur courant (préfixe des logs en mode multi-utilisateurs)
+CURRENT_USER = contextvars.ContextVar('CURRENT_USER', default=None)
+# Fichier de log de l'utilisateur courant (mode --daemon : logs/<user>_sync.log), sinon stdout/stderr
+LOG_SINK = contextvars.ContextVar('LOG_SINK', default=None)
+
+
+class ConfigError(Exception):
+    """Config utilisateur inutilisable"""
+
+
 # ========== HELPERS ==========
 def get_timestamp():
     return time.strftime('%Y-%m-%d %H:%M:%S')
 
+def user_tag():
+    user = CURRENT_USER.get()
+    return f'[{user}]' if user else ''
+
+def emit(line, stream=None, sink=None):
+    sink = sink or LOG_SINK.get()
+    if sink:
+        sink.write(line + '\n')
+        sink.flush()
+    else:
+        print(line, file=stream or sys.stdout, flush=True)
+
 def log(msg):
-    print(f'[{get_timestamp()}][PY] {msg}', flush=True)
+    emit(f'[{get_timestamp()}][PY]{user_tag()} {msg}')
 
 def error(msg):
-    print(f'[{get_timestamp()}][PY] ❌ {msg}', file=sys.stderr, flush=True)
+    emit(f'[{get_timestamp()}][PY]{user_tag()} ❌ {msg}', stream=sys.stderr)
 
 def check_database_empty(config):
-    """Vérifie si la base est vide en interrogeant l'API"""
+    """Vérifie si la base est vide (sonde has_messages : un seul index lu, quelle que soit la taille)"""
     try:
-        import requests
-        
-        # Construire l'URL stats
-        api_base = config['apiUrl'].replace('?action=save', '?action=stats')
+        api_base = config['apiUrl'].replace('?action=save', '?action=has_messages')
         db_name = config.get('db_name', 'annonces_messages_default')
-        
-        # Appeler l'API stats (nécessite auth, donc on utilise le header)
-        # Note: l'action stats nécessite auth, on va plutôt compter sur le fichier config
-        # Alternative: faire une requête simple
-        
+
         response = requests.get(api_base, headers={'X-User-Database': db_name}, timeout=5)
-        
+
         if response.status_code == 200:
-            stats = response.json()
-            msg_count = stats.get('messages', 0)
-            log(f'📊 Base actuelle: {msg_count} messages')
-            return msg_count == 0
+            has_messages = response.json().get('has_messages', True)
+            log(f'📊 Base actuelle: {"non vide" if has_messages else "vide"}')
+            return not has_messages
         else:
             log(f'⚠️  Impossible de vérifier la base (status {response.status_code})')
             return False  # Par défaut, mode smart
-            
+
     except Exception as e:
         log(f'⚠️  Erreur vérification base: {e}')
         return False  # Par défaut, mode smart
 
-def load_config():
-    """Charge la config depuis JSON"""
-    if not CONFIG_FILE.exists():
-        error(f'Config manquante: {CONFIG_FILE}')
-        sys.exit(1)
-    
-    with open(CONFIG_FILE) as f:
+def user_from_config_path(config_path):
+    """Nom court de l'utilisateur (temp_bob.json / daemon_bob.json → bob)"""
+    stem = Path(config_path).stem
+    for prefix in ('temp_', 'daemon_'):
+        if stem.startswith(prefix):
+            return stem[len(prefix):]
+    return stem
+
+def is_temp_config(config_path):
+    """Config écrite par sync.php : contient le mot de passe en clair, supprimée après usage"""
+    return Path(config_path).stem.startswith('temp_')
+
+def drop_temp_config(config_path):
+    if config_path and is_temp_config(config_path):
+        try:
+            Path(config_path).unlink()
+            log(f'🧹 Config temporaire supprimée: {config_path}')
+        except OSError:
+            pass
+
+def load_config(config_path=None, require_password=True):
+    """Charge la config depuis JSON (registre du daemon : `require_password=False`)"""
+    config_path = Path(config_path) if config_path else CONFIG_FILE
+    if not config_path.exists():
+        raise ConfigError(f'Config manquante: {config_path}')
+
+    with open(config_path) as f:
         config = json.load(f)
-    
-    if not config.get('email') or not config.get('password'):
-        error('Credentials manquants dans config')
-        sys.exit(1)
-    
+
+    if not isinstance(config, dict) or not config.get('email') or (require_password and not config.get('password')):
+        raise ConfigError(f'Credentials manquants dans config: {config_path}')
+
     # Extraire db_name pour la vérification
     db_name = config.get('db_name')
-    if not db_name and args.config:
-        username = Path(args.config).stem.replace('temp_', '')
-        db_name = f'annonces_messages_{username}'
+    if not db_name:
+        if config_path.name != 'scraper-config.json':
+            db_name = f'annonces_messages_{user_from_config_path(config_path)}'
+        else:
+            db_name = 'annonces_messages_default'
         config['db_name'] = db_name
-    
-    # Décider du mode : --full explicite OU base vide
+
+    # Décider du mode : --full explicite OU base vide OU reprise d'un run full
     force_full = args.full
-    
+
+    if args.resume and not force_full:
+        state = SyncState(db_name, args.state_dir)
+        checkpoint = state.checkpoint_info()
+        state.close()
+        if checkpoint and checkpoint['mode'] == 'full':
+            log('♻️  Checkpoint d\'un run FULL → reprise en MODE FULL')
+            force_full = True
+
     if not force_full:
         # Vérifier si la base est vide
         is_empty = check_database_empty(config)
         if is_empty:
             log('🆕 Base vide détectée → MODE FULL automatique')
             force_full = True
-    
+
+    if args.direct:
+        config['directFetch'] = True
+
+    if args.budget:
+        config['budget'] = args.budget
+
+    # Règles réseau : celles de la config utilisateur, sinon celles de scraper-config.json
+    config['network'] = resolve_rules(config)
+
+    # Débit adaptatif et sélecteurs de secours : même repli (les défauts sont dans scraper.js)
+    if 'throttle' not in config:
+        config['throttle'] = shared_setting('throttle')
+    if 'selectorFallbacks' not in config:
+        config['selectorFallbacks'] = shared_setting('selectorFallbacks') or []
+
     # Ajouter config smart scraping
     config['smartStop'] = not force_full
     config['collisionThreshold'] = COLLISION_THRESHOLD
-    
+
     # Calculer maxPages automatiquement selon le mode
     if force_full:
         # Mode full : calculer le nombre de clics "Voir plus" nécessaires
@@ -126,7 +246,7 @@ def load_config():
         config['maxPages'] = config.get('maxPages', 5)  # 5 pages = 125 convs max
         config['maxConversations'] = config.get('maxConversations', 200)
         log(f'🧠 MODE SMART: max {config["maxPages"]} pages ({config["maxPages"] * CONVS_PER_PAGE} convs), arrêt après {COLLISION_THRESHOLD} collisions')
-    
+
     return config
 
 def load_script(script_path):
@@ -134,235 +254,908 @@ def load_script(script_path):
     if not script_path.exists():
         error(f'Script manquant: {script_path}')
         sys.exit(1)
-    
+
     with open(script_path) as f:
         return f.read()
 
-def inject_config(page, config):
+async def inject_config(page, config):
     """Injecte la config dans localStorage du navigateur"""
     config_json = json.dumps(config)
     config_escaped = config_json.replace('\\', '\\\\').replace("'", "\\'")
-    
-    page.evaluate(f"""
+
+    await page.evaluate(f"""
         localStorage.setItem('SCRAPER_CONFIG', '{config_escaped}');
         console.log('[PYTHON] Config injectée dans localStorage');
     """)
 
-def send_telegram_notification(config, stats):
-    """Envoie une notification Telegram de fin de scraping"""
+def queue_sync_notification(config, stats):
+    """Résumé de fin de scraping déposé dans outbox/ (envoyé et regroupé par notifier.py)"""
+    try:
+        enqueue({
+            'kind': 'sync_summary',
+            'db_name': config['db_name'],
+            'email': config['email'],
+            'admin_fallback': True,
+            'mode': 'COMPLET' if not config.get('smartStop', True) else 'SMART',
+            'host': socket.gethostname(),
+            'stats': {key: stats.get(key) for key in
+                      ('total', 'total_new_messages', 'succeeded', 'failed', 'stop_reason')}
+        })
+    except OSError as e:
+        log(f'⚠️  Notification non déposée dans l\'outbox: {e}')
+
+def is_locked_by_other_process(config):
+    """True si un sync mono-utilisateur (sync.php → launch-scraper.sh) tourne déjà pour ce user"""
+    lock_file = LOCKS_DIR / f'{config["email"].split("@")[0]}.lock'
+    if not lock_file.exists():
+        return False
+    try:
+        pid = int(lock_file.read_text().strip())
+    except (OSError, ValueError):
+        return False
+    if pid == os.getpid():
+        return False  # lock posé par ce daemon (ou par sync.php pour ce daemon)
+    try:
+        os.kill(pid, 0)
+    except OSError:
+        return False
+    return True
+
+async def wait_for_conversations(page, config):
+    """Attend l'apparition de la liste des conversations (plafond: timeouts.loginSuccess)"""
+    try:
+        await page.wait_for_selector(config['selectors']['convList'],
+                                     timeout=config['timeouts'].get('loginSuccess', 5000))
+    except PlaywrightTimeout:
+        log('⚠️  Liste des conversations pas encore visible, on continue')
+
+# ========== NAVIGATEUR ==========
+async def launch_browser(p, headless=True, browser_type='chromium'):
+    """Lance le navigateur partagé"""
+    if browser_type == 'firefox':
+        return await p.firefox.launch(headless=headless)
+    return await p.chromium.launch(
+        headless=headless,
+        args=['--disable-web-security', '--disable-features=IsolateOrigins,site-per-process']
+    )
+
+async def download_images(config):
+    """Étape images : télécharge les images sans local_path de la base de l'utilisateur"""
+    log('🖼️  Téléchargement des images...')
+    downloader = ImageDownloader(config, concurrency=config.get('imageConcurrency', 8), log=log)
     try:
-        import requests
-        import socket
-        
-        users_config_file = SCRAPER_DIR / 'config' / 'users.json'
-        if not users_config_file.exists():
-            return
-        
-        with open(users_config_file) as f:
-            users_config = json.load(f)
-        
-        bot_token = users_config.get('telegram_bot_token')
-        if not bot_token:
-            return
-        
-        # Trouver le chat_id de l'utilisateur correspondant
-        chat_id = None
-        for user in users_config.get('users', []):
-            if user.get('email') == config['email'] or user.get('annonces_email') == config['email']:
-                chat_id = user.get('telegram_chat_id')
+        stats = await downloader.run()
+        log(f'🖼️  Images: {downloader.summary()}')
+        return stats
+    finally:
+        await downloader.close()
+
+# Compteurs additionnés d'un segment de scraping à l'autre (page recyclée en cours de run)
+SEGMENT_SUMS = ('total', 'total_new_messages', 'annonces_fetched', 'annonces_skipped', 'annonces_cached',
+                'unchanged_skipped', 'annonces_deferred', 'succeeded', 'failed', 'selector_switches')
+
+def merge_segments(previous, current):
+    """Résultat du run = dernier segment + sommes des compteurs des précédents"""
+    merged = dict(current)
+    for key in SEGMENT_SUMS:
+        merged[key] = previous.get(key, 0) + current.get(key, 0)
+    # Le segment suivant revoit comme "déjà faites" les conversations du précédent
+    merged['resumed_skipped'] = previous.get('resumed_skipped', 0)
+    return merged
+
+def write_metrics(metrics, scraper_result, worker):
+    """Fin de run : JSON détaillé + textfile Prometheus (un échec d'écriture ne casse pas le sync)"""
+    result = scraper_result or {}
+    metrics.record('total', time.time() - metrics.started_at)
+    metrics.finish(
+        success=bool(result.get('success')),
+        conversations=result.get('total', 0),
+        new_messages=result.get('total_new_messages', 0),
+        failed=result.get('failed', 0),
+        unchanged_skipped=result.get('unchanged_skipped', 0),
+        pages_loaded=result.get('pages_loaded', 0),
+        deferred=sum(result.get('deferred', {}).values()),
+        throttle_rate=(result.get('throttle') or {}).get('rate'),
+        throttle_decreases=(result.get('throttle') or {}).get('decreases', 0),
+        circuit_open=int(bool(result.get('circuit_breaker'))),
+        recycles=result.get('recycles', 0),
+        peak_heap_mb=(result.get('memory') or {}).get('heap_mb'),
+        peak_dom_nodes=(result.get('memory') or {}).get('dom_nodes'),
+        selector_switches=result.get('selector_switches', 0),
+        stop_reason=result.get('stop_reason'),
+        blocked_requests=result.get('network', {}).get('blocked', 0),
+        save_batches=worker.stats['batches'] if worker else 0
+    )
+    try:
+        path = metrics.write(args.metrics)
+        log(f'📈 Métriques: {path}')
+    except OSError as e:
+        log(f'⚠️  Écriture métriques impossible: {e}')
+
+    for name, s in sorted(metrics.phase_stats().items(), key=lambda kv: -kv[1]['total']):
+        log(f'   ⏱️  {name}: {s["total"]:.1f}s ({s["count"]}x, p50 {s["p50"]:.2f}s, p95 {s["p95"]:.2f}s, max {s["max"]:.2f}s)')
+
+# ========== CONTEXTE NAVIGATEUR D'UN UTILISATEUR ==========
+class UserPage:
+    """
+    BrowserContext + page d'un utilisateur. Un sync ponctuel l'ouvre et le ferme ;
+    en mode --daemon il reste ouvert d'un sync à l'autre (cookies, localStorage,
+    application déjà chargée, bindings déjà en place). Pas de cache HTTP : le
+    filtrage réseau (context.route) le désactive.
+
+    Les bindings window.py* ne peuvent pas être retirés d'une page : ils sont
+    exposés une fois et redirigés vers les objets du run en cours (bind()).
+    """
+
+    def __init__(self):
+        self.context = None
+        self.page = None
+        self.request_filter = None
+        self.exposed = set()
+        self.handlers = {}
+        self.run_context = None
+        self.sink = None
+        self.tag = ''
+
+    @property
+    def is_open(self):
+        return self.page is not None and not self.page.is_closed()
+
+    async def open(self, browser, config, saved_session=None):
+        self.context = await browser.new_context(
+            viewport={'width': 1920, 'height': 1080},
+            user_agent='Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36',
+            storage_state=saved_session
+        )
+        self.request_filter = RequestFilter(config.get('network', {}), log=log)
+        await self.request_filter.install(self.context)
+        self.page = await self.context.new_page()
+        self.page.on("console", self._on_console)
+        self.exposed = set()
+
+    def _on_console(self, msg):
+        ts = time.strftime('%Y-%m-%d %H:%M:%S')
+        text = msg.text
+        if text.startswith('[2'):
+            emit(text, sink=self.sink)
+        elif text.startswith('[LOGIN]') or text.startswith('[SCRAPER]') or text.startswith('[PYTHON]'):
+            emit(f'[{ts}]{self.tag}{text}', sink=self.sink)
+        else:
+            emit(f'[{ts}][JS]{self.tag} {text}', sink=self.sink)
+
+    async def bind(self, handlers):
+        """
+        Branche les bindings du run (nom → callable). False si la page expose déjà
+        un binding que ce run ne fournit pas (config modifiée) : il faut rouvrir la page.
+        """
+        if self.exposed - set(handlers):
+            return False
+        self.handlers = handlers
+        self.run_context = contextvars.copy_context()
+        self.sink = LOG_SINK.get()
+        self.tag = user_tag()
+        for name in handlers:
+            if name not in self.exposed:
+                await self.page.expose_function(name, self._binding(name))
+                self.exposed.add(name)
+        return True
+
+    def _binding(self, name):
+        async def call(*call_args):
+            # Exécuté dans le contexte du run (préfixe utilisateur, fichier de log)
+            result = self.run_context.run(self.handlers[name], *call_args)
+            if inspect.isawaitable(result):
+                result = await self.run_context.run(asyncio.ensure_future, result)
+            return result
+        return call
+
+    async def recycle(self, browser, config):
+        """Contexte neuf avec les cookies/localStorage de l'actuel (mémoire de l'onglet rendue), mêmes bindings"""
+        storage = scrub_state(await self.context.storage_state())  # config ré-injectée après navigation
+        handlers = self.handlers
+        network_stats = self.request_filter.stats
+        await self.close()
+        await self.open(browser, config, storage)
+        self.request_filter.stats = network_stats  # compteurs réseau du run entier
+        await self.bind(handlers)
+
+    async def close(self):
+        if self.context:
+            try:
+                await self.context.close()
+            except PlaywrightError:
+                pass
+        self.context = None
+        self.page = None
+        self.exposed = set()
+
+# ========== SYNC D'UN UTILISATEUR ==========
+async def sync_user(browser, config, login_js, scraper_js, headless=True, user_page=None):
+    """
+    Login puis scraping d'un utilisateur dans son propre BrowserContext.
+    `user_page` (mode --daemon) : contexte gardé ouvert entre deux syncs, réutilisé
+    s'il est encore valide. Sans lui, le contexte est créé puis fermé.
+    Retourne le résultat du scraper (dict) ou None en cas d'échec.
+    """
+    db_name = config['db_name']
+    metrics = RunMetrics(db_name, 'smart' if config['smartStop'] else 'full')
+    tally = ResultTally(log=log)
+    scraper_result = None
+    keep_page = user_page is not None
+
+    # Budget : échéance absolue (ms epoch) lue par scraper.js, navigation et login compris
+    deadline = None
+    if config.get('budget') and not config['smartStop']:
+        # FULL (demandé, base vide ou reprise) : un run coupé laisserait la base non vide,
+        # les syncs smart suivants ne chargeraient jamais les anciennes conversations
+        log(f'⏱️  Budget {config.pop("budget"):g}s ignoré en MODE FULL (crawl complet en arrière-plan)')
+    if config.get('budget'):
+        deadline = time.time() + config['budget']
+        config['deadline'] = int(deadline * 1000)
+        log(f'⏱️  Budget: {config["budget"]:g}s')
+    user_page = user_page or UserPage()
+
+    # Archive brute des payloads (passe par le worker Python)
+    archive = None
+    if args.archive or config.get('archive'):
+        if config.get('pythonSave', True):
+            archive = ArchiveWriter(db_name, config.get('archiveDir'), config.get('archiveMaxMb', 64) * 1024 * 1024)
+            log(f'🗄️  Archive: {archive.directory}')
+        else:
+            log('⚠️  Archive ignorée: nécessite "pythonSave"')
+
+    # Persistance déléguée à Python (désactivable avec "pythonSave": false dans la config)
+    worker = None
+    if config.get('pythonSave', True):
+        worker = SaveWorker(config, max_in_flight=config.get('saveMaxInFlight', 4), log=log, metrics=metrics,
+                            archive=archive)
+
+    # Index local des conversations déjà synchronisées
+    state = SyncState(db_name, args.state_dir)
+    last_success = state.last_success()
+    log(f'🗂️  Index local: {state.count()} conversations connues'
+        + (f', dernier sync réussi {time.strftime("%d/%m %H:%M", time.localtime(last_success))}' if last_success else ''))
+
+    # Checkpoint du run (curseur de pagination + conversations faites), repris avec --resume
+    checkpoint = state.start_checkpoint('smart' if config['smartStop'] else 'full', resume=args.resume)
+    if checkpoint:
+        config['resume'] = {'pages': checkpoint['pages']}
+        log(f'♻️  Reprise du checkpoint du {time.strftime("%d/%m %H:%M", time.localtime(checkpoint["started_at"]))}: '
+            f'{checkpoint["pages"]} pages, {checkpoint["done"]} conversations déjà sauvegardées')
+    elif args.resume:
+        log('♻️  Aucun checkpoint à reprendre, run normal')
+
+    # Cache annonces : le modal n'est ouvert que pour les annonces inconnues ou périmées
+    annonce_cache = None
+    if config.get('fetchAnnonce', True):
+        annonce_cache = AnnonceCache(db_name, config.get('annonceCacheTtlHours', DEFAULT_TTL_HOURS), args.state_dir)
+        try:
+            with metrics.phase('annonce_seed'):
+                added = annonce_cache.seed(await asyncio.to_thread(fetch_annonce_index, config))
+            log(f'📄 Cache annonces: {added} ajoutées depuis la base')
+        except (requests.RequestException, ValueError) as e:
+            log(f'⚠️  Cache annonces non amorcé: {e}')
+
+    # Bindings appelés par scraper.js
+    handlers = {
+        'pyMetric': metrics.on_page_event,  # timings (pagination, XHR, modal annonce, saves...)
+        'pyResult': tally.on_result,  # résultat de chaque conversation, au fil de l'eau
+        'pyStateLookup': state.lookup,
+        'pyStateRecord': state.record,
+        'pyCheckpoint': state.checkpoint_pages,
+        'pyCheckpointDone': state.done_flags
+    }
+    if worker:
+        handlers['pySaveBatch'] = worker.save_batch
+    if annonce_cache:
+        handlers['pyAnnonceLookup'] = annonce_cache.lookup
+        handlers['pyAnnonceRecord'] = annonce_cache.record
+
+    page = None
+    saved_session = None
+    if user_page.is_open:
+        log('♨️  Contexte navigateur déjà ouvert (session en mémoire)')
+    else:
+        saved_session = None if args.fresh_login else load_session(config['email'])
+        if saved_session:
+            log('🍪 Session sauvegardée trouvée')
+
+    try:
+        if user_page.is_open and not await user_page.bind(handlers):
+            log('♻️  Config modifiée (bindings), réouverture du contexte')
+            await user_page.close()
+        if not user_page.is_open:
+            await user_page.open(browser, config, saved_session)
+            await user_page.bind(handlers)
+        context = user_page.context
+        page = user_page.page
+        request_filter = user_page.request_filter
+        request_filter.reset_stats()
+
+        log(f'🔗 Navigation vers {TARGET_URL}...')
+        with metrics.phase('navigation'):
+            await page.goto(TARGET_URL, wait_until='domcontentloaded', timeout=30000)
+        log('✅ Page chargée')
+
+        # Une seule sonde : liste des conversations (connecté) ou modal de login
+        log('🔎 Vérification session...')
+        with metrics.phase('session_probe'):
+            session_ok = await probe_session(page, config)
+        if saved_session and not session_ok:
+            log('⌛ Session expirée, login nécessaire')
+            drop_session(config['email'])
+
+        log('💉 Injection config dans localStorage...')
+        await inject_config(page, config)
+
+        # ========== ÉTAPE 1 : LOGIN ==========
+        log('')
+        log('━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━')
+        log('🔐 ÉTAPE 1/2 : LOGIN')
+        log('━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━')
+
+        if session_ok:
+            log('✅ Session valide, login ignoré')
+        elif not config.get('password'):
+            # Sync périodique du daemon : son registre ne garde pas les mots de passe
+            error('Session expirée et pas de mot de passe (registre du daemon) : relancer un sync depuis le web')
+            return None
+        else:
+            with metrics.phase('login'):
+                login_result = await page.evaluate(login_js)
+
+            if not login_result.get('success'):
+                error(f'Échec login: {login_result.get("message")}')
+                if headless:
+                    screenshot_path = SCRAPER_DIR / f'error-login-{db_name}.png'
+                    await page.screenshot(path=str(screenshot_path))
+                return None
+
+            log(f'✅ Login: {login_result.get("message")}')
+
+            if login_result.get('status') == 'logged_in':
+                log('⏳ Attente liste des conversations après login...')
+                with metrics.phase('login_wait'):
+                    await wait_for_conversations(page, config)
+                log('💉 Ré-injection config...')
+                await inject_config(page, config)
+
+            save_session(config['email'], await context.storage_state())
+            log('🍪 Session sauvegardée')
+
+        # Sélecteurs : un DOM modifié coûterait un timeout par conversation
+        with metrics.phase('selector_check'):
+            selectors_ok, selector_problems = await preflight(page, config, log=log)
+        if not selectors_ok:
+            error(f'Sélecteurs cassés, scraping annulé: {describe(selector_problems)}')
+            error('Corriger avec edit-config.py set-selector, ou ajouter un jeu dans "selectorFallbacks"')
+            if headless:
+                screenshot_path = SCRAPER_DIR / f'error-selectors-{db_name}.png'
+                await page.screenshot(path=str(screenshot_path))
+            return None
+        if selector_problems:
+            await inject_config(page, config)
+
+        # ========== ÉTAPE 2 : SCRAPING ==========
+        log('')
+        log('━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━')
+        log('📊 ÉTAPE 2/2 : SCRAPING')
+        log('━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━')
+
+        # Seuil mémoire dépassé : le scraper s'arrête, contexte neuf, reprise au checkpoint
+        monitor = PageMonitor(config, metrics=metrics, log=log)
+        recycles = 0
+        previous = None
+        while True:
+            await monitor.start(page, user_page.context)
+            try:
+                with metrics.phase('scraping'):
+                    scraper_result = await page.evaluate(scraper_js)
+            finally:
+                await monitor.stop()
+            if previous:
+                scraper_result = merge_segments(previous, scraper_result)
+            if not scraper_result.get('success') or not scraper_result.get('recycle'):
                 break
-        
-        if not chat_id:
-            chat_id = users_config.get('admin_telegram_chat_id')
-        
-        if not chat_id:
-            return
-        
-        # Construire le message
-        hostname = socket.gethostname()
-        mode = "COMPLET" if args.full else "SMART"
-        stop_reason = stats.get('stop_reason', 'fin normale')
-        
-        message = f"✅ <b>Scraping {mode} terminé</b>\n\n"
-        message += f"📍 Source: <code>{hostname}</code>\n\n"
-        message += f"📊 <b>Résumé:</b>\n"
-        message += f"  • Conversations: {stats.get('total', 0)}\n"
-        message += f"  • Nouveaux msgs: {stats.get('total_new_messages', 0)}\n"
-        message += f"  • Succès: {stats.get('succeeded', 0)}\n"
-        message += f"  • Échecs: {stats.get('failed', 0)}\n"
-        message += f"  • Arrêt: {stop_reason}\n"
-        message += f"\n⏰ {time.strftime('%d/%m/%Y à %H:%M')}"
-        
-        url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
-        data = {
-            'chat_id': chat_id,
-            'text': message,
-            'parse_mode': 'HTML'
-        }
-        
-        requests.post(url, data=data, timeout=10)
-        log('📱 Notification Telegram envoyée')
-        
+
+            recycles += 1
+            previous = scraper_result
+            log(f'♻️  Recyclage #{recycles} ({monitor.recycle_reason}) après {scraper_result.get("total", 0)} conversations')
+            with metrics.phase('recycle'):
+                await user_page.recycle(browser, config)
+                page = user_page.page
+                await page.goto(TARGET_URL, wait_until='domcontentloaded', timeout=30000)
+                session_ok = await probe_session(page, config)
+            if not session_ok:
+                error('Session perdue après recyclage, arrêt (reprise: --resume)')
+                return None
+            info = state.checkpoint_info()
+            config['resume'] = {'pages': info['pages'] if info else 0}
+            await inject_config(page, config)
+            log(f'✅ Page neuve, reprise à {config["resume"]["pages"]} pages')
+        scraper_result['recycles'] = recycles
+        if monitor.last:
+            scraper_result['memory'] = dict(monitor.peak, recycles=recycles)
+
+        if not scraper_result.get('success'):
+            error(f'Échec scraping: {scraper_result.get("error")}')
+            if headless:
+                screenshot_path = SCRAPER_DIR / f'error-scraper-{db_name}.png'
+                await page.screenshot(path=str(screenshot_path))
+            return None
+
+        log('')
+        log('━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━')
+        log('✨ RÉSUMÉ')
+        log('━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━')
+        log(f'Total conversations: {scraper_result.get("total", 0)}')
+        log(f'Nouveaux messages: {scraper_result.get("total_new_messages", 0)}')
+        log(f'Succès: {scraper_result.get("succeeded", 0)}')
+        log(f'Échecs: {scraper_result.get("failed", 0)}')
+        scraper_result['results'] = tally.to_dict()
+        if tally.errors:
+            log('Échecs par cause: ' + ', '.join(f'{cause} x{n}' for cause, n in tally.errors.most_common(5)))
+        log(f'Arrêt: {scraper_result.get("stop_reason", "fin normale")}')
+        if scraper_result.get('selector_switches'):
+            log(f'🔀 Sélecteurs de secours utilisés ({scraper_result["selector_switches"]} bascule(s)): '
+                f'{json.dumps(scraper_result.get("selectors"), ensure_ascii=False)}')
+        if worker:
+            log(f'Worker save: {worker.summary()}')
+        if archive:
+            log(f'Archive: {archive.summary()}')
+        log(f'Réseau: {request_filter.summary()}')
+        if annonce_cache:
+            log(f'Cache annonces: {annonce_cache.summary()}')
+        scraper_result['network'] = request_filter.stats
+        if scraper_result.get('unchanged_skipped'):
+            log(f'Inchangées (non ouvertes): {scraper_result["unchanged_skipped"]}')
+        if scraper_result.get('resumed_skipped'):
+            log(f'Déjà faites (reprise): {scraper_result["resumed_skipped"]}')
+        if scraper_result.get('budget_exhausted'):
+            deferred = scraper_result.get('deferred', {})
+            log(f'Reporté (budget): {deferred.get("unread", 0)} non lues, {deferred.get("changed", 0)} modifiées, '
+                f'{deferred.get("recent", 0)} récentes, {deferred.get("tail", 0)} ancienne traîne'
+                + (', pages suivantes non chargées' if scraper_result.get('pages_deferred') else ''))
+        if scraper_result.get('annonces_deferred'):
+            log(f'Annonces reportées (budget): {scraper_result["annonces_deferred"]}')
+        if monitor.last:
+            log(f'Mémoire page: {monitor.summary()}' + (f', {recycles} recyclage(s)' if recycles else ''))
+        if scraper_result.get('throttle'):
+            t = scraper_result['throttle']
+            log(f'Débit: {t["rate"]} req/s final (min {t["min_rate"]}, max {t["max_rate"]}), '
+                f'{t["increases"]} hausses, {t["decreases"]} freinages, {t["waited_ms"] / 1000:.1f}s d\'attente')
+        if scraper_result.get('circuit_breaker'):
+            # DOM modifié : pas un sync réussi, le checkpoint reste pour --resume une fois corrigé
+            breaker = scraper_result['circuit_breaker']
+            error(f'🔌 Run interrompu par le disjoncteur: {breaker["failures"]} échecs structurels de suite '
+                  f'({breaker["reason"]}), sélecteurs à vérifier: {", ".join(breaker["selectors"])}')
+            info = state.checkpoint_info()
+            if info:
+                log(f'💾 Checkpoint conservé: {info["pages"]} pages, {info["done"]} conversations (reprise: --resume)')
+            if headless:
+                screenshot_path = SCRAPER_DIR / f'error-selectors-{db_name}.png'
+                await page.screenshot(path=str(screenshot_path))
+            return None
+        state.mark_success()
+        state.clear_checkpoint()
+
+        if args.images or config.get('downloadImages'):
+            if deadline and time.time() >= deadline:
+                log('⏱️  Images reportées (budget épuisé)')
+            else:
+                with metrics.phase('images'):
+                    scraper_result['images'] = await download_images(config)
+
+        if not args.no_notify:
+            queue_sync_notification(config, scraper_result)
+
+        return scraper_result
+
+    except PlaywrightTimeout as e:
+        error(f'Timeout: {e}')
+        if headless and page:
+            screenshot_path = SCRAPER_DIR / f'error-timeout-{db_name}.png'
+            await page.screenshot(path=str(screenshot_path))
+        return None
+
     except Exception as e:
-        log(f'⚠️  Erreur notification Telegram: {e}')
+        error(f'Erreur: {e}')
+        if headless and page:
+            screenshot_path = SCRAPER_DIR / f'error-exception-{db_name}.png'
+            await page.screenshot(path=str(screenshot_path))
+        return None
+
+    except asyncio.CancelledError:
+        # SIGTERM : chaque conversation sauvegardée est déjà dans le checkpoint
+        info = state.checkpoint_info()
+        if info:
+            log(f'💾 Checkpoint sauvegardé: {info["pages"]} pages, {info["done"]} conversations (reprise: --resume)')
+        raise
+
+    finally:
+        if not keep_page or scraper_result is None or not scraper_result.get('success') \
+                or scraper_result.get('circuit_breaker'):
+            # Échec : le prochain sync repart d'un contexte neuf
+            await user_page.close()
+        user_page.sink = None  # logs console entre deux syncs : stdout du daemon
+        if worker:
+            await worker.close()
+        if archive:
+            archive.close()
+        state.close()
+        if annonce_cache:
+            annonce_cache.close()
+        write_metrics(metrics, scraper_result, worker)
 
 # ========== MAIN ==========
-def run_scraper(headless=True, browser_type='chromium'):
+def install_sigterm_handler():
+    """SIGTERM (sync.php relance un sync) : annule le run en cours pour fermer proprement le checkpoint"""
+    task = asyncio.current_task()
+
+    def on_sigterm():
+        log('🛑 SIGTERM reçu, arrêt après sauvegarde du checkpoint')
+        task.cancel()
+
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, on_sigterm)
+
+async def run_scraper(headless=True, browser_type='chromium'):
     """Lance le scraper en 2 étapes : login puis scraping"""
-    
+    install_sigterm_handler()
+
     log('━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━')
     log('🚀 SCRAPER ANNONCES.NC - PYTHON LAUNCHER')
     log('━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━')
-    
+
     log('📋 Chargement configuration...')
-    config = load_config()
+    try:
+        config = load_config()
+    except ConfigError as e:
+        error(str(e))
+        sys.exit(1)
     log(f'   Email: {config["email"]}')
     log(f'   API: {config["apiUrl"]}')
     log(f'   Max conversations: {config["maxConversations"]}')
     log(f'   Smart stop: {config["smartStop"]}')
     if config["smartStop"]:
         log(f'   Collision threshold: {config["collisionThreshold"]}')
-    
-    db_name = config.get('db_name')
-    if not db_name:
-        if args.config:
-            username = Path(args.config).stem.replace('temp_', '')
-            db_name = f'annonces_messages_{username}'
-        else:
-            db_name = 'annonces_messages_default'
-    
-    log(f'   Database: {db_name}')
-    
+    if config.get('directFetch'):
+        log(f'   Fetch direct: x{config.get("directFetchConcurrency", 4)}')
+    network = config['network']
+    if network.get('enabled', True):
+        log(f'   Blocage réseau: types {network.get("blockTypes", [])}, {len(network.get("blockDomains", []))} domaines')
+    log(f'   Database: {config["db_name"]}')
+
     log('📜 Chargement scripts JS...')
     login_js = load_script(LOGIN_JS)
     scraper_js = load_script(SCRAPER_JS)
-    
+
     mode = 'HEADLESS' if headless else 'HEADFUL'
     log(f'🌐 Lancement {browser_type.upper()} ({mode})...')
-    
-    with sync_playwright() as p:
-        if browser_type == 'firefox':
-            browser = p.firefox.launch(headless=headless)
-        else:
-            browser = p.chromium.launch(
-                headless=headless,
-                args=['--disable-web-security', '--disable-features=IsolateOrigins,site-per-process']
-            )
-        
-        context = browser.new_context(
-            viewport={'width': 1920, 'height': 1080},
-            user_agent='Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36',
-            storage_state=None
-        )
-        page = context.new_page()
-        
-        def on_console(msg):
-            ts = time.strftime('%Y-%m-%d %H:%M:%S')
-            text = msg.text
-            if text.startswith('[2'):
-                print(text, flush=True)
-            elif text.startswith('[LOGIN]') or text.startswith('[SCRAPER]') or text.startswith('[PYTHON]'):
-                print(f'[{ts}]{text}', flush=True)
-            else:
-                print(f'[{ts}][JS] {text}', flush=True)
 
-        page.on("console", on_console)
-        
+    async with async_playwright() as p:
+        browser = await launch_browser(p, headless, browser_type)
         try:
-            log(f'🔗 Navigation vers {TARGET_URL}...')
-            page.goto(TARGET_URL, wait_until='domcontentloaded', timeout=30000)
-            log('✅ Page chargée')
-            time.sleep(2)
-            
-            log('💉 Injection config dans localStorage...')
-            inject_config(page, config)
-            
-            # ========== ÉTAPE 1 : LOGIN ==========
-            log('')
-            log('━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━')
-            log('🔐 ÉTAPE 1/2 : LOGIN')
-            log('━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━')
-            
-            login_result = page.evaluate(login_js)
-            
-            if not login_result.get('success'):
-                error(f'Échec login: {login_result.get("message")}')
-                if headless:
-                    screenshot_path = SCRAPER_DIR / f'error-login-{db_name}.png'
-                    page.screenshot(path=str(screenshot_path))
-                return False
-            
-            log(f'✅ Login: {login_result.get("message")}')
-            
-            if login_result.get('status') == 'logged_in':
-                log('⏳ Attente stabilisation après login (5s)...')
-                time.sleep(5)
-                log('💉 Ré-injection config...')
-                inject_config(page, config)
-            else:
-                time.sleep(2)
-            
-            # ========== ÉTAPE 2 : SCRAPING ==========
-            log('')
-            log('━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━')
-            log('📊 ÉTAPE 2/2 : SCRAPING')
-            log('━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━')
-            
-            scraper_result = page.evaluate(scraper_js)
-            
-            if not scraper_result.get('success'):
-                error(f'Échec scraping: {scraper_result.get("error")}')
-                if headless:
-                    screenshot_path = SCRAPER_DIR / f'error-scraper-{db_name}.png'
-                    page.screenshot(path=str(screenshot_path))
-                return False
-            
-            log('')
-            log('━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━')
-            log('✨ RÉSUMÉ')
-            log('━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━')
-            log(f'Total conversations: {scraper_result.get("total", 0)}')
-            log(f'Nouveaux messages: {scraper_result.get("total_new_messages", 0)}')
-            log(f'Succès: {scraper_result.get("succeeded", 0)}')
-            log(f'Échecs: {scraper_result.get("failed", 0)}')
-            log(f'Arrêt: {scraper_result.get("stop_reason", "fin normale")}')
-            
-            send_telegram_notification(config, scraper_result)
-            
-            return True
-            
-        except PlaywrightTimeout as e:
-            error(f'Timeout: {e}')
-            if headless:
-                screenshot_path = SCRAPER_DIR / f'error-timeout-{db_name}.png'
-                page.screenshot(path=str(screenshot_path))
-            return False
-            
-        except Exception as e:
-            error(f'Erreur: {e}')
-            if headless:
-                screenshot_path = SCRAPER_DIR / f'error-exception-{db_name}.png'
-                page.screenshot(path=str(screenshot_path))
-            return False
-        
+            result = await sync_user(browser, config, login_js, scraper_js, headless)
         finally:
             if not headless:
                 log('⏸️  Appuyez sur Entrée pour fermer...')
-                input()
-            browser.close()
+                await asyncio.to_thread(input)
+            await browser.close()
+
+    return result is not None
+
+def expand_user_configs(patterns):
+    """Expanse les globs de --users (si le shell ne l'a pas fait) en liste de fichiers uniques"""
+    paths = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern)) or [pattern]
+        for match in matches:
+            path = Path(match)
+            if path not in paths:
+                paths.append(path)
+    return paths
+
+async def run_multi(config_paths, concurrency=3, headless=True, browser_type='chromium'):
+    """
+    Synchronise plusieurs utilisateurs avec UN seul navigateur :
+    un BrowserContext isolé par utilisateur, au plus `concurrency` en parallèle.
+    """
+    log('━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━')
+    log('🚀 SCRAPER ANNONCES.NC - MULTI-UTILISATEURS')
+    log('━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━')
+
+    install_sigterm_handler()
+
+    # Charger les configs (les fichiers qui ne sont pas des configs scraper sont ignorés)
+    jobs = []
+    for path in config_paths:
+        user = user_from_config_path(path)
+        token = CURRENT_USER.set(user)
+        try:
+            config = await asyncio.to_thread(load_config, path)
+            jobs.append((user, config, path))
+        except (ConfigError, ValueError) as e:
+            log(f'⏭️  {path.name} ignoré: {e}')
+        finally:
+            CURRENT_USER.reset(token)
+
+    if not jobs:
+        error('Aucune config utilisateur valide')
+        return False
+
+    log(f'👥 {len(jobs)} utilisateur(s), concurrence {concurrency}')
+
+    login_js = load_script(LOGIN_JS)
+    scraper_js = load_script(SCRAPER_JS)
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    results = {}
+
+    async def run_one(user, config):
+        CURRENT_USER.set(user)
+        async with semaphore:
+            if is_locked_by_other_process(config):
+                log('🔒 Sync déjà en cours pour cet utilisateur, ignoré')
+                results[user] = {'status': 'skipped', 'error': 'locked'}
+                return
+            started = time.time()
+            log(f'▶️  Début sync ({config["db_name"]})')
+            try:
+                result = await sync_user(browser, config, login_js, scraper_js, headless)
+            except Exception as e:
+                error(f'Erreur: {e}')
+                result = None
+            duration = time.time() - started
+            if result is None:
+                results[user] = {'status': 'failed', 'duration': duration}
+            else:
+                results[user] = {'status': 'ok', 'duration': duration, 'result': result}
+            log(f'⏹️  Fin sync ({duration:.1f}s)')
+
+    async def run_one_and_clean(user, config, path):
+        try:
+            await run_one(user, config)
+        finally:
+            drop_temp_config(path)
+
+    mode = 'HEADLESS' if headless else 'HEADFUL'
+    log(f'🌐 Lancement {browser_type.upper()} ({mode})...')
+
+    async with async_playwright() as p:
+        browser = await launch_browser(p, headless, browser_type)
+        try:
+            await asyncio.gather(*(run_one_and_clean(user, config, path) for user, config, path in jobs))
+        finally:
+            await browser.close()
+
+    # ========== RÉSUMÉ PAR UTILISATEUR ==========
+    log('')
+    log('━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━')
+    log('✨ RÉSUMÉ MULTI-UTILISATEURS')
+    log('━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━')
+    for user, _, _ in jobs:
+        res = results.get(user, {'status': 'failed'})
+        if res['status'] == 'ok':
+            r = res['result']
+            log(f'✅ {user}: {r.get("total", 0)} convs, {r.get("total_new_messages", 0)} nouveaux, '
+                f'{r.get("failed", 0)} échecs, arrêt: {r.get("stop_reason", "fin normale")} ({res["duration"]:.1f}s)')
+        elif res['status'] == 'skipped':
+            log(f'⏭️  {user}: ignoré ({res["error"]})')
+        else:
+            log(f'❌ {user}: échec ({res.get("duration", 0):.1f}s)')
+
+    return all(res['status'] != 'failed' for res in results.values())
+
+# ========== DAEMON ==========
+DAEMON_POLL = 0.25        # secondes entre deux lectures de spool/
+DAEMON_RESCAN = 10        # secondes entre deux scans des configs utilisateur
+INTERVAL_JITTER = 0.1     # ±10% sur l'intervalle périodique
+
+def read_trigger(path):
+    """Déclenchement écrit par sync.php : {"config": "...", "budget": 90, "requested_at": ...} ; None si illisible"""
+    try:
+        data = json.loads(path.read_text())
+    except (OSError, ValueError):
+        data = None
+    try:
+        path.unlink()
+    except OSError:
+        pass
+    return data if isinstance(data, dict) and data.get('config') else None
+
+def register_daemon_user(config_path, config):
+    """
+    Consomme une config temp_ (mot de passe en clair) : le daemon garde à la place
+    config/daemon_<user>.json sans mot de passe, pour ses syncs périodiques, qui
+    reposent sur la session sauvegardée. Retourne le chemin du registre.
+    """
+    config_path = Path(config_path)
+    try:
+        entry = json.loads(config_path.read_text())
+    except (OSError, ValueError):
+        entry = {}
+    entry.pop('password', None)
+    entry['db_name'] = config['db_name']
+    registry_path = Path(DAEMON_REGISTRY).with_name(f'daemon_{user_from_config_path(config_path)}.json')
+    tmp = registry_path.with_suffix('.tmp')
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'w') as f:
+        json.dump(entry, f, indent=2, ensure_ascii=False)
+    tmp.replace(registry_path)
+    drop_temp_config(config_path)
+    return registry_path
+
+def release_lock(user):
+    """Retire locks/<user>.lock s'il désigne ce daemon (posé par sync.php ou par le daemon)"""
+    lock_file = LOCKS_DIR / f'{user}.lock'
+    try:
+        if lock_file.read_text().strip() == str(os.getpid()):
+            lock_file.unlink()
+    except OSError:
+        pass
+
+async def run_daemon(patterns, concurrency=3, interval=30, headless=True, browser_type='chromium'):
+    """
+    Reste lancé avec UN navigateur chaud et un contexte par utilisateur gardé ouvert :
+
+    - sync périodique de chaque config de `patterns` et du registre config/daemon_*.json
+      toutes les `interval` minutes (±10%, premier passage étalé sur l'intervalle)
+    - sync à la demande quand sync.php dépose spool/<user>.json (lu toutes les 250ms) ;
+      un déclenchement pour un utilisateur déjà en cours est absorbé par le sync en cours
+
+    Une config temp_ (mot de passe en clair) est supprimée dès qu'elle est lue et
+    remplacée dans le registre par sa copie sans mot de passe.
+
+    Chaque sync écrit dans logs/<user>_sync.log et tient locks/<user>.lock (PID du
+    daemon) pendant son exécution, comme un sync lancé par launch-scraper.sh.
+    """
+    log('━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━')
+    log('🚀 SCRAPER ANNONCES.NC - DAEMON')
+    log('━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━')
+
+    install_sigterm_handler()
+
+    for directory in (LOCKS_DIR, LOGS_DIR, SPOOL_DIR):
+        directory.mkdir(parents=True, exist_ok=True)
+    DAEMON_PID_FILE.write_text(str(os.getpid()))
+
+    login_js = load_script(LOGIN_JS)
+    scraper_js = load_script(SCRAPER_JS)
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    period = interval * 60
+    pages = {}      # user → UserPage gardée ouverte
+    running = {}    # user → tâche de sync en cours
+    next_due = {}   # user → prochain sync périodique (timestamp)
+    config_paths = {}
+    last_scan = 0
+
+    async def run_one(user, config_path, triggered, budget=None):
+        CURRENT_USER.set(user)
+        # Sync à la demande : sync.php a déjà vidé le log et écrit l'en-tête
+        sink = open(LOGS_DIR / f'{user}_sync.log', 'a' if triggered else 'w', encoding='utf-8')
+        LOG_SINK.set(sink)
+        started = time.time()
+        try:
+            log(f'{"🔵 Sync demandé via web" if triggered else "⏰ Sync périodique"} ({config_path.name})')
+            try:
+                config = await asyncio.to_thread(load_config, config_path, is_temp_config(config_path))
+            except (ConfigError, ValueError) as e:
+                error(str(e))
+                drop_temp_config(config_path)
+                return
+            if is_temp_config(config_path):
+                config_paths[user] = register_daemon_user(config_path, config)
+            if budget:
+                config['budget'] = budget
+            if is_locked_by_other_process(config):
+                log('🔒 Sync déjà en cours (hors daemon) pour cet utilisateur, ignoré')
+                return
+            (LOCKS_DIR / f'{user}.lock').write_text(str(os.getpid()))
+            async with semaphore:
+                user_page = pages.setdefault(user, UserPage())
+                try:
+                    result = await sync_user(browser, config, login_js, scraper_js, headless, user_page=user_page)
+                except Exception as e:
+                    error(f'Erreur: {e}')
+                    result = None
+            status = '✅' if result else '❌'
+            log(f'⏹️  {status} Fin sync ({time.time() - started:.1f}s)')
+        finally:
+            release_lock(user)
+            if period > 0:
+                next_due[user] = time.time() + period * random.uniform(1 - INTERVAL_JITTER, 1 + INTERVAL_JITTER)
+            running.pop(user, None)
+            LOG_SINK.set(None)
+            sink.close()
+
+    def start(user, config_path, triggered=False, budget=None):
+        running[user] = asyncio.create_task(run_one(user, config_path, triggered, budget), context=contextvars.Context())
+
+    mode = 'HEADLESS' if headless else 'HEADFUL'
+    log(f'🌐 Lancement {browser_type.upper()} ({mode})...')
+
+    async with async_playwright() as p:
+        browser = await launch_browser(p, headless, browser_type)
+        log(f'👂 En attente: {SPOOL_DIR}/<user>.json, syncs périodiques '
+            + (f'toutes les {interval:g} min' if period > 0 else 'désactivés'))
+        try:
+            while True:
+                now = time.time()
+
+                # Déclenchements web (prioritaires sur le périodique)
+                for trigger in sorted(SPOOL_DIR.glob('*.json')):
+                    user = trigger.stem
+                    data = read_trigger(trigger)
+                    if data is None:
+                        log(f'⚠️  Déclenchement illisible ignoré: {trigger.name}')
+                        release_lock(user)
+                    elif user in running:
+                        log(f'⏭️  {user}: sync déjà en cours, déclenchement absorbé')
+                        drop_temp_config(data['config'])
+                    else:
+                        start(user, Path(data['config']), triggered=True, budget=data.get('budget'))
+
+                # Configs utilisateur (nouvelles, supprimées)
+                if now - last_scan >= DAEMON_RESCAN:
+                    last_scan = now
+                    config_paths = {user_from_config_path(path): path
+                                    for path in expand_user_configs([str(DAEMON_REGISTRY)] + list(patterns))
+                                    if path.exists()}
+                    for user in list(pages):
+                        if user not in config_paths and user not in running:
+                            await pages.pop(user).close()
+
+                # Syncs périodiques
+                if period > 0:
+                    for user, path in config_paths.items():
+                        if user not in next_due:
+                            next_due[user] = now + random.uniform(0, period)
+                        elif now >= next_due[user] and user not in running:
+                            start(user, path)
+
+                await asyncio.sleep(DAEMON_POLL)
+        finally:
+            for task in running.values():
+                task.cancel()
+            await asyncio.gather(*running.values(), return_exceptions=True)
+            for user_page in pages.values():
+                await user_page.close()
+            await browser.close()
+            try:
+                DAEMON_PID_FILE.unlink()
+            except OSError:
+                pass
 
 # ========== CLI ==========
 if __name__ == '__main__':
     headless = not args.headful
     browser_type = 'firefox' if args.firefox else 'chromium'
-    
-    success = run_scraper(headless=headless, browser_type=browser_type)
-    
-    if args.config and Path(args.config).stem.startswith('temp_'):
-        try:
-            Path(args.config).unlink()
-            log(f'🧹 Config temporaire supprimée: {args.config}')
-        except:
-            pass
-    
-    sys.exit(0 if success else 1)
\ No newline at end of file
+
+    try:
+        if args.daemon:
+            asyncio.run(run_daemon(
+                args.users or [],
+                concurrency=args.concurrency,
+                interval=args.interval,
+                headless=headless,
+                browser_type=browser_type
+            ))
+            sys.exit(0)
+
+        if args.users:
+            success = asyncio.run(run_multi(
+                expand_user_configs(args.users),
+                concurrency=args.concurrency,
+                headless=headless,
+                browser_type=browser_type
+            ))
+            sys.exit(0 if success else 1)
+
+        success = asyncio.run(run_scraper(headless=headless, browser_type=browser_type))
+    except asyncio.CancelledError:
+        log('⏹️  Interrompu (SIGTERM)')
+        sys.exit(128 + signal.SIGTERM)
+    finally:
+        # Aussi sur SIGTERM / sys.exit : la config temporaire contient le mot de passe
+        drop_temp_config(args.config)
+
+    sys.exit(0 if success else 1)
@@ -0,0 +1,153 @@
+"""
+Index local de l'état de synchronisation (SQLite, un fichier par base utilisateur)
+
+Pour chaque entrée de la sidebar déjà sauvegardée on garde une empreinte de son
+texte (aperçu, date, badge non-lu), le dernier message vu et le nombre de
+messages. En mode smart, le scraper compare toute la sidebar en une passe et
+n'ouvre que les conversations dont l'empreinte a changé.
+
+Le même fichier porte le checkpoint du run en cours (conversations déjà
+sauvegardées + nombre de pages chargées) pour reprendre avec --resume.
+"""
+
+import time
+import sqlite3
+from pathlib import Path
+
+STATE_DIR = Path(__file__).parent / 'state'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS conversations (
+    conv_key TEXT PRIMARY KEY,
+    conversation_id TEXT,
+    fingerprint TEXT,
+    last_message_id TEXT,
+    message_count INTEGER,
+    updated_at REAL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    name TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS checkpoint_done (
+    conv_key TEXT PRIMARY KEY
+);
+"""
+
+
+class SyncState:
+    def __init__(self, db_name, directory=None):
+        directory = Path(directory or STATE_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+        self.path = directory / f'{db_name}.sqlite'
+        self.conn = sqlite3.connect(str(self.path))
+        self.conn.executescript(SCHEMA)
+        self.recorded = 0
+
+    # ========== BINDINGS (appelées depuis la page) ==========
+    def lookup(self, entries):
+        """entries: [{key, fingerprint}] → [True si inchangée depuis la dernière sauvegarde]"""
+        keys = [e['key'] for e in entries]
+        known = {}
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            rows = self.conn.execute(
+                f'SELECT conv_key, fingerprint FROM conversations WHERE conv_key IN ({",".join("?" * len(chunk))})',
+                chunk
+            )
+            known.update(rows)
+        return [known.get(e['key']) == e['fingerprint'] for e in entries]
+
+    def record(self, entries):
+        """entries: [{key, conversation_id, fingerprint, last_message_id, message_count}]"""
+        now = time.time()
+        self.conn.executemany(
+            """
+            INSERT INTO conversations (conv_key, conversation_id, fingerprint, last_message_id, message_count, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(conv_key) DO UPDATE SET
+                conversation_id = COALESCE(excluded.conversation_id, conversation_id),
+                fingerprint = excluded.fingerprint,
+                last_message_id = excluded.last_message_id,
+                message_count = excluded.message_count,
+                updated_at = excluded.updated_at
+            """,
+            [(e['key'], e.get('conversation_id'), e['fingerprint'], e.get('last_message_id'),
+              e.get('message_count'), now) for e in entries]
+        )
+        self.conn.executemany(
+            'INSERT OR IGNORE INTO checkpoint_done (conv_key) VALUES (?)', [(e['key'],) for e in entries]
+        )
+        self.conn.commit()
+        self.recorded += len(entries)
+        return True
+
+    def checkpoint_pages(self, event):
+        """event: {pages} → curseur de pagination du run en cours"""
+        self._set_meta('checkpoint_pages', event['pages'])
+        return True
+
+    def done_flags(self, entries):
+        """entries: [{key}] → [True si déjà sauvegardée pendant le run interrompu]"""
+        keys = [e['key'] for e in entries]
+        done = set()
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            rows = self.conn.execute(
+                f'SELECT conv_key FROM checkpoint_done WHERE conv_key IN ({",".join("?" * len(chunk))})', chunk
+            )
+            done.update(row[0] for row in rows)
+        return [k in done for k in keys]
+
+    # ========== CHECKPOINT ==========
+    def checkpoint_info(self):
+        """Checkpoint laissé par un run interrompu, ou None"""
+        mode = self._get_meta('checkpoint_mode')
+        if mode is None:
+            return None
+        done = self.conn.execute('SELECT COUNT(*) FROM checkpoint_done').fetchone()[0]
+        return {
+            'mode': mode,
+            'pages': int(self._get_meta('checkpoint_pages') or 0),
+            'started_at': float(self._get_meta('checkpoint_started_at') or 0),
+            'done': done
+        }
+
+    def start_checkpoint(self, mode, resume=False):
+        """Ouvre le checkpoint du run ; sans reprise, repart de zéro"""
+        if resume and self.checkpoint_info():
+            return self.checkpoint_info()
+        self.conn.execute('DELETE FROM checkpoint_done')
+        self._set_meta('checkpoint_mode', mode)
+        self._set_meta('checkpoint_pages', 0)
+        self._set_meta('checkpoint_started_at', time.time())
+        self.conn.commit()
+        return None
+
+    def clear_checkpoint(self):
+        """Run terminé normalement : plus rien à reprendre"""
+        self.conn.execute('DELETE FROM checkpoint_done')
+        self.conn.execute("DELETE FROM meta WHERE name LIKE 'checkpoint_%'")
+        self.conn.commit()
+
+    # ========== RUNS ==========
+    def _get_meta(self, name):
+        row = self.conn.execute('SELECT value FROM meta WHERE name = ?', (name,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, name, value):
+        self.conn.execute('INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)', (name, str(value)))
+        self.conn.commit()
+
+    def last_success(self):
+        value = self._get_meta('last_success_at')
+        return float(value) if value else None
+
+    def mark_success(self):
+        self._set_meta('last_success_at', time.time())
+
+    def count(self):
+        return self.conn.execute('SELECT COUNT(*) FROM conversations').fetchone()[0]
+
+    def close(self):
+        self.conn.close()
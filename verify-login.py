@@ -3,6 +3,7 @@ import sys
 import json
 from pathlib import Path
 from playwright.sync_api import sync_playwright
+from session_store import save_session
 
 SCRIPT_DIR = Path(__file__).parent
 config_file = sys.argv[1]
@@ -18,14 +19,19 @@ with sync_playwright() as p:
     page = browser.new_page()
     page.goto('https://annonces.nc/dashboard/conversations', timeout=30000)
     
-    from time import sleep
-    sleep(2)
-    
     config_json = json.dumps(config).replace('\\', '\\\\').replace("'", "\\'")
     page.evaluate(f"localStorage.setItem('SCRAPER_CONFIG', '{config_json}');")
     
     result = page.evaluate(login_js)
     
+    # Login toujours refait ici (on vérifie les credentials), mais on garde
+    # la session pour que le premier sync n'ait pas à se reconnecter
+    if result.get('success'):
+        try:
+            save_session(config['email'], page.context.storage_state())
+        except Exception:
+            pass
+    
     browser.close()
     
     print(json.dumps(result))
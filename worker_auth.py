@@ -0,0 +1,36 @@
+"""
+Secret partagé entre api.php et les workers Python (config/worker_secret)
+
+Les actions d'api.php qui exposent ou modifient des données privées sans
+session web exigent l'en-tête X-Worker-Secret en plus de X-User-Database.
+Le fichier est créé (0600) par le premier des deux côtés qui en a besoin :
+Apache et les workers tournent sous le même utilisateur (voir DEPLOY.md).
+"""
+
+import os
+import secrets
+from pathlib import Path
+
+SECRET_FILE = Path(__file__).parent / 'config' / 'worker_secret'
+
+
+def worker_secret():
+    """Contenu de config/worker_secret, créé s'il n'existe pas encore"""
+    try:
+        return SECRET_FILE.read_text().strip()
+    except FileNotFoundError:
+        pass
+    SECRET_FILE.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        fd = os.open(SECRET_FILE, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        # Créé entre-temps (api.php ou un autre worker)
+        return SECRET_FILE.read_text().strip()
+    with os.fdopen(fd, 'w') as f:
+        f.write(secrets.token_hex(32))
+    return SECRET_FILE.read_text().strip()
+
+
+def worker_headers(db_name):
+    """En-têtes des appels worker → api.php"""
+    return {'X-User-Database': db_name, 'X-Worker-Secret': worker_secret()}